@@ -0,0 +1,258 @@
+"""
+Performance benchmarks for the hot paths of the game.
+
+Times Board.move, Board.spawn, Board.add_val,
+Board.has_lost and GameBoard.update_grid on fixed-seed
+corpora of early, mid and late game boards, and saves
+the results as JSON.
+A saved run can be used as a baseline to flag slowdowns.
+
+Example:
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import bitboard as bb
+import gamelogic as gl
+import simulate
+
+# Number of moves into a game at which boards are taken
+# for each stage, as a range of fractions of the game length
+STAGES = {
+    "early": (0.0, 0.1),
+    "mid": (0.4, 0.6),
+    "late": (0.9, 1.0),
+}
+
+
+def make_corpus(stage, boards=200, seed=0):
+    """
+    Plays seeded games with the greedy policy and collects
+    boards from the given stage of each game.
+    """
+    start, end = STAGES[stage]
+    corpus = []
+    board = gl.Board(seed=seed)
+    while len(corpus) < boards:
+        board.reset_board()
+        history = [np.copy(board.board)]
+        while not board.has_lost():
+            board.move(simulate.greedy_policy(board))
+            history.append(np.copy(board.board))
+        first = int(start * (len(history) - 1))
+        last = max(first + 1, int(end * (len(history) - 1)))
+        corpus.extend(history[first:last][:boards - len(corpus)])
+    return corpus
+
+
+def time_call(run, setup=None, repeat=5):
+    """
+    Runs `run` `repeat` times, calling `setup` before each
+    run without timing it, and returns the fastest time.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup() if setup is not None else None
+        start = time.perf_counter()
+        run(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_move(corpus, repeat):
+    def setup():
+        boards = []
+        for arr in corpus:
+            for direction in bb.DIRECTIONS:
+                # Every board would allocate its undo history on its
+                # first move, which would take longer than the move
+                board = gl.Board(history_size=0)
+                board.board = np.copy(arr)
+                boards.append((board, direction))
+        return boards
+
+    def run(boards):
+        for board, direction in boards:
+            board.move(direction)
+
+    return time_call(run, setup, repeat) / (4 * len(corpus))
+
+
+def bench_spawn(corpus, repeat):
+    # Full boards can't take a new value
+    corpus = [arr for arr in corpus if np.any(arr == 0)]
+
+    def setup():
+        boards = []
+        for arr in corpus:
+            board = gl.Board(history_size=0)
+            board.board = np.copy(arr)
+            boards.append(board)
+        return boards
+
+    def run(boards):
+        for board in boards:
+            board.add_new_tiles()
+
+    return time_call(run, setup, repeat) / len(corpus)
+
+
+def bench_add_val(corpus, repeat):
+    # The array path, only taken by boards that can't be packed,
+    # for comparison with bench_spawn
+    corpus = [arr for arr in corpus if np.any(arr == 0)]
+
+    def setup():
+        return [np.copy(arr) for arr in corpus]
+
+    def run(arrays):
+        for arr in arrays:
+            gl.Board.add_val(arr, 2)
+
+    return time_call(run, setup, repeat) / len(corpus)
+
+
+def bench_has_lost(corpus, repeat):
+    boards = []
+    for arr in corpus:
+        board = gl.Board(history_size=0)
+        board.board = np.copy(arr)
+        boards.append(board)
+
+    def run(_):
+        for board in boards:
+            board.has_lost()
+
+    return time_call(run, None, repeat) / len(corpus)
+
+
+def bench_update_grid(corpus, repeat):
+    # Importing tkinter or opening a window fails on
+    # machines without a display, so this case is optional
+    try:
+        import tkinter as tk
+        import display
+        window = tk.Tk()
+    except Exception:
+        return None
+    window.withdraw()
+    game_board = display.GameBoard(master=window, difficulty="normal")
+    # Keep the win and loss windows from opening
+    game_board.win_displayed = True
+    game_board.loss_displayed = True
+
+    def setup():
+        # Assigning an array to a Board packs it and updates its
+        # masks, so the boards are made before the timed loop
+        boards = []
+        for arr in corpus:
+            board = gl.Board(history_size=0)
+            board.board = np.copy(arr)
+            boards.append(board)
+        return boards
+
+    def run(boards):
+        for board in boards:
+            game_board.board = board
+            game_board.update_grid()
+
+    try:
+        return time_call(run, setup, repeat) / len(corpus)
+    finally:
+        window.destroy()
+
+
+BENCHMARKS = {
+    "Board.move": bench_move,
+    "Board.spawn": bench_spawn,
+    "Board.add_val": bench_add_val,
+    "Board.has_lost": bench_has_lost,
+    "GameBoard.update_grid": bench_update_grid,
+}
+
+
+def run_benchmarks(boards=200, repeat=5, seed=0, names=None):
+    """
+    Runs the benchmarks on every corpus. Returns the
+    seconds per call of every benchmark and stage.
+    """
+    results = {}
+    for stage in STAGES:
+        corpus = make_corpus(stage, boards, seed)
+        for name, bench in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            seconds = bench(corpus, repeat)
+            if seconds is not None:
+                results[f"{name}/{stage}"] = seconds
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares results against a baseline. Returns report
+    lines and the names of benchmarks that slowed down by
+    more than the threshold (a fraction, 0.1 is 10%).
+    """
+    lines = []
+    slower = []
+    for name, seconds in sorted(results.items()):
+        if name not in baseline:
+            lines.append(f"{name:<32}{seconds * 1e6:>10.2f} us  (new)")
+            continue
+        change = seconds / baseline[name] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  SLOWER"
+            slower.append(name)
+        lines.append(f"{name:<32}{seconds * 1e6:>10.2f} us  {change:+8.1%}{flag}")
+    return lines, slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths.")
+    parser.add_argument("--boards", type=int, default=200,
+                        help="boards in each corpus")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS),
+                        help="run only these benchmarks")
+    parser.add_argument("--save", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="compare against a saved JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown that counts as a regression (0.1 is 10%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.boards, args.repeat, args.seed, args.only)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "boards": args.boards,
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        lines, slower = compare(results, baseline, args.threshold)
+        print("\n".join(lines))
+        if slower:
+            print(f"{len(slower)} benchmark(s) slower than the baseline by over {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        for name, seconds in sorted(results.items()):
+            print(f"{name:<32}{seconds * 1e6:>10.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import benchmark
+import unittest
+import numpy as np
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_corpus_seeded(self):
+        # Check that the same seed gives the same corpus
+        first = benchmark.make_corpus("mid", boards=20, seed=3)
+        second = benchmark.make_corpus("mid", boards=20, seed=3)
+        self.assertEqual(len(first), 20, "The corpus should have 20 boards")
+        for a, b in zip(first, second):
+            self.assertTrue(np.array_equal(a, b), "Seeded corpora should be identical")
+
+        # Check that late boards have more tiles than early boards
+        early = benchmark.make_corpus("early", boards=20)
+        late = benchmark.make_corpus("late", boards=20)
+        self.assertGreater(
+            np.mean([np.count_nonzero(arr) for arr in late]),
+            np.mean([np.count_nonzero(arr) for arr in early]))
+
+        print("Test corpus_seeded passed")
+
+    def test_run_benchmarks(self):
+        results = benchmark.run_benchmarks(boards=5, repeat=1, names=["Board.move", "Board.spawn"])
+        self.assertEqual(
+            sorted(results),
+            ["Board.move/early", "Board.move/late", "Board.move/mid",
+             "Board.spawn/early", "Board.spawn/late", "Board.spawn/mid"])
+        self.assertTrue(all(seconds > 0 for seconds in results.values()))
+
+        print("Test run_benchmarks passed")
+
+    def test_compare(self):
+        baseline = {"Board.move/early": 1.0, "Board.has_lost/early": 1.0}
+        results = {"Board.move/early": 1.05, "Board.has_lost/early": 1.5, "Board.add_val/early": 1.0}
+        lines, slower = benchmark.compare(results, baseline, 0.1)
+
+        # Only slowdowns beyond the threshold are flagged
+        self.assertEqual(slower, ["Board.has_lost/early"])
+        self.assertEqual(len(lines), 3, "Every result should be reported")
+        self.assertTrue(any("(new)" in line for line in lines))
+
+        print("Test compare passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,946 @@
+import array
+import os
+import random
+
+import numpy as np
+
+# A 4x4 board is packed into a single 64-bit integer.
+# Every cell holds a 4-bit tile exponent (0 = empty, 1 = 2, 2 = 4, ...),
+# and cell (row, col) lives at bit offset 4 * (4 * row + col), so each
+# row occupies 16 consecutive bits with its first column in the low nibble.
+
+DIRECTIONS = ("up", "down", "left", "right")
+DIRECTION_BITS = {direction: 1 << i for i, direction in enumerate(DIRECTIONS)}
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15
+WIN_EXPONENT = 11
+
+# Row tables are cached on disk so they are only built once
+CACHE_DIR = os.environ.get(
+    "GAME2048_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "game2048"))
+TABLE_VERSION = 1
+ROW_TABLE_NAMES = ("left", "right", "score", "left_changed", "right_changed")
+# Largest row size with a full precomputed table. Rows of 6
+# cells already have 16M possible values, so larger boards
+# use tables filled in on demand.
+FULL_TABLE_MAX_SIZE = 5
+# Bits per cell of boards larger than FULL_TABLE_MAX_SIZE. With
+# no full tables to keep small, their cells hold tiles up to 2^31.
+WIDE_CELL_BITS = 5
+
+# Bit offset of every cell in row-major order
+_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64).reshape(4, 4)
+
+# Tile value of every exponent
+_TILE_VALUES = np.array([0] + [1 << i for i in range(1, 1 << WIDE_CELL_BITS)])
+
+
+def slide_rows(cells, max_exponent=MAX_EXPONENT):
+    """
+    Slides and merges rows of tile exponents towards their
+    first cell, following the same rules as Board.shift_zeroes
+    and Board.combine. Takes an array whose last axis holds
+    the cells of each row, and returns the moved rows and
+    the score gained by each row. Tiles at max_exponent
+    never merge, as in the packed rows of the row tables;
+    None lets tiles merge up to the limit of the dtype.
+    """
+    cells = _compact(cells)
+
+    # Combine equal, adjacent tiles from the front
+    score = np.zeros(cells.shape[:-1], dtype=np.int64)
+    for i in range(cells.shape[-1] - 1):
+        merge = (cells[..., i] == cells[..., i + 1]) & (cells[..., i] != 0)
+        if max_exponent is not None:
+            merge &= cells[..., i] < max_exponent
+        cells[..., i] += merge
+        cells[..., i + 1] *= ~merge
+        score += np.where(merge, 1 << cells[..., i].astype(np.int64), 0)
+
+    return _compact(cells), score
+
+
+def _compact(cells):
+    """
+    Shifts the non-empty tiles of each row (along the
+    last axis) to the front, keeping their order.
+    """
+    nonzero = cells != 0
+    # Empty cells are all sent to an extra column that is dropped
+    target = np.where(nonzero, np.cumsum(nonzero, axis=-1) - 1, cells.shape[-1])
+    compacted = np.zeros(cells.shape[:-1] + (cells.shape[-1] + 1,), dtype=cells.dtype)
+    np.put_along_axis(compacted, target, cells, axis=-1)
+    return compacted[..., :-1]
+
+
+def build_row_tables(size=4):
+    """
+    Computes the result of moving every possible row
+    of the given size to the left and to the right,
+    the score gained, and whether the move changes the row.
+    """
+    shifts = np.arange(0, 4 * size, 4)
+    rows = np.arange(1 << (4 * size), dtype=np.int64)
+    cells = (rows[:, None] >> shifts) & 0xF
+
+    left_cells, score = slide_rows(cells)
+    left = (left_cells << shifts).sum(axis=1)
+
+    # Moving right is moving the reversed row left. The score
+    # is the same in both directions since a run of equal tiles
+    # always produces the same number of merges.
+    right_cells, _ = slide_rows(cells[:, ::-1])
+    right = (right_cells[:, ::-1] << shifts).sum(axis=1)
+
+    return {
+        "left": left,
+        "right": right,
+        "score": score,
+        "left_changed": left != rows,
+        "right_changed": right != rows,
+    }
+
+
+def load_row_tables(size=4, cache_dir=CACHE_DIR):
+    """
+    Loads the row tables of the given size from the cache
+    directory, building and saving them if they aren't cached yet.
+    """
+    path = os.path.join(cache_dir, f"row_tables_v{TABLE_VERSION}_{size}.npz")
+    try:
+        with np.load(path) as cached:
+            tables = {name: cached[name] for name in ROW_TABLE_NAMES}
+        if all(table.shape == (1 << (4 * size),) for table in tables.values()):
+            return tables
+    except Exception:
+        # Any file that can't be read, such as an empty or
+        # corrupt one, is rebuilt like a missing one
+        pass
+
+    tables = build_row_tables(size)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so that processes
+        # starting at the same time never read a partial file,
+        # and sync it so that a crash can't publish one either
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            np.savez(f, **tables)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        # The cache is only an optimization
+        pass
+    return tables
+
+
+TABLES = load_row_tables()
+
+# Lists are faster to index with Python ints than arrays
+ROW_LEFT = TABLES["left"].tolist()
+ROW_RIGHT = TABLES["right"].tolist()
+ROW_SCORE = TABLES["score"].tolist()
+ROW_LEFT_CHANGED = TABLES["left_changed"].tolist()
+ROW_RIGHT_CHANGED = TABLES["right_changed"].tolist()
+
+# Legal direction bits contributed by a single row or column.
+# Bit i of a legal moves mask is set if DIRECTIONS[i] changes the board.
+ROW_LEGAL = ((TABLES["left_changed"] << 2) | (TABLES["right_changed"] << 3)).tolist()
+COLUMN_LEGAL = (TABLES["left_changed"] | (TABLES["right_changed"] << 1)).tolist()
+
+# Cells of every row, used to build the tables below
+_ROW_CELLS = (np.arange(ROW_MASK + 1)[:, None] >> np.arange(0, 16, 4)) & 0xF
+
+# 4-bit mask of the empty cells of every row
+ROW_EMPTY = np.sum((_ROW_CELLS == 0) << np.arange(4), axis=1).tolist()
+
+# Every row with the order of its cells reversed
+ROW_REVERSE = np.sum(_ROW_CELLS << np.arange(12, -4, -4), axis=1).tolist()
+
+# Number of set bits of every byte, and the position of
+# the k-th set bit, used to pick a random empty cell
+POPCOUNT8 = [bin(byte).count("1") for byte in range(256)]
+SELECT8 = [[i for i in range(8) if byte >> i & 1] for byte in range(256)]
+
+
+def pack(arr):
+    """
+    Packs a 4x4 array of tile values into a 64-bit integer.
+    Raises a ValueError if the array holds values that
+    are not representable as 4-bit tile exponents.
+    """
+    arr = np.asarray(arr)
+    if arr.shape != (4, 4):
+        raise ValueError("Only 4x4 boards can be packed")
+    if np.any(arr < 0):
+        raise ValueError("Board values must not be negative")
+    exponents = np.zeros((4, 4), dtype=np.int64)
+    nonzero = arr != 0
+    exponents[nonzero] = np.log2(arr[nonzero])
+    # An exponent of 0 would be an empty cell, so tiles start at 2
+    if (np.any(exponents > MAX_EXPONENT) or np.any(nonzero & (exponents < 1))
+            or np.any(np.where(nonzero, 1 << exponents, 0) != arr)):
+        raise ValueError("Board values must be 0 or powers of two from 2 to 2^15")
+    exponents = exponents.astype(np.uint64)
+    return int(np.bitwise_or.reduce(exponents << _SHIFTS, axis=None))
+
+
+def unpack(board):
+    """
+    Unpacks a 64-bit board into a 4x4 array of tile values.
+    """
+    exponents = ((np.uint64(board) >> _SHIFTS) & np.uint64(0xF)).astype(int)
+    return np.where(exponents != 0, 1 << exponents, 0)
+
+
+def unpack_into(board, out, scratch):
+    """
+    Unpacks a 64-bit board into an existing 4x4 array
+    without allocating any new arrays, using a 4x4 uint64
+    scratch array for the exponents. Returns the array.
+    """
+    np.right_shift(np.uint64(board), _SHIFTS, out=scratch)
+    np.bitwise_and(scratch, np.uint64(0xF), out=scratch)
+    return np.take(_TILE_VALUES, scratch, out=out)
+
+
+def transpose(board):
+    """
+    Swaps the rows and columns of a packed board.
+    """
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def _move_rows(board, table):
+    """
+    Applies a row table to each of the four rows of a board.
+    Returns the new board and the score gained.
+    """
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = board >> 48
+    new_board = (table[r0] | (table[r1] << 16)
+                 | (table[r2] << 32) | (table[r3] << 48))
+    return new_board, ROW_SCORE[r0] + ROW_SCORE[r1] + ROW_SCORE[r2] + ROW_SCORE[r3]
+
+
+def move(board, direction):
+    """
+    Moves the tiles of a packed board in the given direction.
+    Returns the new board and the score gained. An unknown
+    direction leaves the board unchanged.
+    """
+    if direction == "left":
+        return _move_rows(board, ROW_LEFT)
+    if direction == "right":
+        return _move_rows(board, ROW_RIGHT)
+    if direction == "up":
+        new_board, score = _move_rows(transpose(board), ROW_LEFT)
+        return transpose(new_board), score
+    if direction == "down":
+        new_board, score = _move_rows(transpose(board), ROW_RIGHT)
+        return transpose(new_board), score
+    return board, 0
+
+
+def successors(board):
+    """
+    Moves a packed board in every direction at once.
+    Returns the four new boards in the order of DIRECTIONS,
+    the score gained by each, and a mask of the directions
+    that change the board, like the one of legal_moves.
+    """
+    r0 = board & ROW_MASK
+    r1 = (board >> 16) & ROW_MASK
+    r2 = (board >> 32) & ROW_MASK
+    r3 = board >> 48
+    left = ROW_LEFT[r0] | (ROW_LEFT[r1] << 16) | (ROW_LEFT[r2] << 32) | (ROW_LEFT[r3] << 48)
+    right = ROW_RIGHT[r0] | (ROW_RIGHT[r1] << 16) | (ROW_RIGHT[r2] << 32) | (ROW_RIGHT[r3] << 48)
+    # Rows score the same moving either way
+    row_score = ROW_SCORE[r0] + ROW_SCORE[r1] + ROW_SCORE[r2] + ROW_SCORE[r3]
+
+    columns = transpose(board)
+    c0 = columns & ROW_MASK
+    c1 = (columns >> 16) & ROW_MASK
+    c2 = (columns >> 32) & ROW_MASK
+    c3 = columns >> 48
+    up = transpose(ROW_LEFT[c0] | (ROW_LEFT[c1] << 16) | (ROW_LEFT[c2] << 32) | (ROW_LEFT[c3] << 48))
+    down = transpose(ROW_RIGHT[c0] | (ROW_RIGHT[c1] << 16)
+                     | (ROW_RIGHT[c2] << 32) | (ROW_RIGHT[c3] << 48))
+    column_score = ROW_SCORE[c0] + ROW_SCORE[c1] + ROW_SCORE[c2] + ROW_SCORE[c3]
+
+    moved = (up != board) | ((down != board) << 1) | ((left != board) << 2) | ((right != board) << 3)
+    return (up, down, left, right), (column_score, column_score, row_score, row_score), moved
+
+
+def empty_cells(board):
+    """
+    Returns the indices (row * 4 + col) of the empty cells.
+    """
+    return [i for i in range(16) if not (board >> (4 * i)) & 0xF]
+
+
+def empty_mask(board):
+    """
+    Returns a 16-bit mask of the empty cells,
+    where bit i stands for cell i (row * 4 + col).
+    """
+    return (ROW_EMPTY[board & ROW_MASK] | (ROW_EMPTY[(board >> 16) & ROW_MASK] << 4)
+            | (ROW_EMPTY[(board >> 32) & ROW_MASK] << 8) | (ROW_EMPTY[board >> 48] << 12))
+
+
+def random_cell(mask, u=None):
+    """
+    Picks a random cell from a 16-bit empty cell mask
+    in constant time. Returns None for an empty mask.
+    u is a uniform random number in [0, 1) to pick with,
+    drawn from the random module if not given.
+    """
+    low = mask & 0xFF
+    low_count = POPCOUNT8[low]
+    count = low_count + POPCOUNT8[mask >> 8]
+    if count == 0:
+        return None
+    if u is None:
+        u = random.random()
+    k = int(u * count)
+    if k < low_count:
+        return SELECT8[low][k]
+    return 8 + SELECT8[mask >> 8][k - low_count]
+
+
+def spawn(board, exponent):
+    """
+    Places a tile with the given exponent on a random
+    empty cell. A full board is returned unchanged.
+    """
+    cell = random_cell(empty_mask(board))
+    if cell is None:
+        return board
+    return board | (exponent << (4 * cell))
+
+
+def max_exponent(board):
+    """
+    Returns the largest tile exponent on the board.
+    """
+    return max((board >> (4 * i)) & 0xF for i in range(16))
+
+
+def legal_moves(board):
+    """
+    Returns a 4-bit mask of the directions that change the
+    board, where bit i stands for DIRECTIONS[i].
+    """
+    columns = transpose(board)
+    return (ROW_LEGAL[board & ROW_MASK] | ROW_LEGAL[(board >> 16) & ROW_MASK]
+            | ROW_LEGAL[(board >> 32) & ROW_MASK] | ROW_LEGAL[board >> 48]
+            | COLUMN_LEGAL[columns & ROW_MASK] | COLUMN_LEGAL[(columns >> 16) & ROW_MASK]
+            | COLUMN_LEGAL[(columns >> 32) & ROW_MASK] | COLUMN_LEGAL[columns >> 48])
+
+
+def mask_directions(mask):
+    """
+    Returns the directions set in a legal moves mask.
+    """
+    return [direction for i, direction in enumerate(DIRECTIONS) if mask >> i & 1]
+
+
+def can_move(board):
+    """
+    Checks if a move in any direction changes the board.
+    """
+    return legal_moves(board) != 0
+
+
+# The 8 symmetries of the board. Bit 2 of a transform
+# transposes the board, then bit 0 mirrors the columns
+# (left and right) and bit 1 flips the rows (up and down).
+TRANSFORMS = range(8)
+
+
+def _transform_direction(direction, transform):
+    if transform & 4:
+        direction = {"up": "left", "down": "right",
+                     "left": "up", "right": "down"}[direction]
+    if transform & 1:
+        direction = {"left": "right", "right": "left"}.get(direction, direction)
+    if transform & 2:
+        direction = {"up": "down", "down": "up"}.get(direction, direction)
+    return direction
+
+
+# Direction on a transformed board that matches a direction on
+# the original board, and the other way around
+TRANSFORM_DIRECTIONS = [{direction: _transform_direction(direction, transform)
+                         for direction in DIRECTIONS} for transform in TRANSFORMS]
+RESTORE_DIRECTIONS = [{new: old for old, new in directions.items()}
+                      for directions in TRANSFORM_DIRECTIONS]
+
+# Transform that undoes each transform. Mirroring before a
+# transpose is the same as flipping after it.
+INVERSE_TRANSFORMS = [transform if not transform & 4
+                      else 4 | ((transform & 1) << 1) | ((transform & 2) >> 1)
+                      for transform in TRANSFORMS]
+
+
+def mirror(board):
+    """
+    Reverses the order of the columns of a packed board.
+    """
+    return (ROW_REVERSE[board & ROW_MASK] | (ROW_REVERSE[(board >> 16) & ROW_MASK] << 16)
+            | (ROW_REVERSE[(board >> 32) & ROW_MASK] << 32) | (ROW_REVERSE[board >> 48] << 48))
+
+
+def flip(board):
+    """
+    Reverses the order of the rows of a packed board.
+    """
+    return (((board & ROW_MASK) << 48) | (((board >> 16) & ROW_MASK) << 32)
+            | (((board >> 32) & ROW_MASK) << 16) | (board >> 48))
+
+
+def symmetries(board):
+    """
+    Returns the 8 rotations and reflections of a packed
+    board, in the order of the transforms that make them.
+    """
+    mirrored = mirror(board)
+    transposed = transpose(board)
+    transposed_mirrored = mirror(transposed)
+    return [board, mirrored, flip(board), flip(mirrored),
+            transposed, transposed_mirrored, flip(transposed), flip(transposed_mirrored)]
+
+
+def apply_transform(board, transform):
+    """
+    Applies one of the 8 symmetries to a packed board.
+    """
+    if transform & 4:
+        board = transpose(board)
+    if transform & 1:
+        board = mirror(board)
+    if transform & 2:
+        board = flip(board)
+    return board
+
+
+def canonical_key(board):
+    """
+    Returns the same key for a packed board and all of its
+    rotations and reflections, which all have the same value.
+    """
+    return min(symmetries(board))
+
+
+def canonical(board):
+    """
+    Returns the canonical key of a packed board and the
+    transform that turns the board into it. A move on the
+    key maps back to the board with RESTORE_DIRECTIONS.
+    """
+    boards = symmetries(board)
+    key = min(boards)
+    return key, boards.index(key)
+
+
+def slide_row(row, size, cell_bits=4):
+    """
+    Slides and merges a single packed row of the given
+    size towards its first cell. Returns the new row
+    and the score gained. Tiles at the largest exponent
+    cells of cell_bits bits can hold never merge.
+    """
+    cell_mask = (1 << cell_bits) - 1
+    result = 0
+    score = 0
+    position = 0
+    # Last tile seen that can still merge with the next one
+    pending = 0
+    for shift in range(0, cell_bits * size, cell_bits):
+        tile = (row >> shift) & cell_mask
+        if tile == 0:
+            continue
+        if tile == pending and tile < cell_mask:
+            tile += 1
+            score += 1 << tile
+            result |= tile << position
+            position += cell_bits
+            pending = 0
+        else:
+            if pending:
+                result |= pending << position
+                position += cell_bits
+            pending = tile
+    return result | (pending << position), score
+
+
+# Row tables for sizes too large for full tables are filled in as rows are seen
+class RowTable(dict):
+    """
+    Memo of a function of a packed row, filled in on demand.
+    Rows of larger boards have too many possible values for
+    a full table, but games only ever see a small part of them.
+    The memo is cleared when it grows past max_size.
+    """
+    def __init__(self, function, max_size=1 << 20):
+        super().__init__()
+        self.function = function
+        self.max_size = max_size
+
+    def __missing__(self, row):
+        value = self.function(row)
+        self.store(row, value)
+        return value
+
+    def store(self, row, value):
+        """
+        Memoizes the value of a row computed elsewhere,
+        clearing the memo first if it is full.
+        """
+        if len(self) >= self.max_size:
+            self.clear()
+        self[row] = value
+
+
+def _chunk_table(positions, pieces):
+    """
+    Tabulates every packed chunk of len(positions) cells,
+    as the OR of pieces[tile] << position over its cells,
+    where cell j of the chunk is at positions[j].
+    """
+    table = [0]
+    for position in positions:
+        shifted = [piece << position for piece in pieces]
+        table = [entry | piece for piece in shifted for entry in table]
+    return table
+
+
+def _to_array(values):
+    """
+    Converts a NumPy table to an array of Python ints, which is
+    about as fast to index as a list and much more compact.
+    """
+    return array.array("q", np.asarray(values, dtype=np.int64).tobytes())
+
+
+_WINDOW_LEGAL = {}
+
+
+def _window_legal_table(width, cell_bits):
+    """
+    Returns the legal move table of rows of width cells,
+    shared by every engine with cells of cell_bits bits.
+    Bit 0 of an entry is set if moving the row to its first
+    cell changes it, bit 1 for moving it to its last cell.
+    """
+    key = (width, cell_bits)
+    if key not in _WINDOW_LEGAL:
+        reverse = _chunk_table([cell_bits * (width - 1 - i) for i in range(width)],
+                               range(1 << cell_bits))
+        table = []
+        for row, mirrored in enumerate(reverse):
+            front = slide_row(row, width, cell_bits)[0] != row
+            back = slide_row(mirrored, width, cell_bits)[0] != mirrored
+            table.append(front | (back << 1))
+        _WINDOW_LEGAL[key] = _to_array(table)
+    return _WINDOW_LEGAL[key]
+
+
+def count_max_tiles(board):
+    """
+    Returns the number of tiles of a packed 4x4 board at
+    MAX_EXPONENT, which the packed moves never merge.
+    """
+    return bin(board & (board >> 1) & (board >> 2) & (board >> 3)
+               & 0x1111111111111111).count("1")
+
+
+# Packed board operations for one board size
+class Engine:
+    """
+    Packed board operations for a board of any size.
+    Boards are packed into a Python integer the same way
+    as the 4x4 board, with cell (row, col) at bit offset
+    cell_bits * (size * row + col). Cells have 4 bits up
+    to FULL_TABLE_MAX_SIZE and WIDE_CELL_BITS above it.
+    Tiles at the largest exponent a cell holds never merge,
+    see count_max_tiles.
+    The 4x4 engine uses the fully precomputed tables and
+    unrolled functions of this module. Other sizes up to
+    FULL_TABLE_MAX_SIZE use full row tables, larger ones move
+    rows through tables filled in on demand. Every size
+    transposes, mirrors and finds empty cells with tables
+    of chunks of a few cells.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.cells = size * size
+        self.cell_bits = 4 if size <= FULL_TABLE_MAX_SIZE else WIDE_CELL_BITS
+        self.cell_mask = (1 << self.cell_bits) - 1
+        # Largest tile exponent a cell holds
+        self.max_exponent_limit = self.cell_mask
+        self.row_bits = self.cell_bits * size
+        self.row_mask = (1 << self.row_bits) - 1
+        self.row_shifts = [self.row_bits * r for r in range(size)]
+        self.cell_shifts = [self.cell_bits * i for i in range(self.cells)]
+        # Lowest bit of every cell
+        self.cell_ones = sum(1 << shift for shift in self.cell_shifts)
+        # Bytes needed to hold every 4-bit cell, for packing with NumPy
+        self.byte_count = (self.cells + 1) // 2
+
+        if size == 4:
+            self.pack = pack
+            self.unpack = unpack
+            self.unpack_into = unpack_into
+            self.transpose = transpose
+            self.move = move
+            self.successors = successors
+            self.empty_mask = empty_mask
+            self.random_cell = random_cell
+            self.spawn = spawn
+            self.max_exponent = max_exponent
+            self.legal_moves = legal_moves
+            self.mirror = mirror
+            self.flip = flip
+            self.symmetries = symmetries
+            self.apply_transform = apply_transform
+            self.canonical_key = canonical_key
+            self.canonical = canonical
+            self.count_max_tiles = count_max_tiles
+            return
+
+        if size <= FULL_TABLE_MAX_SIZE:
+            tables = load_row_tables(size)
+            self.left = _to_array(tables["left"])
+            self.right = _to_array(tables["right"])
+            self.score = _to_array(tables["score"])
+            # Bit 0 if moving the row to the front changes it, bit 1 for the back
+            self.legal_table = _to_array(tables["left_changed"] | (tables["right_changed"] << 1))
+            self.legal_mask = self.row_mask
+            self.legal_shifts = self.row_shifts
+        else:
+            bits = self.cell_bits
+            self.left = RowTable(self._slide_left)
+            self.right = RowTable(self._slide_right)
+            self.score = RowTable(lambda row: slide_row(row, size, bits)[1])
+            # A row can move if one of its windows of three cells can,
+            # and windows two cells apart hold every pair of neighbours
+            self.legal_table = _window_legal_table(3, bits)
+            self.legal_mask = (1 << (3 * bits)) - 1
+            windows = sorted({bits * min(start, size - 3) for start in range(0, size - 1, 2)})
+            self.legal_shifts = [shift + window for shift in self.row_shifts for window in windows]
+
+        # Each part is the bit offset and mask of a chunk of cells on the
+        # board, a table of the chunk, and how far to shift its entry.
+        # Chunks of wide cells are kept to 15 bits.
+        bits = self.cell_bits
+        chunk_cells = 4 if bits == 4 else 3
+        self.transpose_parts = []
+        self.mirror_parts = []
+        self.empty_parts = []
+        tiles = range(1 << bits)
+        for start in range(0, size, chunk_cells):
+            width = min(chunk_cells, size - start)
+            mask = (1 << (bits * width)) - 1
+            cells = range(start, start + width)
+            # Places cell i of a row in row i of the first column
+            spread = _chunk_table([i * self.row_bits for i in cells], tiles)
+            reverse = _chunk_table([bits * (size - 1 - i) for i in cells], tiles)
+            empty = _chunk_table(list(cells), [int(tile == 0) for tile in tiles])
+            for r, shift in enumerate(self.row_shifts):
+                self.transpose_parts.append((shift + bits * start, mask, spread, bits * r))
+                self.mirror_parts.append((shift + bits * start, mask, reverse, shift))
+                self.empty_parts.append((shift + bits * start, mask, empty, r * size))
+        self.row_mirror_parts = self.mirror_parts[::size]
+
+    def buffers(self):
+        """
+        Returns a new board array and a scratch array
+        to unpack boards of this size into.
+        """
+        out = np.zeros((self.size, self.size), dtype=int)
+        if self.size == 4:
+            return out, np.zeros((4, 4), dtype=np.uint64)
+        if self.cell_bits != 4:
+            return out, np.zeros(self.cells, dtype=np.intp)
+        return out, np.zeros(2 * self.byte_count, dtype=np.uint8)
+
+    def _slide_left(self, row):
+        new_row, score = slide_row(row, self.size, self.cell_bits)
+        self.score.store(row, score)
+        return new_row
+
+    def _slide_right(self, row):
+        # The score is the same as for moving left
+        new_row, _ = slide_row(self._reverse(row), self.size, self.cell_bits)
+        return self._reverse(new_row)
+
+    def _reverse(self, row):
+        result = 0
+        for shift, mask, table, _ in self.row_mirror_parts:
+            result |= table[(row >> shift) & mask]
+        return result
+
+    def pack(self, arr):
+        """
+        Packs an array of tile values into an integer.
+        Raises a ValueError if the array holds values that
+        are not representable as tile exponents of the cells.
+        """
+        arr = np.asarray(arr)
+        if arr.shape != (self.size, self.size):
+            raise ValueError(f"Board must be {self.size}x{self.size}")
+        if np.any(arr < 0):
+            raise ValueError("Board values must not be negative")
+        exponents = np.zeros(2 * self.byte_count, dtype=np.int64)
+        nonzero = arr.ravel() != 0
+        exponents[:self.cells][nonzero] = np.log2(arr.ravel()[nonzero])
+        # An exponent of 0 would be an empty cell, so tiles start at 2
+        if (np.any(exponents > self.max_exponent_limit)
+                or np.any(nonzero & (exponents[:self.cells] < 1))
+                or np.any(np.where(nonzero, 1 << exponents[:self.cells], 0) != arr.ravel())):
+            raise ValueError(
+                f"Board values must be 0 or powers of two from 2 to 2^{self.max_exponent_limit}")
+        if self.cell_bits != 4:
+            packed = 0
+            for exponent, shift in zip(exponents[:self.cells].tolist(), self.cell_shifts):
+                packed |= exponent << shift
+            return packed
+        packed_bytes = (exponents[0::2] | (exponents[1::2] << 4)).astype(np.uint8)
+        return int.from_bytes(packed_bytes.tobytes(), "little")
+
+    def unpack(self, board):
+        """
+        Unpacks a board into an array of tile values.
+        """
+        return self.unpack_into(board, *self.buffers())
+
+    def unpack_into(self, board, out, scratch):
+        """
+        Unpacks a board into an existing array, using a
+        scratch array from buffers. Returns the array.
+        """
+        if self.cell_bits != 4:
+            mask = self.cell_mask
+            scratch[:] = [(board >> shift) & mask for shift in self.cell_shifts]
+            np.take(_TILE_VALUES, scratch, out=out.reshape(-1))
+            return out
+        raw = np.frombuffer(board.to_bytes(self.byte_count, "little"), dtype=np.uint8)
+        np.bitwise_and(raw, 0xF, out=scratch[0::2])
+        np.right_shift(raw, 4, out=scratch[1::2])
+        np.take(_TILE_VALUES, scratch[:self.cells], out=out.reshape(-1))
+        return out
+
+    def transpose(self, board):
+        """
+        Swaps the rows and columns of a packed board.
+        """
+        result = 0
+        for shift, mask, table, target in self.transpose_parts:
+            result |= table[(board >> shift) & mask] << target
+        return result
+
+    def move(self, board, direction):
+        """
+        Moves the tiles of a packed board in the given direction.
+        Returns the new board and the score gained.
+        """
+        if direction == "left" or direction == "up":
+            table = self.left
+        elif direction == "right" or direction == "down":
+            table = self.right
+        else:
+            return board, 0
+        vertical = direction == "up" or direction == "down"
+        if vertical:
+            board = self.transpose(board)
+
+        new_board = 0
+        score = 0
+        row_score = self.score
+        for shift in self.row_shifts:
+            row = (board >> shift) & self.row_mask
+            new_board |= table[row] << shift
+            score += row_score[row]
+
+        if vertical:
+            new_board = self.transpose(new_board)
+        return new_board, score
+
+    def successors(self, board):
+        """
+        Moves a packed board in every direction at once.
+        Returns the four new boards in the order of DIRECTIONS,
+        the score gained by each, and a mask of the directions
+        that change the board.
+        """
+        # Move the rows of the transposed board for up and down,
+        # both ways in the same pass over the rows
+        moves = []
+        left, right, row_score = self.left, self.right, self.score
+        for source in (self.transpose(board), board):
+            front = back = score = 0
+            for shift in self.row_shifts:
+                row = (source >> shift) & self.row_mask
+                front |= left[row] << shift
+                back |= right[row] << shift
+                score += row_score[row]
+            moves.append((front, back, score))
+        (up, down, column_score), (left, right, row_score) = moves
+        boards = (self.transpose(up), self.transpose(down), left, right)
+        moved = 0
+        for i, new_board in enumerate(boards):
+            moved |= (new_board != board) << i
+        return boards, (column_score, column_score, row_score, row_score), moved
+
+    def empty_mask(self, board):
+        """
+        Returns a mask of the empty cells, where bit i
+        stands for cell i (row * size + col).
+        """
+        mask = 0
+        for shift, chunk_mask, table, target in self.empty_parts:
+            mask |= table[(board >> shift) & chunk_mask] << target
+        return mask
+
+    def random_cell(self, mask, u=None):
+        """
+        Picks a random cell from an empty cell mask, with the
+        uniform random number u if given.
+        Returns None for an empty mask.
+        """
+        count = bin(mask).count("1")
+        if count == 0:
+            return None
+        if u is None:
+            u = random.random()
+        k = int(u * count)
+        offset = 0
+        while True:
+            byte = mask & 0xFF
+            if k < POPCOUNT8[byte]:
+                return offset + SELECT8[byte][k]
+            k -= POPCOUNT8[byte]
+            mask >>= 8
+            offset += 8
+
+    def spawn(self, board, exponent):
+        """
+        Places a tile with the given exponent on a random
+        empty cell. A full board is returned unchanged.
+        """
+        cell = self.random_cell(self.empty_mask(board))
+        if cell is None:
+            return board
+        return board | (exponent << (self.cell_bits * cell))
+
+    def max_exponent(self, board):
+        """
+        Returns the largest tile exponent on the board.
+        """
+        return max((board >> shift) & self.cell_mask for shift in self.cell_shifts)
+
+    def count_max_tiles(self, board):
+        """
+        Returns the number of tiles at the largest exponent
+        a cell holds, which the packed moves never merge.
+        """
+        at_max = board
+        for i in range(1, self.cell_bits):
+            at_max &= board >> i
+        return bin(at_max & self.cell_ones).count("1")
+
+    def legal_moves(self, board):
+        """
+        Returns a 4-bit mask of the directions that change the
+        board, where bit i stands for DIRECTIONS[i].
+        """
+        rows = columns = 0
+        transposed = self.transpose(board)
+        table, window = self.legal_table, self.legal_mask
+        for shift in self.legal_shifts:
+            rows |= table[(board >> shift) & window]
+            columns |= table[(transposed >> shift) & window]
+        return (rows << 2) | columns
+
+    def mirror(self, board):
+        """
+        Reverses the order of the columns of a packed board.
+        """
+        result = 0
+        for shift, mask, table, target in self.mirror_parts:
+            result |= table[(board >> shift) & mask] << target
+        return result
+
+    def flip(self, board):
+        """
+        Reverses the order of the rows of a packed board.
+        """
+        result = 0
+        last = self.row_shifts[-1]
+        for shift in self.row_shifts:
+            result |= ((board >> shift) & self.row_mask) << (last - shift)
+        return result
+
+    def symmetries(self, board):
+        """
+        Returns the 8 rotations and reflections of a packed
+        board, in the order of the transforms that make them.
+        """
+        mirrored = self.mirror(board)
+        transposed = self.transpose(board)
+        transposed_mirrored = self.mirror(transposed)
+        return [board, mirrored, self.flip(board), self.flip(mirrored),
+                transposed, transposed_mirrored,
+                self.flip(transposed), self.flip(transposed_mirrored)]
+
+    def apply_transform(self, board, transform):
+        """
+        Applies one of the 8 symmetries to a packed board.
+        """
+        if transform & 4:
+            board = self.transpose(board)
+        if transform & 1:
+            board = self.mirror(board)
+        if transform & 2:
+            board = self.flip(board)
+        return board
+
+    def canonical_key(self, board):
+        """
+        Returns the same key for a packed board and all
+        of its rotations and reflections.
+        """
+        return min(self.symmetries(board))
+
+    def canonical(self, board):
+        """
+        Returns the canonical key of a packed board and
+        the transform that turns the board into it.
+        """
+        boards = self.symmetries(board)
+        key = min(boards)
+        return key, boards.index(key)
+
+
+_ENGINES = {}
+
+
+def get_engine(size):
+    """
+    Returns the shared engine for boards of the given size.
+    """
+    if size not in _ENGINES:
+        _ENGINES[size] = Engine(size)
+    return _ENGINES[size]
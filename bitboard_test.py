@@ -0,0 +1,283 @@
+import bitboard as bb
+import gamelogic as gl
+import os
+import tempfile
+import unittest
+import numpy as np
+
+class TestBitboard(unittest.TestCase):
+
+    def random_board(self, rng):
+        # Random board with a mix of empty spaces and small tiles
+        exponents = rng.integers(0, 8, size=(4, 4))
+        exponents[rng.random((4, 4)) < 0.3] = 0
+        return np.where(exponents != 0, 1 << exponents, 0)
+
+    def test_pack_unpack(self):
+        board = np.array([[2, 4, 0, 2],
+                          [0, 0, 8, 0],
+                          [0, 16, 0, 0],
+                          [32, 0, 0, 32768]])
+
+        # Check if packing and unpacking gives back the same board
+        self.assertTrue(
+            np.array_equal(bb.unpack(bb.pack(board)), board),
+            "Unpacking a packed board should give the same board")
+
+        # Check that unpacking into an existing array fills it in place
+        out = np.zeros((4, 4), dtype=int)
+        scratch = np.zeros((4, 4), dtype=np.uint64)
+        self.assertIs(bb.unpack_into(bb.pack(board), out, scratch), out)
+        self.assertTrue(np.array_equal(out, board))
+
+        # Check that values the engine can't represent are rejected
+        for bad_value in (1, 3, 65536, -2):
+            bad_board = np.copy(board)
+            bad_board[1, 1] = bad_value
+            with self.assertRaises(ValueError):
+                bb.pack(bad_board)
+        for size, largest in ((3, 1 << 15), (8, 1 << 31)):
+            for bad_value in (1, 3, 2 * largest, -2):
+                with self.assertRaises(ValueError):
+                    bb.get_engine(size).pack(np.full((size, size), bad_value))
+
+        # A 1 would be packed as an empty cell, so the board keeps it
+        # and moves with the array operations
+        board_instance = gl.Board()
+        board_instance.board = np.array([[1, 1, 0, 2]] + [[0] * 4] * 3)
+        self.assertIsNone(board_instance.packed)
+        self.assertEqual(board_instance.board[0, 0], 1)
+
+        print("Test pack_unpack passed")
+
+    def test_transpose(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            board = self.random_board(rng)
+            self.assertTrue(
+                np.array_equal(bb.unpack(bb.transpose(bb.pack(board))), board.T),
+                "Transposing a packed board should swap rows and columns")
+
+        print("Test transpose passed")
+
+    def test_move_matches_array_move(self):
+        rng = np.random.default_rng(1)
+        board_instance = gl.Board()
+        for _ in range(200):
+            board = self.random_board(rng)
+            for direction in bb.DIRECTIONS:
+                # Move the board with the array operations
+                board_instance.board = np.copy(board)
+                board_instance.score = 0
+                board_instance.move_array(direction)
+
+                new_board, score = bb.move(bb.pack(board), direction)
+                self.assertTrue(
+                    np.array_equal(bb.unpack(new_board), board_instance.board),
+                    f"Packed move {direction} should match the array move")
+                self.assertEqual(
+                    score,
+                    board_instance.score,
+                    f"Packed move {direction} should score the same as the array move")
+
+        print("Test move_matches_array_move passed")
+
+    def test_legal_moves(self):
+        rng = np.random.default_rng(2)
+        for _ in range(200):
+            board = bb.pack(self.random_board(rng))
+
+            # Check the mask against trying every direction
+            expected = 0
+            for i, direction in enumerate(bb.DIRECTIONS):
+                if bb.move(board, direction)[0] != board:
+                    expected |= 1 << i
+            self.assertEqual(bb.legal_moves(board), expected)
+
+        print("Test legal_moves passed")
+
+    def test_empty_mask(self):
+        rng = np.random.default_rng(3)
+        for _ in range(100):
+            board = bb.pack(self.random_board(rng))
+            mask = bb.empty_mask(board)
+            self.assertEqual(
+                [i for i in range(16) if mask >> i & 1],
+                bb.empty_cells(board),
+                "The mask should hold the empty cells")
+
+        # Check that random cells are always empty and cover every empty cell
+        mask = 0b1000_0001_0010_0100
+        picked = {bb.random_cell(mask) for _ in range(500)}
+        self.assertEqual(picked, {2, 5, 8, 15})
+        self.assertIsNone(bb.random_cell(0), "A full board has no empty cell")
+
+        print("Test empty_mask passed")
+
+    def test_spawn(self):
+        board = bb.pack(np.array([[2, 4, 0, 2],
+                                  [4, 2, 8, 2],
+                                  [2, 16, 2, 4],
+                                  [32, 2, 4, 64]]))
+
+        # Check that the only empty space is filled
+        self.assertEqual(bb.empty_cells(board), [2])
+        self.assertEqual(bb.unpack(bb.spawn(board, 2))[0, 2], 4)
+
+        # Check that a full board is unchanged
+        full_board = bb.spawn(board, 1)
+        self.assertEqual(bb.spawn(full_board, 1), full_board)
+
+        print("Test spawn passed")
+
+    def test_row_tables(self):
+        tables = bb.build_row_tables()
+
+        # Check a few known rows (first column in the low nibble)
+        self.assertEqual(tables["left"][0x1111], 0x0022)
+        self.assertEqual(tables["right"][0x1111], 0x2200)
+        self.assertEqual(tables["score"][0x1111], 8)
+        self.assertEqual(tables["left"][0x1001], 0x0002)
+        self.assertEqual(tables["score"][0x0000], 0)
+
+        # Check the changed flags against the move results
+        rows = np.arange(bb.ROW_MASK + 1)
+        self.assertTrue(np.array_equal(tables["left_changed"], tables["left"] != rows))
+        self.assertFalse(tables["left_changed"][0x0021])
+        self.assertTrue(tables["right_changed"][0x0021])
+
+        # Check that tables are saved and loaded from the cache
+        with tempfile.TemporaryDirectory() as cache_dir:
+            built = bb.load_row_tables(cache_dir=cache_dir)
+            loaded = bb.load_row_tables(cache_dir=cache_dir)
+            for name, table in tables.items():
+                self.assertTrue(np.array_equal(built[name], table))
+                self.assertTrue(np.array_equal(loaded[name], table))
+
+            # Damaged cache files are rebuilt
+            expected = bb.build_row_tables(2)
+            path = os.path.join(cache_dir, f"row_tables_v{bb.TABLE_VERSION}_2.npz")
+            short = {name: table[:10] for name, table in expected.items()}
+            for write in (lambda f: None, lambda f: f.write(b"PK\x03\x04 not a zip file"),
+                          lambda f: np.savez(f, **short)):
+                with open(path, "wb") as f:
+                    write(f)
+                rebuilt = bb.load_row_tables(2, cache_dir=cache_dir)
+                for name, table in expected.items():
+                    self.assertTrue(np.array_equal(rebuilt[name], table))
+                with np.load(path) as cached:
+                    self.assertEqual(len(cached["left"]), len(expected["left"]))
+
+        print("Test row_tables passed")
+
+    def test_symmetries(self):
+        board = np.array([[2, 4, 0, 2],
+                          [0, 0, 8, 0],
+                          [0, 16, 0, 0],
+                          [32, 0, 0, 64]])
+        packed = bb.pack(board)
+        self.assertEqual(bb.unpack(bb.mirror(packed)).tolist(), board[:, ::-1].tolist())
+        self.assertEqual(bb.unpack(bb.flip(packed)).tolist(), board[::-1].tolist())
+
+        rng = np.random.default_rng(5)
+        for size in (3, 4, 5):
+            engine = bb.get_engine(size)
+            for _ in range(50):
+                exponents = rng.integers(0, 6, size=(size, size))
+                exponents[rng.random((size, size)) < 0.3] = 0
+                packed = engine.pack(np.where(exponents != 0, 1 << exponents, 0))
+                key, transform = engine.canonical(packed)
+                self.assertEqual(engine.apply_transform(packed, transform), key)
+
+                for transform, symmetry in enumerate(engine.symmetries(packed)):
+                    # Check that every symmetry has the same key and can be undone
+                    self.assertEqual(engine.canonical_key(symmetry), key)
+                    self.assertEqual(
+                        engine.apply_transform(symmetry, bb.INVERSE_TRANSFORMS[transform]),
+                        packed)
+
+                    # Check that moves map onto the matching direction
+                    for direction in bb.DIRECTIONS:
+                        new_board, score = engine.move(packed, direction)
+                        mapped = bb.TRANSFORM_DIRECTIONS[transform][direction]
+                        self.assertEqual(
+                            engine.move(symmetry, mapped),
+                            (engine.apply_transform(new_board, transform), score))
+                        self.assertEqual(bb.RESTORE_DIRECTIONS[transform][mapped], direction)
+
+        print("Test symmetries passed")
+
+    def test_successors(self):
+        rng = np.random.default_rng(6)
+        for size in (3, 4, 5, 6, 8):
+            engine = bb.get_engine(size)
+            for _ in range(100):
+                exponents = rng.integers(0, 6, size=(size, size))
+                exponents[rng.random((size, size)) < 0.3] = 0
+                packed = engine.pack(np.where(exponents != 0, 1 << exponents, 0))
+
+                # Check every afterstate against moving in one direction
+                boards, scores, moved = engine.successors(packed)
+                for i, direction in enumerate(bb.DIRECTIONS):
+                    self.assertEqual((boards[i], scores[i]), engine.move(packed, direction))
+                self.assertEqual(moved, engine.legal_moves(packed))
+
+        print("Test successors passed")
+
+    def test_engine_sizes(self):
+        rng = np.random.default_rng(4)
+        for size in (2, 3, 5, 6, 7, 8):
+            engine = bb.get_engine(size)
+            board_instance = gl.Board(size=size)
+            for _ in range(50):
+                exponents = rng.integers(0, 6, size=(size, size))
+                exponents[rng.random((size, size)) < 0.3] = 0
+                board = np.where(exponents != 0, 1 << exponents, 0)
+                packed = engine.pack(board)
+                self.assertTrue(np.array_equal(engine.unpack(packed), board))
+                self.assertTrue(
+                    np.array_equal(engine.unpack(engine.transpose(packed)), board.T))
+                self.assertTrue(
+                    np.array_equal(engine.unpack(engine.mirror(packed)), board[:, ::-1]))
+
+                legal = 0
+                for i, direction in enumerate(bb.DIRECTIONS):
+                    # Move the board with the array operations
+                    board_instance.board = np.copy(board)
+                    board_instance.score = 0
+                    board_instance.move_array(direction)
+
+                    new_board, score = engine.move(packed, direction)
+                    self.assertTrue(
+                        np.array_equal(engine.unpack(new_board), board_instance.board),
+                        f"{size}x{size} move {direction} should match the array move")
+                    self.assertEqual(score, board_instance.score)
+                    if new_board != packed:
+                        legal |= 1 << i
+                self.assertEqual(engine.legal_moves(packed), legal)
+
+                mask = engine.empty_mask(packed)
+                self.assertEqual(
+                    [i for i in range(size * size) if mask >> i & 1],
+                    list(np.flatnonzero(board == 0)))
+
+        print("Test engine_sizes passed")
+
+    def test_row_table_size(self):
+        # Rows of 6x6 boards are memoized instead of tabulated
+        engine = bb.Engine(6)
+        for table in (engine.left, engine.right, engine.score):
+            table.max_size = 100
+        for row in range(1, 1001):
+            engine.left[row]
+            engine.right[row]
+        self.assertLessEqual(len(engine.left), 100)
+        self.assertLessEqual(len(engine.right), 100)
+        self.assertLessEqual(len(engine.score), 100, "The score memo should be bounded too")
+        self.assertEqual(engine.score[1000], bb.slide_row(1000, 6, engine.cell_bits)[1])
+
+        print("Test row_table_size passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
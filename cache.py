@@ -0,0 +1,229 @@
+"""
+Persistent position cache shared across processes.
+
+A PositionCache is a hash table of fixed size kept in a
+memory-mapped .npy file. It maps packed boards (usually
+canonical keys, see bitboard.canonical_key) to the value
+found by a search, the depth of that search, and the best
+move for boards searched from the root. Every process
+opening the file maps the same pages, so a cache of any
+size costs each process no copy of its own.
+
+The table is split into buckets of BUCKET_SLOTS entries of
+four 64-bit words: the key, the bits of the float64 value,
+an info word holding the depth and the move, and a check
+word, the XOR of the other three. Processes write entries
+without locking; an entry torn by two processes writing at
+once fails its check and reads as a miss. A full bucket
+replaces its entry from the shallowest search.
+
+The settings of the searches that fill the table, such as
+their pruning probability and the version of their
+heuristic, are kept as JSON in a companion file next to
+it (the path with ".json" appended). A cache is never
+opened with settings other than the ones it was made with.
+The settings are written just after the table, so a cache
+should be created once before the processes sharing it
+start, as simulate.py does.
+
+Example:
+    python simulate.py --policy expectimax --games 100 --cache positions.npy
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+# Entries per bucket, checked together on every lookup
+BUCKET_SLOTS = 4
+# Default number of entries, 32 bytes each
+DEFAULT_SLOTS = 1 << 22
+# Move stored for values of chance nodes
+CHANCE = 0xFF
+# Fibonacci hashing multiplier spreading keys over the buckets
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+_WORD_MASK = (1 << 64) - 1
+
+
+def _float_bits(value):
+    return struct.unpack("<Q", struct.pack("<d", value))[0]
+
+
+def _bits_float(bits):
+    return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+
+def settings_path(path):
+    """
+    Returns the path of the file keeping the settings of
+    the cache at path.
+    """
+    return f"{path}.json"
+
+
+def _link(temp_path, path):
+    """
+    Moves the file at temp_path to path, unless another
+    process created a file there first. Returns whether
+    the file was moved.
+    """
+    try:
+        # Unlike replacing it, linking never swaps the file
+        # under a process that already opened another one
+        os.link(temp_path, path)
+        return True
+    except FileExistsError:
+        # Another process created it first, and its file is used
+        return False
+    except OSError:
+        # Filesystems without hard links
+        if os.path.exists(path):
+            return False
+        os.replace(temp_path, path)
+        return True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _read_settings(path):
+    """
+    Returns the settings stored for the cache at path,
+    or None if it has none.
+    """
+    try:
+        with open(settings_path(path)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def _create(path, slots, settings=None):
+    """
+    Creates an empty table with room for `slots` entries
+    (rounded up to a power of two) at path, unless another
+    process creates one there first. The process creating
+    the table stores its settings, replacing any left by
+    a table deleted before.
+    """
+    buckets = 1 << max(0, (int(slots) - 1).bit_length() - 2)
+    # Write the table to a temporary file of this process first,
+    # so that other processes never map a half-written one
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    table = np.lib.format.open_memmap(
+        temp_path, mode="w+", dtype=np.uint64, shape=(buckets, BUCKET_SLOTS, 4))
+    table.flush()
+    del table
+    if not _link(temp_path, path):
+        return
+    if settings is None:
+        if os.path.exists(settings_path(path)):
+            os.remove(settings_path(path))
+        return
+    temp_path = f"{settings_path(path)}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(settings, file, sort_keys=True)
+    os.replace(temp_path, settings_path(path))
+
+
+# Hash table of searched positions in a shared file
+class PositionCache:
+    """
+    Memory-mapped table of searched positions, created with
+    `slots` entries (rounded up to a power of two) if the
+    file doesn't exist yet. Open it with mode "r" to only
+    read it. The empty board (key 0) is never stored.
+    A new cache keeps the given settings (a dict that can be
+    written as JSON), and an existing one is only opened if
+    it was made with the same settings. Without settings,
+    the cache is opened whatever its settings are.
+    """
+    def __init__(self, path, slots=DEFAULT_SLOTS, mode="r+", settings=None):
+        if not os.path.exists(path):
+            if mode == "r":
+                raise FileNotFoundError(path)
+            _create(path, slots, settings)
+        self.settings = _read_settings(path)
+        if settings is not None and self.settings != settings:
+            raise ValueError(f"{path} was made with the settings {self.settings}, not {settings}")
+        self.path = path
+        self.mode = mode
+        self.words = np.load(path, mmap_mode=mode)
+        if self.words.ndim != 3 or self.words.shape[1:] != (BUCKET_SLOTS, 4):
+            raise ValueError(f"{path} is not a position cache")
+        self.buckets = self.words.shape[0]
+        self._shift = 64 - (self.buckets.bit_length() - 1)
+        self.hits = 0
+        self.misses = 0
+
+    def _bucket(self, key):
+        # Top bits of the hashed key, which mix all of its bits
+        if self._shift == 64:
+            return 0
+        return ((key * _HASH_MULTIPLIER) & _WORD_MASK) >> self._shift
+
+    def get(self, key, chance=False):
+        """
+        Returns the value, depth and move (an index into
+        bitboard.DIRECTIONS) stored for a board searched from
+        the root, or the value and depth of a chance node with
+        chance=True (the move is then CHANCE). Returns None
+        if the board isn't in the cache.
+        """
+        for stored, bits, info, check in self.words[self._bucket(key)].tolist():
+            if stored == key and check == stored ^ bits ^ info and key:
+                move = info >> 8
+                if (move == CHANCE) == chance:
+                    self.hits += 1
+                    return _bits_float(bits), info & 0xFF, move
+        self.misses += 1
+        return None
+
+    def put(self, key, value, depth, move=CHANCE):
+        """
+        Stores the result of a search of the given depth.
+        Results from shallower searches than the one already
+        stored for the board are ignored. Does nothing in
+        read-only mode.
+        """
+        if self.mode == "r" or not key:
+            return
+        bucket = self._bucket(key)
+        entries = self.words[bucket].tolist()
+        replace = 0
+        for i, (stored, bits, info, check) in enumerate(entries):
+            valid = check == stored ^ bits ^ info and stored != 0
+            if not valid:
+                replace = i
+                break
+            if stored == key and ((info >> 8) == CHANCE) == (move == CHANCE):
+                if (info & 0xFF) > depth:
+                    return
+                replace = i
+                break
+            if (info & 0xFF) < (entries[replace][2] & 0xFF):
+                replace = i
+        bits = _float_bits(value)
+        info = min(depth, 0xFF) | (move << 8)
+        self.words[bucket, replace] = (key, bits, info, key ^ bits ^ info)
+
+    def __len__(self):
+        """
+        Counts the entries in the table by scanning it.
+        """
+        words = self.words
+        valid = (words[..., 0] != 0) & (
+            words[..., 3] == words[..., 0] ^ words[..., 1] ^ words[..., 2])
+        return int(np.count_nonzero(valid))
+
+    @property
+    def slots(self):
+        return self.buckets * BUCKET_SLOTS
+
+    def flush(self):
+        """
+        Writes changed pages back to the file.
+        """
+        if self.mode != "r":
+            self.words.flush()
@@ -0,0 +1,154 @@
+import bitboard as bb
+import cache
+import gamelogic as gl
+import multiprocessing
+import os
+import solver
+import tempfile
+import unittest
+import numpy as np
+
+def fill_cache(path):
+    # Worker writing to a cache opened by another process
+    position_cache = cache.PositionCache(path)
+    for key in range(1, 101):
+        position_cache.put(key, key / 2, 3, key % 4)
+    position_cache.flush()
+
+class TestPositionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "positions.npy")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_put(self):
+        position_cache = cache.PositionCache(self.path, slots=64)
+        self.assertEqual(position_cache.slots, 64)
+        self.assertIsNone(position_cache.get(123))
+
+        position_cache.put(123, 4.5, 3, 2)
+        position_cache.put(123, -1.0, 2)
+        self.assertEqual(position_cache.get(123), (4.5, 3, 2))
+        self.assertEqual(position_cache.get(123, chance=True), (-1.0, 2, cache.CHANCE))
+
+        # Results of shallower searches don't replace deeper ones
+        position_cache.put(123, 9.0, 1, 0)
+        self.assertEqual(position_cache.get(123), (4.5, 3, 2))
+        position_cache.put(123, 9.0, 4, 0)
+        self.assertEqual(position_cache.get(123), (9.0, 4, 0))
+        self.assertEqual(len(position_cache), 2)
+
+        # Check that torn entries read as misses
+        words = position_cache.words[position_cache._bucket(123)]
+        words[words[:, 0] == 123, 1] ^= np.uint64(1)
+        self.assertIsNone(position_cache.get(123))
+        self.assertIsNone(position_cache.get(123, chance=True))
+
+        print("Test get_put passed")
+
+    def test_eviction(self):
+        # A single bucket keeps the deepest results
+        position_cache = cache.PositionCache(self.path, slots=cache.BUCKET_SLOTS)
+        for key, depth in [(1, 5), (2, 2), (3, 4), (4, 3), (5, 6)]:
+            position_cache.put(key, float(key), depth, 0)
+        self.assertEqual(len(position_cache), cache.BUCKET_SLOTS)
+        self.assertIsNone(position_cache.get(2), "The shallowest result should be replaced")
+        for key in (1, 3, 4, 5):
+            self.assertEqual(position_cache.get(key)[0], key)
+
+        print("Test eviction passed")
+
+    def test_shared_file(self):
+        cache.PositionCache(self.path, slots=1024)
+        process = multiprocessing.get_context("spawn").Process(target=fill_cache, args=(self.path,))
+        process.start()
+        process.join()
+
+        # Check that the entries written by the other process can be read
+        reader = cache.PositionCache(self.path, mode="r")
+        self.assertEqual(reader.get(42), (21.0, 3, 2))
+        self.assertEqual(len(reader), 100)
+        reader.put(1000, 1.0, 9, 0)
+        self.assertIsNone(reader.get(1000), "A read-only cache should not change")
+        with self.assertRaises(FileNotFoundError):
+            cache.PositionCache(self.path + ".missing", mode="r")
+
+        print("Test shared_file passed")
+
+    def test_create_race(self):
+        first = cache.PositionCache(self.path, slots=64)
+        first.put(7, 1.5, 3, 1)
+
+        # A process that loses the race to create the file keeps the
+        # table of the winner instead of replacing it
+        cache._create(self.path, slots=1024)
+        second = cache.PositionCache(self.path)
+        self.assertEqual(second.slots, 64)
+        self.assertEqual(second.get(7), (1.5, 3, 1))
+        second.put(8, 2.5, 3, 0)
+        self.assertEqual(first.get(8), (2.5, 3, 0), "Both should map the same table")
+        self.assertEqual(os.listdir(self.directory.name), ["positions.npy"])
+
+        print("Test create_race passed")
+
+    def test_expectimax_cache(self):
+        board_instance = gl.Board(seed=0)
+        for direction in ["up", "left", "down", "right"] * 5:
+            board_instance.move(direction)
+        expected = solver.Expectimax(depth=3).best_move(board_instance)
+
+        position_cache = cache.PositionCache(
+            self.path, slots=1 << 16, settings=solver.cache_settings())
+        cold = solver.Expectimax(depth=3, cache=position_cache)
+        self.assertEqual(cold.best_move(board_instance), expected)
+        self.assertGreater(len(position_cache), 1, "Deep chance nodes should be cached")
+
+        # Check that a new solver gets the move from the cache for
+        # every symmetry of the board without searching
+        warm = solver.Expectimax(depth=3, cache=position_cache)
+        for transform, symmetry in enumerate(bb.symmetries(board_instance.packed)):
+            self.assertEqual(warm.best_move(symmetry), bb.TRANSFORM_DIRECTIONS[transform][expected])
+        self.assertEqual(warm.nodes, 0)
+
+        # Check that deeper results are only reused when asked for
+        shallow = solver.Expectimax(depth=2, cache=position_cache)
+        self.assertEqual(shallow.best_move(board_instance),
+                         solver.Expectimax(depth=2).best_move(board_instance))
+        self.assertGreater(shallow.nodes, 0)
+        reusing = solver.Expectimax(depth=2, cache=position_cache, reuse_deeper=True)
+        self.assertEqual(reusing.best_move(board_instance), expected)
+        self.assertEqual(reusing.nodes, 0)
+
+        print("Test expectimax_cache passed")
+
+    def test_settings(self):
+        settings = solver.cache_settings()
+        position_cache = cache.PositionCache(self.path, slots=64, settings=settings)
+        self.assertEqual(cache.PositionCache(self.path, settings=settings).settings, settings)
+        self.assertEqual(cache.PositionCache(self.path, mode="r").settings, settings)
+
+        # Check that caches made with other settings are refused
+        with self.assertRaises(ValueError):
+            cache.PositionCache(self.path, settings=solver.cache_settings(1e-3))
+        with self.assertRaises(ValueError):
+            solver.Expectimax(min_probability=1e-3, cache=position_cache)
+        other_path = os.path.join(self.directory.name, "other.npy")
+        with self.assertRaises(ValueError):
+            solver.Expectimax(cache=cache.PositionCache(other_path, slots=64))
+
+        # A new table replaces the settings left by a deleted one
+        os.remove(self.path)
+        new_settings = solver.cache_settings(1e-3)
+        remade = cache.PositionCache(self.path, slots=64, settings=new_settings)
+        self.assertEqual(remade.settings, new_settings)
+        os.remove(self.path)
+        self.assertIsNone(cache.PositionCache(self.path, slots=64).settings)
+
+        print("Test settings passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,13 @@
 import tkinter as tk
 from tkinter import font as tkFont
+import numpy as np
 import gamelogic as gl
+import solver
+
+# Moves skipped by the Up and Down keys in replays
+REPLAY_SKIP = 100
+# Milliseconds between checks for the result of a hint search
+HINT_POLL_MS = 10
 
 # List of color codes for different numbers
 color_dict = {
@@ -18,29 +25,104 @@ color_dict = {
             2048: "#5627DB"
         }
 
+
+def tile_color(value):
+    """
+    Returns the color of a tile. Tiles beyond 2048
+    get darker shades of the 2048 color, and any other
+    value without a color of its own is gray.
+    """
+    if value in color_dict:
+        return color_dict[value]
+    value = int(value)
+    if value <= 2048 or value & (value - 1):
+        return "gray"
+    shade = 0.8 ** (value.bit_length() - 12)
+    channels = (int(color_dict[2048][i:i + 2], 16) for i in (1, 3, 5))
+    return "#" + "".join(f"{min(max(int(c * shade), 0), 0xFF):02X}" for c in channels)
+
+
+# Shared fonts and styles for the cells of one board size
+class CellStyles:
+    """
+    Fonts, cell sizes and per-value colors for a board of 
+    the given size. Built once and shared by every cell 
+    instead of being recreated for each one.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.font = tkFont.Font(
+            family='SimSun', 
+            size=int(110 / size), 
+            weight='bold')
+        cell_size = int(35 / size)
+        self.frame_options = {
+            "relief": tk.RAISED,
+            "borderwidth": int(50 / size)
+        }
+        self.label_options = {
+            "width": cell_size,
+            "height": int(cell_size / 1.8),
+            "font": self.font
+        }
+        self.values = {}
+
+    def style(self, value):
+        """
+        Returns the text, background color and text
+        color of a cell with the given value.
+        """
+        style = self.values.get(value)
+        if style is None:
+            text = str(value) if value != 0 else ""
+            if value <= 4 or value == 2048:
+                fg_color = "black"
+            else:
+                fg_color = "white"
+            style = (text, tile_color(value), fg_color)
+            self.values[value] = style
+        return style
+
 # Class to represent display of game
 class GameBoard(tk.Frame):
 
-    def __init__(self, master=None):
+    def __init__(self, master=None, difficulty=None, size=4, replay=None):
         tk.Frame.__init__(self, master)
         self.master.title('2048')
         self.master.bind("<Key>", self.key_event)
-        self.rules = "Press R to reset board\nPress O to quit"
-        self.difficulty = input("Please choose difficulty (Easy/Normal/Hard): ").lower()
-        if self.difficulty == "easy":
-            self.board = gl.BoardEasy()
-            self.rules += "\nPress C to clear the board\nif you're stuck"
-        elif self.difficulty == "normal":
-            self.board = gl.Board()
-        elif self.difficulty == "hard":
-            self.board = gl.BoardHard()
-            self.rules += "\nMultiple numbers may\n appear at once!\n"
+        self.rules = ("Press R to reset board\nPress U to undo a move\nPress Y to redo it\n"
+                      "Press H for a hint\nPress O to quit")
+        # Replay of a recorded game shown instead of a new game
+        self.replay = replay
+        if replay is not None:
+            self.board = replay.board
+            self.difficulty = replay.board.difficulty
+            self.rules = ("Press Right/Left to step\nthrough the moves\n"
+                          "Press Up/Down to skip\n" + str(REPLAY_SKIP) + " moves\n"
+                          "Press Home/End to go to\nthe start or the end\nPress O to quit")
         else:
-            raise ValueError("Difficulty must be Easy/Normal/Hard")
+            if difficulty is None:
+                difficulty = input("Please choose difficulty (Easy/Normal/Hard): ")
+            self.difficulty = difficulty.lower()
+            if self.difficulty == "easy":
+                self.board = gl.BoardEasy(size=size)
+                self.rules += "\nPress C to clear the board\nif you're stuck"
+            elif self.difficulty == "normal":
+                self.board = gl.Board(size=size)
+            elif self.difficulty == "hard":
+                self.board = gl.BoardHard(size=size)
+                self.rules += "\nMultiple numbers may\n appear at once!\n"
+            else:
+                raise ValueError("Difficulty must be Easy/Normal/Hard")
         
+        self.styles = None
+        # Hint searches run in a worker thread, see request_hint
+        self.hint_search = None
+        self.hint_board = None
         self.draw_grid()
-        self.win_displayed = False
-        self.loss_displayed = False
+        # Replays don't show the win and loss screens
+        self.win_displayed = replay is not None
+        self.loss_displayed = replay is not None
 
 
     def draw_grid(self):
@@ -50,38 +132,29 @@ class GameBoard(tk.Frame):
         Also creates a scoreboard, difficulty display,
         and a side panel with the rules.
         """
+        # Keep the cell labels and the values they show
+        # so that updates only touch the cells that changed
+        self.cells = []
+        self.rendered = np.copy(self.board.board)
+        if self.styles is None or self.styles.size != self.board.size:
+            self.styles = CellStyles(self.board.size)
         for i in range(self.board.size):
             self.columnconfigure(i, weight=1)
             self.rowconfigure(i, weight=1)
+            self.cells.append([])
             for j in range(self.board.size):
-                frame = tk.Frame(
-                    master=self,
-                    relief=tk.RAISED,
-                    borderwidth=int(50/self.board.size)
-                )
-                cell_value = self.board.board[i][j]
-                number = str(cell_value) if cell_value != 0 else ""
-
-                label_font_size = int(110 / self.board.size)
-                cell_size = int(35 / self.board.size)
-                label_font = tkFont.Font(
-                    family='SimSun', 
-                    size=label_font_size, 
-                    weight='bold')
+                frame = tk.Frame(master=self, **self.styles.frame_options)
+                text, bg_color, fg_color = self.styles.style(self.board.board[i][j])
                 cell_label = tk.Label(
                     master=frame,
-                    width=cell_size,
-                    height=int(cell_size / 1.8),
-                    font=label_font
+                    text=text,
+                    bg=bg_color,
+                    fg=fg_color,
+                    **self.styles.label_options
                 )
-                bg_color = color_dict[cell_value]
-                fg_color = "black" if cell_value <= 4 else "white"
-                cell_label.config(
-                    text=number, 
-                    bg=bg_color, 
-                    fg=fg_color)
                 frame.grid(row=i, column=j)
                 cell_label.pack() 
+                self.cells[i].append(cell_label)
 
         # Scoreboard Initialization
         scoreboard = tk.Frame(
@@ -97,10 +170,27 @@ class GameBoard(tk.Frame):
 
         score_label = tk.Label(
             master=scoreboard,
-            text="Score: 0",
+            text=f"Score: {self.board.score}",
             font=('SimSun', 20, 'bold')
         )
         score_label.pack(fill=tk.BOTH, expand=True)
+        self.score_label = score_label
+        self.rendered_score = self.board.score
+
+        self.hint_label = tk.Label(
+            master=scoreboard,
+            text="",
+            font=('SimSun', 20, 'bold')
+        )
+        self.hint_label.pack(fill=tk.BOTH, expand=True)
+
+        if self.replay is not None:
+            self.move_label = tk.Label(
+                master=scoreboard,
+                text=self.replay_text(),
+                font=('SimSun', 20, 'bold')
+            )
+            self.move_label.pack(fill=tk.BOTH, expand=True)
 
         difficulty_label = tk.Label(
             master=scoreboard,
@@ -126,21 +216,21 @@ class GameBoard(tk.Frame):
         """
         lose_window = None
         win_window = None
-        # Update grid to correct board state and display
-        for i in range(self.board.size):
-            for j in range(self.board.size):
-                grid_nums = self.grid_slaves(row=i, column=j)[0].winfo_children()[0]
-                cell_value = self.board.board[i][j]
-                if cell_value in color_dict:
-                    bg_color = color_dict[cell_value]
-                else:
-                    bg_color = "gray"
-                fg_color = "black" if cell_value <= 4 or cell_value >= 2048 else "white"
-                text = str(cell_value) if cell_value != 0 else ""
-                grid_nums.config(text=text, bg=bg_color, fg=fg_color)
-
-        score_label = self.grid_slaves(row=self.board.size, column=0)[0].winfo_children()[0]
-        score_label.config(text=f"Score: {self.board.score}")
+        # Update only the cells that changed since the last update
+        board = self.board.board
+        for i, j in zip(*np.nonzero(board != self.rendered)):
+            text, bg_color, fg_color = self.styles.style(board[i, j])
+            self.cells[i][j].config(text=text, bg=bg_color, fg=fg_color)
+        self.rendered[:] = board
+
+        if self.board.score != self.rendered_score:
+            self.score_label.config(text=f"Score: {self.board.score}")
+            self.rendered_score = self.board.score
+        if self.replay is not None:
+            self.move_label.config(text=self.replay_text())
+        # A hint for another board is out of date
+        if self.hint_board is not None and self.board.packed != self.hint_board:
+            self.cancel_hint()
 
         # Display loss screen
         if self.board.has_lost() and not self.loss_displayed and self.difficulty != "easy":
@@ -210,12 +300,91 @@ class GameBoard(tk.Frame):
                 command=lambda: self.master.destroy())
             quit_button.pack()
 
+    def request_hint(self):
+        """
+        Starts searching for the best move in a worker thread.
+        The result is shown once the search is done, without
+        blocking the window in the meantime.
+        """
+        if self.board.size != 4 or self.board.packed is None:
+            self.hint_label.config(text="No hints for this board")
+            return
+        if self.hint_board == self.board.packed:
+            # Already searching or showing this board
+            return
+        if self.hint_search is None:
+            self.hint_search = solver.BackgroundSearch()
+        self.hint_board = self.board.packed
+        future = self.hint_search.start(self.hint_board)
+        self.hint_label.config(text="Hint: thinking...")
+        self.after(HINT_POLL_MS, self.show_hint, future)
+
+    def show_hint(self, future):
+        """
+        Shows the result of a hint search once it is done.
+        Called on the Tk thread by after(), since Tk widgets
+        can't be used from the worker thread.
+        """
+        if future.cancelled() or future is not self.hint_search.future:
+            # The board changed since the search started
+            return
+        if not future.done():
+            self.after(HINT_POLL_MS, self.show_hint, future)
+            return
+        direction = future.result()
+        if direction is None:
+            self.hint_label.config(text="Hint: no moves left")
+        else:
+            self.hint_label.config(text=f"Hint: {direction.capitalize()}")
+
+    def cancel_hint(self):
+        """
+        Stops the hint search in progress and hides the hint.
+        """
+        if self.hint_search is not None:
+            self.hint_search.cancel()
+        self.hint_board = None
+        self.hint_label.config(text="")
+
+    def replay_text(self):
+        """
+        Returns the text showing the move of the replay.
+        """
+        return f"Move: {self.replay.position} / {len(self.replay)}"
+
+    def replay_key_event(self, event):
+        """
+        Handles the keys stepping through a replay.
+        """
+        position = self.replay.position
+        if event.keysym == "Right":
+            position += 1
+        elif event.keysym == "Left":
+            position -= 1
+        elif event.keysym == "Up":
+            position += REPLAY_SKIP
+        elif event.keysym == "Down":
+            position -= REPLAY_SKIP
+        elif event.keysym == "Home":
+            position = 0
+        elif event.keysym == "End":
+            position = len(self.replay)
+        elif event.keysym == "o":
+            self.master.destroy()
+            return
+        self.replay.seek(position)
+        self.update_grid()
+
     def key_event(self, event):
         """
         Handles user input directions for moves.
         Also supports additional functions attached 
         to specific keys.
         """
+        if self.replay is not None:
+            self.replay_key_event(event)
+            return
+
         direction = ""
         # Move up
         if event.keysym == "Up":
@@ -250,6 +419,21 @@ class GameBoard(tk.Frame):
             self.loss_displayed = False
             self.update_grid()
 
+        # Undo the last move, or redo an undone move
+        elif event.keysym in ("u", "y"):
+            if event.keysym == "u":
+                changed = self.board.undo()
+            else:
+                changed = self.board.redo()
+            if changed:
+                # Show the loss screen again if the game is lost again
+                self.loss_displayed = self.loss_displayed and self.board.has_lost()
+                self.update_grid()
+
+        # Suggest a move
+        elif event.keysym == "h":
+            self.request_hint()
+
         # Clear the board if the difficulty is easy
         elif event.keysym == "c" and self.difficulty == "easy":
             self.board.clear_board()
@@ -265,11 +449,28 @@ class GameBoard(tk.Frame):
             self.update_grid()
 
 # Methods to create game window
-window = tk.Tk()
-game_board = GameBoard(master=window)
-min_height = 800
-min_width = 1200
-window.minsize(min_width, min_height)
-window.geometry(f"{min_width}x{min_height}")
-game_board.place(relx=0.5, rely=0.5, anchor="center")
-window.mainloop()
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Play 2048.")
+    parser.add_argument("--difficulty", choices=["easy", "normal", "hard"], default=None)
+    parser.add_argument("--size", type=int, default=4,
+                        help="number of rows and columns of the board")
+    parser.add_argument("--replay", default=None,
+                        help="record file of a game to replay, see records.py")
+    parser.add_argument("--game", type=int, default=0,
+                        help="index of the game to replay in the record file")
+    args = parser.parse_args()
+    game_replay = None
+    if args.replay is not None:
+        import records
+        import replay
+        game_replay = replay.Replay(*records.GameReader(args.replay).game(args.game))
+    window = tk.Tk()
+    game_board = GameBoard(master=window, difficulty=args.difficulty, size=args.size,
+                           replay=game_replay)
+    min_height = 800
+    min_width = 1200
+    window.minsize(min_width, min_height)
+    window.geometry(f"{min_width}x{min_height}")
+    game_board.place(relx=0.5, rely=0.5, anchor="center")
+    window.mainloop()
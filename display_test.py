@@ -0,0 +1,28 @@
+import re
+import display
+import unittest
+
+class TestDisplay(unittest.TestCase):
+
+    def test_tile_color(self):
+        self.assertEqual(display.tile_color(2048), display.color_dict[2048])
+        self.assertEqual(display.tile_color(0), display.color_dict[0])
+
+        # Values written by insta_lose, and values that aren't powers of two
+        for value in list(range(1, 17)) + [3000, 6144]:
+            if value not in display.color_dict:
+                self.assertEqual(display.tile_color(value), "gray", value)
+
+        # Larger tiles get darker, valid Tk colors
+        previous = display.color_dict[2048]
+        for exponent in range(12, 40):
+            color = display.tile_color(1 << exponent)
+            self.assertRegex(color, re.compile(r"^#[0-9A-F]{6}$"))
+            self.assertLessEqual(int(color[1:3], 16), int(previous[1:3], 16))
+            previous = color
+
+        print("Test tile_color passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
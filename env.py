@@ -0,0 +1,155 @@
+"""
+Vectorized reinforcement learning environment.
+
+Runs many games at once on a BatchBoard with the
+reset()/step(actions) interface of Gym vector environments.
+Observations, rewards, flags and legal action masks live in
+arrays allocated once and updated in place by every step,
+so collecting rollouts doesn't copy or allocate per step.
+
+Actions 0-3 move in the directions of bitboard.DIRECTIONS.
+On easy difficulty, action 4 clears the board as
+BoardEasy.clear_board does.
+
+Example:
+    environment = VectorEnv(1024, difficulty="hard", one_hot=True)
+    observations, info = environment.reset(seed=0)
+    for _ in range(1000):
+        actions = environment.sample_actions()
+        observations, rewards, terminated, truncated, info = environment.step(actions)
+"""
+import numpy as np
+import bitboard as bb
+import gamelogic as gl
+
+# Index of the clear action on easy difficulty
+CLEAR_ACTION = len(bb.DIRECTIONS)
+
+
+class VectorEnv:
+    """
+    Vector of n games with the rules of the given difficulty.
+    Observations are the (n, size, size) tile exponents of
+    the boards themselves, or with one_hot, (n, planes,
+    size, size) planes where plane k marks the cells holding
+    exponent k. Returned arrays are reused by the next step,
+    so copy them to keep them.
+    Finished games are reset within the same step. Their
+    final score and length are reported in the info dict.
+    """
+    def __init__(self, n, difficulty="normal", size=4, one_hot=False, planes=16,
+                 dtype=np.float32, max_steps=None, seed=None):
+        self.n = n
+        self.difficulty = difficulty
+        self.max_steps = max_steps
+        self.batch = gl.BatchBoard(n, difficulty, seed=seed, size=size)
+        self.actions = CLEAR_ACTION + (difficulty == "easy")
+
+        # Read-only view of the boards, updated by every move
+        self.exponents = self.batch.boards.view()
+        self.exponents.flags.writeable = False
+        if one_hot:
+            self.observations = np.zeros((n, planes, size, size), dtype=dtype)
+            self._plane_values = np.arange(planes, dtype=np.uint8)[:, None, None]
+        else:
+            self.observations = self.exponents
+
+        self.rewards = np.zeros(n, dtype=np.float32)
+        self.terminated = np.zeros(n, dtype=bool)
+        self.truncated = np.zeros(n, dtype=bool)
+        self.legal = np.zeros((n, self.actions), dtype=bool)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.info = {
+            "legal": self.legal,
+            "score": self.batch.scores,
+            "episode_score": np.zeros(n, dtype=np.int64),
+            "episode_length": np.zeros(n, dtype=np.int64),
+        }
+        self._direction_bits = np.array(list(bb.DIRECTION_BITS.values()), dtype=np.uint8)
+
+    def _update(self, moves):
+        """
+        Refreshes the observations and the legal actions
+        from the legal moves mask of every board.
+        """
+        if self.observations is not self.exponents:
+            np.equal(self.exponents[:, None], self._plane_values,
+                     out=self.observations, casting="unsafe")
+        np.not_equal(moves[:, None] & self._direction_bits, 0,
+                     out=self.legal[:, :CLEAR_ACTION])
+        if self.difficulty == "easy":
+            self.legal[:, CLEAR_ACTION] = True
+
+    def reset(self, seed=None):
+        """
+        Starts new games on every board. Returns the
+        observations and the info dict.
+        """
+        if seed is not None:
+            self.batch.rng = np.random.default_rng(seed)
+        self.batch.reset()
+        self.steps[:] = 0
+        self.rewards[:] = 0
+        self.terminated[:] = False
+        self.truncated[:] = False
+        self.info["episode_score"][:] = 0
+        self.info["episode_length"][:] = 0
+        self._update(self.batch.legal_moves())
+        return self.observations, self.info
+
+    def step(self, actions):
+        """
+        Plays one action on every board. Returns the
+        observations, the score gained, which games ended by
+        being lost and which were cut off at max_steps, and
+        the info dict with the legal actions of the next step.
+        Actions that don't change a board leave it as it is.
+        """
+        actions = np.asarray(actions)
+        clears = None
+        if self.difficulty == "easy":
+            clears = actions == CLEAR_ACTION
+            if clears.any():
+                saved = self.batch.boards[clears]
+                actions = np.where(clears, 0, actions)
+            else:
+                clears = None
+
+        rewards, changed = self.batch.move(actions)
+        if clears is not None:
+            # Boards being cleared don't move
+            self.batch.boards[clears] = saved
+            self.batch.scores[clears] -= rewards[clears]
+            rewards[clears] = 0
+            changed[clears] = False
+            self.batch.clear_board(clears)
+        self.batch.add_new_tiles(changed)
+        self.rewards[:] = rewards
+        self.steps += 1
+
+        moves = self.batch.legal_moves()
+        if self.difficulty == "easy":
+            # Easy games are never lost
+            self.terminated[:] = False
+        else:
+            np.equal(moves, 0, out=self.terminated)
+        if self.max_steps is not None:
+            np.greater_equal(self.steps, self.max_steps, out=self.truncated)
+
+        done = self.terminated | self.truncated
+        np.multiply(self.batch.scores, done, out=self.info["episode_score"])
+        np.multiply(self.steps, done, out=self.info["episode_length"])
+        if done.any():
+            self.batch.reset(done)
+            self.steps[done] = 0
+            moves = self.batch.legal_moves()
+        self._update(moves)
+        return self.observations, self.rewards, self.terminated, self.truncated, self.info
+
+    def sample_actions(self, rng=None):
+        """
+        Picks a random legal action for every board.
+        Boards with no legal action get action 0.
+        """
+        rng = self.batch.rng if rng is None else rng
+        return np.argmax(rng.random(self.legal.shape) * self.legal, axis=1)
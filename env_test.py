@@ -0,0 +1,100 @@
+import bitboard as bb
+import env
+import unittest
+import numpy as np
+
+LOST_BOARD = np.array([[1, 2, 3, 4],
+                       [4, 3, 2, 1],
+                       [1, 2, 3, 4],
+                       [4, 3, 2, 1]], dtype=np.uint8)
+
+class TestVectorEnv(unittest.TestCase):
+
+    def test_observations_in_place(self):
+        environment = env.VectorEnv(64, seed=0)
+        observations, info = environment.reset()
+        self.assertEqual(observations.shape, (64, 4, 4))
+        self.assertTrue(np.shares_memory(observations, environment.batch.boards),
+                        "Exponent observations should be the boards themselves")
+        self.assertFalse(observations.flags.writeable)
+
+        # Check that every step returns the same arrays
+        for _ in range(20):
+            result = environment.step(environment.sample_actions())
+            self.assertIs(result[0], observations)
+            self.assertIs(result[4]["legal"], info["legal"])
+
+        print("Test observations_in_place passed")
+
+    def test_one_hot(self):
+        environment = env.VectorEnv(32, difficulty="hard", one_hot=True, seed=1)
+        observations, _ = environment.reset()
+        for _ in range(30):
+            observations, *_ = environment.step(environment.sample_actions())
+            self.assertEqual(observations.shape, (32, 16, 4, 4))
+            self.assertTrue(np.all(observations.sum(axis=1) == 1))
+            self.assertTrue(np.array_equal(observations.argmax(axis=1), environment.exponents))
+
+        print("Test one_hot passed")
+
+    def test_step(self):
+        environment = env.VectorEnv(50, seed=2)
+        environment.reset()
+        for _ in range(30):
+            scores = environment.batch.scores.copy()
+            _, rewards, terminated, _, info = environment.step(environment.sample_actions())
+
+            # Rewards are the score gained, and games in progress keep their score
+            playing = ~terminated
+            self.assertTrue(np.array_equal((scores + rewards)[playing], info["score"][playing]))
+
+            # Check the legal actions against the packed engine
+            for board, legal in zip(environment.batch.tiles(), info["legal"]):
+                expected = bb.legal_moves(bb.pack(board))
+                self.assertEqual([bool(expected >> i & 1) for i in range(4)], legal.tolist())
+
+        print("Test step passed")
+
+    def test_episode_end(self):
+        environment = env.VectorEnv(2, max_steps=3, seed=3)
+        environment.reset()
+        environment.batch.boards[0] = LOST_BOARD
+        environment.batch.scores[0] = 100
+
+        _, _, terminated, truncated, info = environment.step([0, 0])
+        self.assertEqual(terminated.tolist(), [True, False])
+        self.assertEqual(info["episode_score"][0], 100)
+        self.assertEqual(info["episode_length"][0], 1)
+        self.assertEqual(np.count_nonzero(environment.batch.boards[0]), 2,
+                         "A lost game should start over")
+
+        environment.step([0, 0])
+        _, _, terminated, truncated, info = environment.step([0, 0])
+        self.assertEqual(truncated.tolist(), [False, True])
+        self.assertEqual(info["episode_length"][1], 3)
+
+        print("Test episode_end passed")
+
+    def test_easy_clear(self):
+        environment = env.VectorEnv(2, difficulty="easy", seed=4)
+        environment.reset()
+        self.assertEqual(environment.legal.shape, (2, 5))
+        environment.batch.boards[0] = LOST_BOARD
+        environment.batch.boards[1] = LOST_BOARD
+
+        # Easy games are never lost, only clearing is possible
+        _, _, terminated, _, info = environment.step([0, 0])
+        self.assertFalse(terminated.any())
+        self.assertEqual(info["legal"][0].tolist(), [False] * 4 + [True])
+
+        _, rewards, _, _, _ = environment.step([env.CLEAR_ACTION, 0])
+        self.assertEqual(environment.batch.boards[0, 0].tolist(), [0, 4, 3, 2])
+        self.assertEqual(np.count_nonzero(environment.batch.boards[0, 1:]), 0)
+        self.assertTrue(np.array_equal(environment.batch.boards[1], LOST_BOARD))
+        self.assertEqual(rewards.tolist(), [0, 0])
+
+        print("Test easy_clear passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
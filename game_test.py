@@ -1,3 +1,4 @@
+import bitboard as bb
 import gamelogic as gl
 import unittest
 import numpy as np
@@ -106,6 +107,11 @@ class TestBoard(unittest.TestCase):
             np.array_equal(arr2, np.array([1, 2, 0, 0])),
             "Given array is already shifted and should not change")
 
+        # Check that shifting reports whether anything moved
+        self.assertTrue(gl.Board.shift_zeroes(np.array([0, 2, 0, 0]), True))
+        self.assertFalse(gl.Board.shift_zeroes(np.array([0, 0, 2, 4]), False))
+        self.assertFalse(gl.Board.shift_zeroes(np.array([0, 0, 0, 0]), True))
+
         print("Test shift_zeroes passed")
 
     def test_combine(self):
@@ -132,6 +138,10 @@ class TestBoard(unittest.TestCase):
             np.array_equal(arr3, np.array([2, 0, 0, 2])),
             "Elements must be adjacent to combine.")
         
+        # Check that combining reports whether anything combined
+        self.assertTrue(gl.Board.combine(self, np.array([4, 4, 0, 0]), True))
+        self.assertFalse(gl.Board.combine(self, np.array([4, 2, 4, 0]), False))
+
         # Check combining on empty array
         arr4 = np.array([0, 0, 0, 0])
         gl.Board.combine(self, arr4, True)
@@ -277,6 +287,15 @@ class TestBoard(unittest.TestCase):
             + "keeping the number of nonzeroes constant."
         )
 
+        # Check that the board stays consistent over many moves with new tiles
+        board_instance = gl.BoardHard()
+        for direction in ["left", "up", "right", "down"] * 10:
+            board_instance.move(direction)
+            self.assertEqual(
+                board_instance.packed,
+                gl.bb.pack(board_instance.board),
+                "The packed board should match the board array")
+
         print("Test move passed")
 
     def test_has_won(self):
@@ -375,6 +394,41 @@ class TestBoard(unittest.TestCase):
 
         print("Test has_lost passed")
 
+    def test_legal_moves(self):
+        # Create a Board instance for testing
+        board_instance = gl.Board()
+
+        # Only moving up or left changes this board
+        board_instance.board = np.array([[0, 0, 0, 0],
+                                         [0, 0, 0, 0],
+                                         [0, 0, 0, 2],
+                                         [0, 0, 4, 8]])
+        self.assertEqual(
+            gl.bb.mask_directions(board_instance.legal_moves()),
+            ["up", "left"],
+            "Only moving up or left should change the board")
+
+        # Check that the mask is updated after a move
+        board_instance.move("left")
+        self.assertEqual(
+            board_instance.legal_moves(),
+            gl.bb.legal_moves(board_instance.packed),
+            "The mask should match the board after the move")
+
+        # A lost board has no legal moves
+        board_instance.board = np.array([[2, 4, 8, 16],
+                                         [16, 8, 4, 2],
+                                         [2, 4, 8, 16],
+                                         [16, 8, 4, 2]])
+        self.assertEqual(board_instance.legal_moves(), 0)
+
+        # Boards the packed engine can't represent work as well
+        board_instance.insta_lose()
+        self.assertEqual(board_instance.legal_moves(), 0)
+        self.assertTrue(board_instance.has_lost())
+
+        print("Test legal_moves passed")
+
     def test_clear_board(self):
          # Create a BoardEasy instance for testing
         board_instance = gl.BoardEasy()
@@ -405,6 +459,338 @@ class TestBoard(unittest.TestCase):
 
         print("Test clear_board passed")
 
+    def test_board_sizes(self):
+        for size in (3, 5, 8):
+            board_instance = gl.Board(size=size)
+            self.assertEqual(board_instance.board.shape, (size, size))
+            self.assertEqual(np.count_nonzero(board_instance.board), 2)
+
+            # Check that a move keeps the packed state in sync
+            board = np.zeros((size, size), dtype=int)
+            board[0, 0] = 2
+            board[0, size - 1] = 2
+            board_instance.board = board
+            board_instance.move("left")
+            self.assertEqual(board_instance.board[0, 0], 4)
+            self.assertEqual(board_instance.score, 4)
+            self.assertEqual(np.count_nonzero(board_instance.board), 2)
+            self.assertFalse(board_instance.has_lost())
+
+        # Check that clearing a small board keeps the values that fit
+        board_instance = gl.BoardEasy(size=3)
+        board_instance.board = np.array([[2, 4, 0],
+                                         [0, 8, 0],
+                                         [16, 0, 32]])
+        board_instance.clear_board()
+        self.assertTrue(np.array_equal(board_instance.board[0], [0, 32, 16]))
+        self.assertEqual(np.count_nonzero(board_instance.board[1:]), 0)
+
+        print("Test board_sizes passed")
+
+    def test_undo_redo(self):
+        board_instance = gl.Board(history_size=4)
+        board_instance.board = np.array([[2, 2, 0, 0],
+                                         [0, 0, 0, 0],
+                                         [0, 0, 4, 0],
+                                         [0, 0, 0, 0]])
+        start = np.copy(board_instance.board)
+        self.assertFalse(board_instance.undo(), "There is no move to undo yet")
+
+        board_instance.move("left")
+        after_move = np.copy(board_instance.board)
+        self.assertTrue(board_instance.undo())
+        self.assertTrue(np.array_equal(board_instance.board, start))
+        self.assertEqual(board_instance.score, 0)
+
+        # Check that redoing gives back the same new tile
+        self.assertTrue(board_instance.redo())
+        self.assertTrue(np.array_equal(board_instance.board, after_move))
+        self.assertEqual(board_instance.score, 4)
+        self.assertFalse(board_instance.redo(), "There is no move to redo")
+
+        # Check that a new move forgets the moves that could be redone
+        board_instance.undo()
+        board_instance.move("right")
+        self.assertFalse(board_instance.redo())
+
+        # Check that only the last history_size - 1 moves are kept
+        moves = 1
+        for direction in ["up", "down", "left", "right"] * 5:
+            packed = board_instance.packed
+            board_instance.move(direction)
+            moves += board_instance.packed != packed
+        undone = 0
+        while board_instance.undo():
+            undone += 1
+        self.assertEqual(undone, min(moves, 3))
+
+        print("Test undo_redo passed")
+
+    def test_successors(self):
+        board_instance = gl.Board()
+        board_instance.board = np.array([[2, 2, 0, 0],
+                                         [0, 0, 0, 0],
+                                         [0, 0, 4, 0],
+                                         [0, 0, 0, 0]])
+        packed = board_instance.packed
+        boards, scores, moved = board_instance.successors()
+        self.assertEqual(board_instance.packed, packed, "The board itself should not move")
+        self.assertEqual(moved, board_instance.legal_moves())
+        self.assertEqual(scores, (0, 0, 4, 4))
+        self.assertTrue(np.array_equal(bb.unpack(boards[2]), [[4, 0, 0, 0],
+                                                              [0, 0, 0, 0],
+                                                              [4, 0, 0, 0],
+                                                              [0, 0, 0, 0]]))
+
+        # Boards that can't be packed have no afterstates
+        board_instance.board = np.array([[3, 0, 0, 0]] * 4)
+        with self.assertRaises(ValueError):
+            board_instance.successors()
+
+        print("Test successors passed")
+
+    def test_board_read_only(self):
+        board_instance = gl.Board(seed=0)
+
+        # Edits to the array of a packed board would be lost, so they fail
+        with self.assertRaises(ValueError):
+            board_instance.board[0, 0] = 2048
+        board_instance.move("left")
+        with self.assertRaises(ValueError):
+            board_instance.board[0, 0] = 2048
+
+        # Assigned arrays are copied, and read-only as well
+        winning_board = np.zeros((4, 4), dtype=int)
+        board_instance.board = winning_board
+        winning_board[0, 0] = 2048
+        self.assertFalse(board_instance.has_won())
+        with self.assertRaises(ValueError):
+            board_instance.board[0, 0] = 2048
+
+        # Boards that can't be packed are moved in place, so they stay writable
+        board_instance.insta_lose()
+        board_instance.board[0, 0] = 3
+        self.assertEqual(board_instance.board[0, 0], 3)
+
+        print("Test board_read_only passed")
+
+    def test_seeded_games(self):
+        # Plays the same moves on a board, returning the boards it went through
+        def play(board_instance):
+            boards = [board_instance.packed]
+            for direction in ["up", "left", "down", "right"] * 25:
+                board_instance.move(direction)
+                boards.append(board_instance.packed)
+            return boards
+
+        for board_class in (gl.Board, gl.BoardHard):
+            first = board_class(seed=7)
+            second = board_class(seed=7)
+            self.assertEqual(play(first), play(second), "The same seed should give the same game")
+            self.assertNotEqual(play(board_class(seed=8)), play(board_class(seed=7)))
+
+            # Check that each new game gets its own seed, drawn from the last game
+            first.reset_board()
+            second.reset_board()
+            self.assertEqual(first.seed, second.seed)
+            self.assertNotEqual(first.seed, 7)
+            self.assertEqual(play(first), play(board_class(seed=first.seed)))
+
+        print("Test seeded_games passed")
+
+    def test_largest_tiles(self):
+        for size in (4, 5, 8):
+            board_instance = gl.Board(size=size)
+            board = np.zeros((size, size), dtype=int)
+            board[0, :2] = 32768
+            board_instance.board = board
+            self.assertEqual(board_instance.legal_moves() & 0b1100, 0b1100,
+                             f"Two 32768 tiles should merge on a {size}x{size} board")
+            board_instance.move("left")
+            self.assertEqual(board_instance.board[0, 0], 65536)
+            self.assertEqual(board_instance.score, 65536)
+
+            # Merging two 2^14 tiles makes the second 32768
+            board = np.zeros((size, size), dtype=int)
+            board[0, 0] = 32768
+            board[1, :2] = 16384
+            board_instance.board = board
+            self.assertIsNotNone(board_instance.packed)
+            board_instance.move("left")
+            board_instance.move("up")
+            self.assertEqual(board_instance.board[0, 0], 65536)
+
+        # A full board with two adjacent 32768 tiles hasn't lost
+        board_instance = gl.Board()
+        board_instance.board = np.array([[32768, 32768, 2, 4],
+                                         [2, 4, 8, 16],
+                                         [4, 8, 16, 32],
+                                         [8, 16, 32, 64]])
+        self.assertFalse(board_instance.has_lost())
+        self.assertEqual(board_instance.legal_moves(), 0b1100)
+
+        # Larger boards keep tiles up to 2^31 packed
+        board_instance = gl.Board(size=8)
+        board = np.zeros((8, 8), dtype=int)
+        board[7, 6:] = 1 << 30
+        board_instance.board = board
+        self.assertIsNotNone(board_instance.packed)
+        board_instance.move("right")
+        self.assertEqual(board_instance.board[7, 7], 1 << 31)
+
+        print("Test largest_tiles passed")
+
+    def test_spawn_full_board(self):
+        # A 65536 tile doesn't fit in a packed 4x4 board
+        board = np.array([[65536, 2, 4, 8],
+                          [2, 4, 8, 16],
+                          [4, 8, 16, 32],
+                          [8, 16, 32, 64]])
+        for board_class in (gl.Board, gl.BoardHard):
+            board_instance = board_class()
+            board_instance.board = np.copy(board)
+            self.assertIsNone(board_instance.packed)
+            board_instance.spawn(2)
+            self.assertTrue(np.array_equal(board_instance.board, board),
+                            "Full boards should be left unchanged")
+
+        print("Test spawn_full_board passed")
+
+
+class TestBatchBoard(unittest.TestCase):
+
+    def test_batch_board_init(self):
+        # Create a batch of boards
+        batch = gl.BatchBoard(100, seed=0)
+        self.assertEqual(batch.boards.shape, (100, 4, 4), "Boards should be 4x4")
+        self.assertTrue(np.all(batch.scores == 0), "Initial scores should be 0")
+
+        # Check if there are two 2s in every board
+        self.assertTrue(
+            np.all(np.sum(batch.tiles() == 2, axis=(1, 2)) == 2),
+            "Every starting board should contain two 2s")
+
+        print("Test batch_board_init passed")
+
+    def test_batch_move(self):
+        batch = gl.BatchBoard(400, seed=1)
+        rng = np.random.default_rng(1)
+        batch.boards[:] = rng.integers(0, 6, size=(400, 4, 4))
+        directions = rng.integers(0, 4, size=400)
+        before = batch.tiles()
+
+        rewards, changed = batch.move(directions)
+
+        # Check every board against a single Board moved the same way
+        board_instance = gl.Board()
+        for i in range(batch.n):
+            board_instance.board = np.copy(before[i])
+            board_instance.score = 0
+            board_instance.move_array(gl.bb.DIRECTIONS[directions[i]])
+            self.assertTrue(
+                np.array_equal(batch.tiles()[i], board_instance.board),
+                "Batched move should match the single board move")
+            self.assertEqual(rewards[i], board_instance.score)
+            self.assertEqual(changed[i], not np.array_equal(before[i], board_instance.board))
+
+        print("Test batch_move passed")
+
+    def test_batch_step(self):
+        batch = gl.BatchBoard(200, seed=2)
+        moved = gl.BatchBoard(200, seed=2)
+        moved.move(2)
+        moved_tiles = np.count_nonzero(moved.boards.reshape(200, 16), axis=1)
+
+        # Move every board left and add new tiles
+        rewards, done = batch.step(2)
+        tiles = np.count_nonzero(batch.boards.reshape(200, 16), axis=1)
+        changed = np.any(moved.boards != gl.BatchBoard(200, seed=2).boards, axis=(1, 2))
+
+        self.assertFalse(np.any(done), "Boards should not be lost after one move")
+        self.assertTrue(
+            np.array_equal(tiles, moved_tiles + changed),
+            "A new tile should be added only to boards that changed")
+        self.assertTrue(np.array_equal(rewards, moved.scores))
+
+        print("Test batch_step passed")
+
+    def test_batch_has_lost(self):
+        batch = gl.BatchBoard(3, seed=3)
+        lost_board = np.array([[1, 2, 3, 4],
+                               [4, 3, 2, 1],
+                               [1, 2, 3, 4],
+                               [4, 3, 2, 1]])
+        not_lost_full_board = np.array([[1, 2, 3, 4],
+                                        [4, 3, 2, 1],
+                                        [1, 2, 3, 4],
+                                        [4, 4, 2, 1]])
+        batch.boards[0] = lost_board
+        batch.boards[1] = not_lost_full_board
+        batch.boards[2] = 0
+        self.assertTrue(
+            np.array_equal(batch.has_lost(), [True, False, False]),
+            "Only full boards with no matching adjacent tiles are lost")
+
+        batch.boards[2, 0, 0] = 11
+        self.assertTrue(
+            np.array_equal(batch.has_won(), [False, False, True]),
+            "Boards with a 2048 tile have won")
+
+        print("Test batch_has_lost passed")
+
+    def test_batch_clear_board(self):
+        batch = gl.BatchBoard(2, difficulty="easy", seed=4)
+        batch.boards[0] = [[1, 2, 0, 1],
+                           [0, 0, 3, 0],
+                           [0, 4, 0, 0],
+                           [5, 0, 0, 6]]
+        batch.boards[1] = [[1, 0, 0, 0],
+                           [0, 0, 0, 0],
+                           [0, 2, 0, 0],
+                           [0, 0, 0, 0]]
+        batch.clear_board([True, True])
+
+        self.assertTrue(np.array_equal(batch.boards[0, 0], [0, 6, 5, 4]))
+        self.assertTrue(np.array_equal(batch.boards[1, 0], [0, 2, 0, 0]))
+        self.assertEqual(np.count_nonzero(batch.boards[:, 1:]), 0)
+
+        print("Test batch_clear_board passed")
+
+    def test_batch_sizes(self):
+        rng = np.random.default_rng(5)
+        for size in (3, 5, 8):
+            batch = gl.BatchBoard(50, seed=5, size=size)
+            self.assertEqual(batch.boards.shape, (50, size, size))
+            batch.boards[:] = rng.integers(0, 6, size=(50, size, size))
+            directions = rng.integers(0, 4, size=50)
+            before = batch.tiles()
+
+            rewards, changed = batch.move(directions)
+
+            board_instance = gl.Board(size=size)
+            for i in range(batch.n):
+                board_instance.board = np.copy(before[i])
+                board_instance.score = 0
+                board_instance.move_array(gl.bb.DIRECTIONS[directions[i]])
+                self.assertTrue(np.array_equal(batch.tiles()[i], board_instance.board))
+                self.assertEqual(rewards[i], board_instance.score)
+
+        print("Test batch_sizes passed")
+
+    def test_batch_largest_tiles(self):
+        for size in (4, 8):
+            batch = gl.BatchBoard(3, seed=6, size=size)
+            batch.boards[:] = 0
+            batch.boards[:, 0, :2] = 15
+            batch.boards[1, 0, :2] = 3
+            self.assertTrue(np.all(batch.legal_moves() & 0b1100 == 0b1100))
+            rewards, changed = batch.move(2)
+            self.assertTrue(np.all(changed))
+            self.assertEqual(list(batch.boards[:, 0, 0]), [16, 4, 16])
+            self.assertEqual(list(rewards), [65536, 16, 65536])
+
+        print("Test batch_largest_tiles passed")
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
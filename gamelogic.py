@@ -1,5 +1,37 @@
 import numpy as np
-import random
+import secrets
+import bitboard as bb
+
+# Number of moves that can be undone by default
+HISTORY_SIZE = 4096
+# Random numbers drawn at a time by each board
+RANDOM_BLOCK_SIZE = 1024
+# Chance of a Hard board adding a second tile after a move
+HARD_EXTRA_TILE_CHANCE = 1 / 26
+
+
+# Stream of random numbers owned by a board
+class RandomStream:
+    """
+    Uniform random numbers in [0, 1) from a numpy Generator
+    seeded with the given seed. Numbers are drawn a block at
+    a time, which is much cheaper than a library call for
+    every number.
+    """
+    def __init__(self, seed):
+        self.generator = np.random.default_rng(seed)
+        self._block = iter(())
+
+    def random(self):
+        """
+        Returns the next random number.
+        """
+        try:
+            return next(self._block)
+        except StopIteration:
+            self._block = iter(self.generator.random(RANDOM_BLOCK_SIZE).tolist())
+            return next(self._block)
+
 
 # Regular Board Class to manage game
 class Board:
@@ -7,33 +39,109 @@ class Board:
     Board class to represent a
     standard 2048 game board.
     """
-    # User inputs for board size and difficulty
-    def __init__(self, size=4, difficulty="normal"):
-        self.board = self.make_board()
-        self.score = 0
+    # User inputs for board size and difficulty.
+    # The new tiles come from a random stream owned by the board,
+    # so the same seed always gives the same game for the same moves.
+    def __init__(self, size=4, difficulty="normal", history_size=HISTORY_SIZE, seed=None):
         self.size = size
         self.difficulty = difficulty
+        self.engine = bb.get_engine(size)
+        self.history_size = history_size
+        self.seed = secrets.randbits(63) if seed is None else seed
+        self.rng = RandomStream(self.seed)
+        self._states = None
+        self._buffer = None
+        # Writer of the game record, see records.py
+        self.recorder = None
+        self._set_board(self.make_board())
+        self.score = 0
+        self.clear_history()
+
+    @property
+    def board(self):
+        """
+        The board as an array of tile values.
+        The game state itself is kept packed into an integer
+        (64 bits for a 4x4 board, see bitboard.py) whenever the
+        board only holds powers of two the packed cells can hold,
+        with at most one at the largest, and the array is rebuilt
+        on demand. The array is then read-only, since edits
+        to it would be lost at the next move; assign a new
+        array to change the board.
+        """
+        if self._board is None:
+            # Reuse the array owned by the board instead of
+            # allocating a new one after every move
+            if self._buffer is None:
+                self._buffer, self._scratch = self.engine.buffers()
+                self._view = self._buffer.view()
+                self._view.flags.writeable = False
+            self.engine.unpack_into(self._packed, self._buffer, self._scratch)
+            self._board = self._view
+        return self._board
+
+    @board.setter
+    def board(self, arr):
+        # An assigned board wasn't reached by a move
+        self._set_board(arr)
+        self._board_replaced()
+
+    def _set_board(self, arr):
+        # The board keeps its own copy of the array
+        arr = np.array(arr)
+        try:
+            packed = self.engine.pack(arr)
+        except ValueError:
+            packed = None
+        if packed is None or not self._can_move_packed(packed):
+            # Boards the packed engine can't represent or move
+            # are moved with the array operations
+            self._packed = None
+            self._legal = None
+            self._empty = None
+        else:
+            self._packed = packed
+            self._legal = self.engine.legal_moves(packed)
+            self._empty = self.engine.empty_mask(packed)
+            arr.flags.writeable = False
+        self._board = arr
+
+    def _can_move_packed(self, packed):
+        # Tiles at the largest exponent a packed cell holds never
+        # merge in the packed moves, so a board with two of them
+        # has to be moved as an array
+        return self.engine.count_max_tiles(packed) < 2
+
+    @property
+    def packed(self):
+        """
+        The board packed into an integer,
+        or None if it holds values that can't be packed.
+        """
+        return self._packed
 
     def make_board(self):
         """
         Creates a starting board with correct size
         Adds a two to two random empty spaces.
         """
-        board = np.zeros((4, 4), dtype=int)
-        self.add_val(board, 2)
-        self.add_val(board, 2)
+        board = np.zeros((self.size, self.size), dtype=int)
+        self.add_val(board, 2, self.rng)
+        self.add_val(board, 2, self.rng)
         return board
     
     @staticmethod
-    def add_val(arr, val):
+    def add_val(arr, val, rng=None):
         """
         Adds a new value to an empty space in the given array. 
-        Value is either a 2 or a 4.
+        Value is either a 2 or a 4. The space is picked with
+        the given RandomStream, or with np.random if not given.
         """
         # Find indices of empty spaces
         zero_indices = np.argwhere(arr == 0)
         # Randomly choose index of an empty space
-        random_index = np.random.choice(zero_indices.shape[0])
+        u = rng.random() if rng is not None else np.random.random()
+        random_index = int(u * zero_indices.shape[0])
 
         # Split random index into row and column index
         row_index, col_index = zero_indices[random_index]
@@ -47,11 +155,22 @@ class Board:
         Shifts all non-zero elements of a 1-D 
         array to the front or the back of the 
         array, depending on the boolean argument to_front.
+        Returns whether any element moved.
         """
         # Creates list of the indices of non-zero values within
         # a single row/column
         non_zero_indices = np.nonzero(arr)[0]
-        if len(non_zero_indices) > 0:
+        count = len(non_zero_indices)
+        if count > 0:
+            # Elements only move if there is a zero between them
+            # and the end of the array they are shifted to
+            if to_front:
+                changed = bool(non_zero_indices[-1] != count - 1)
+            else:
+                changed = bool(non_zero_indices[0] != len(arr) - count)
+            if not changed:
+                return False
+
             if to_front:
                 # The number of non-zero values in the list is taken and
                 # used to slice the array up to this number. The indices
@@ -63,16 +182,18 @@ class Board:
                 # Same operation as above but in reverse direction
                 arr[-len(non_zero_indices):] = arr[non_zero_indices]
                 arr[:-len(non_zero_indices)] = 0
-                
-        else:
-            arr[:] = 0         
+            return True
+
+        return False
 
     def combine(self, arr, to_front=None):
         """
         Combines adjacent values in the given 
         1-D array, with the direction depending 
         on the boolean to_front.
+        Returns whether any values were combined.
         """
+        combined = False
         if to_front:
             for i in range(len(arr) - 1):
                 if arr[i] == arr[i+1] and arr[i] != 0:
@@ -82,6 +203,7 @@ class Board:
                     arr[i+1] = 0 
                     # Current, doubled value added to score
                     self.score += arr[i]
+                    combined = True
 
         else:
             for i in range(len(arr) - 1, 0, -1):
@@ -92,82 +214,308 @@ class Board:
                     arr[i-1] = 0 
                     # Current, doubled value added to score
                     self.score += arr[i]
+                    combined = True
+
+        return combined
 
     def insta_win(self):
         """
         Instantly wins the game. 
         Helpful for testing win screen display.
         """
-        self.board[0, 0] = 2048
+        board = np.copy(self.board)
+        board[0, 0] = 2048
+        self.board = board
 
     def insta_lose(self):
         """
         Instantly loses the game. 
         Helpful for testing lose screen display.
         """
+        board = np.copy(self.board)
         count = 1
         for i in range(self.size):
             for j in range(self.size):
-                self.board[i, j] = count
+                board[i, j] = count
                 count += 1
+        self.board = board
 
-    def reset_board(self):
+    def reset_board(self, seed=None):
         """
         Resets board to random starting board 
-        with the same difficulty.
+        with the same difficulty. The new game is played
+        with the given seed, or a seed drawn from the
+        random stream of the last game.
         """
-        self.board = self.make_board()
+        if seed is None:
+            seed = int(self.rng.generator.integers(2 ** 63))
+        self.seed = seed
+        self.rng = RandomStream(seed)
+        self._set_board(self.make_board())
         self.score = 0
-    
+        self.clear_history()
+        self._board_replaced()
+
+    def _board_replaced(self):
+        # A board that wasn't reached by a move starts a new record
+        if self.recorder is not None:
+            self.recorder.start(self)
+
+    def clear_history(self):
+        """
+        Forgets every move that could be undone or redone.
+        """
+        self._history_position = 0
+        self._undo_count = 0
+        self._redo_count = 0
+
+    def record(self):
+        """
+        Saves the current state so that it can be undone,
+        and forgets the states that could be redone.
+        States are kept packed in a ring buffer, so only the
+        last history_size - 1 moves can be undone.
+        """
+        if self.history_size < 2:
+            return
+        self._redo_count = 0
+        if self._packed is None:
+            return
+        if self._states is None:
+            # Boards up to 4x4 fit in 64 bits
+            dtype = np.uint64 if self.size <= 4 else object
+            self._states = np.zeros(self.history_size, dtype=dtype)
+            self._scores = np.zeros(self.history_size, dtype=np.int64)
+        i = self._history_position
+        self._states[i] = self._packed
+        self._scores[i] = self.score
+        i += 1
+        self._history_position = i if i < self.history_size else 0
+        # One slot stays free for the state replaced by an undo
+        if self._undo_count < self.history_size - 1:
+            self._undo_count += 1
+
+    def _save(self, i):
+        # Stores the current state in slot i of the history
+        self._states[i] = self._packed
+        self._scores[i] = self.score
+
+    def _load(self, i):
+        # Makes the state in slot i of the history the current state
+        self.restore(int(self._states[i]), int(self._scores[i]))
+
+    def restore(self, packed, score=0):
+        """
+        Replaces the game state with a packed board and a
+        score, such as ones saved from the packed property.
+        """
+        if self._can_move_packed(packed):
+            self._packed = packed
+            self._legal = self.engine.legal_moves(packed)
+            self._empty = self.engine.empty_mask(packed)
+            self._board = None
+        else:
+            self._set_board(self.engine.unpack(packed))
+        self.score = score
+        self._board_replaced()
+
+    def undo(self):
+        """
+        Goes back to the state before the last move.
+        Returns whether there was a move to undo.
+        """
+        if self._undo_count == 0:
+            return False
+        if self._packed is None:
+            # A board that can't be packed can't be redone
+            self._redo_count = 0
+        else:
+            self._save(self._history_position)
+            self._redo_count += 1
+        self._history_position = (self._history_position - 1) % self.history_size
+        self._load(self._history_position)
+        self._undo_count -= 1
+        return True
+
+    def redo(self):
+        """
+        Goes forward to the state of the last undone move.
+        Returns whether there was a move to redo.
+        """
+        if self._redo_count == 0:
+            return False
+        if self._packed is not None:
+            self._save(self._history_position)
+        self._history_position = (self._history_position + 1) % self.history_size
+        self._load(self._history_position)
+        self._undo_count += 1
+        self._redo_count -= 1
+        return True
+
     def move(self, direction):
         """
         Moves non-empty tiles around the board 
         up, down, left, or right, depending on 
         the user-input direction.
         """
-        # Store state of board before move is executed
-        prev_board = np.copy(self.board)
-        for i in range(self.size):
+        if self._packed is None:
+            changed = self.move_array(direction)
+        else:
+            # The legal moves mask tells if the move changes the board
+            changed = self._legal & bb.DIRECTION_BITS.get(direction, 0)
+            if changed:
+                self.record()
+                self._packed, gained = self.engine.move(self._packed, direction)
+                self._empty = self.engine.empty_mask(self._packed)
+                self._board = None
+                self.score += gained
+                # Only a move that makes a tile at the largest
+                # exponent can stop the board from being packed
+                if (gained >> self.engine.max_exponent_limit
+                        and not self._can_move_packed(self._packed)):
+                    self._set_board(self.board)
+                if self.recorder is not None:
+                    self.recorder.move(direction)
+
+        # Only add new tiles if the move changed the state of the board.
+        # Adding the tiles also updates the legal moves.
+        if changed:
+            self.add_new_tiles()
+
+    def move_array(self, direction):
+        """
+        Moves the tiles of the board array directly.
+        Used for boards the packed engine can't represent.
+        Returns whether the move changed the board.
+        """
+        board = self.board
+        if self._packed is not None:
+            # The array of a packed board is read-only,
+            # so a copy is moved and then packed again
+            board = np.array(board)
+
+        # Left and up move tiles to the front of each row or column
+        if direction in ('left', 'right'):
+            lines = [board[i, :] for i in range(self.size)]
+        elif direction in ('up', 'down'):
+            lines = [board[:, i] for i in range(self.size)]
+        else:
+            return False
+        to_front = direction in ('left', 'up')
+
+        # The second shift only moves tiles if a combine happened,
+        # so the first shift and the combine tell if anything changed
+        changed = False
+        for line in lines:
+            changed |= self.shift_zeroes(line, to_front)
+            changed |= self.combine(line, to_front)
+            self.shift_zeroes(line, to_front)
+        if changed and self._packed is not None:
+            self._set_board(board)
+        return changed
 
-            # Move left
-            if direction == 'left':
-                to_front = True
-                self.shift_zeroes(self.board[i, :], to_front)
-                self.combine(self.board[i, :], to_front)
-                self.shift_zeroes(self.board[i, :], to_front)
-            
-            # Move right
-            elif direction == 'right':
-                to_front = False
-                self.shift_zeroes(self.board[i, :], to_front)
-                self.combine(self.board[i, :], to_front)
-                self.shift_zeroes(self.board[i, :], to_front)
-                
-            # Move up
-            elif direction == 'up':
-                to_front = True
-                self.shift_zeroes(self.board[:, i], to_front)
-                self.combine(self.board[:, i], to_front)
-                self.shift_zeroes(self.board[:, i], to_front)
-                
-            # Move down
-            elif direction == 'down':
-                to_front = False
-                self.shift_zeroes(self.board[:, i], to_front)
-                self.combine(self.board[:, i], to_front)
-                self.shift_zeroes(self.board[:, i], to_front)
-        
-        # Check to see that the move changed the state of the board
-        if not np.array_equal(prev_board, self.board):
-            new_num = random.choice([2, 4])
-            self.add_val(self.board, new_num)
+    def add_new_tiles(self):
+        """
+        Adds a 2 or a 4 to a random empty space
+        after a move. New tiles must be added through
+        spawn, which also updates the legal moves.
+        """
+        self.spawn(2 if self.rng.random() < 0.5 else 4)
+
+    def spawn(self, value):
+        """
+        Adds the given value to a random empty space on the board.
+        """
+        if self._packed is None:
+            # Full boards are left unchanged, as on packed boards
+            if np.any(self.board == 0):
+                self.add_val(self.board, value, self.rng)
+            return
+
+        # Pick from the empty cells kept up to date by each move
+        cell = self.engine.random_cell(self._empty, self.rng.random())
+        if cell is not None:
+            self.place(cell, value)
+
+    def place(self, cell, value):
+        """
+        Adds the given value to an empty cell of a packed
+        board, given as row * size + column.
+        """
+        self._packed |= (value.bit_length() - 1) << (self.engine.cell_bits * cell)
+        self._empty &= ~(1 << cell)
+        self._board = None
+        self._legal = self.engine.legal_moves(self._packed)
+        if self.recorder is not None:
+            self.recorder.spawn(cell, value)
+
+    def legal_moves(self):
+        """
+        Returns a 4-bit mask of the directions that
+        change the board, where bit i stands for
+        bitboard.DIRECTIONS[i]. Use
+        bitboard.mask_directions to list them.
+        """
+        if self._packed is not None:
+            return self._legal
+        return self.move_scores()[1]
+
+    def move_scores(self):
+        """
+        Returns the score each direction would gain, in the
+        order of bitboard.DIRECTIONS, and a mask of the moves
+        that change the board. Unlike successors, this also
+        works for boards that can't be packed.
+        """
+        if self._packed is not None:
+            _, scores, moved = self.engine.successors(self._packed)
+            return scores, moved
+
+        # Try every direction on a copy of the board
+        scores = []
+        moved = 0
+        board = self.board
+        score = self.score
+        for i, direction in enumerate(bb.DIRECTIONS):
+            self._board = np.copy(board)
+            if self.move_array(direction):
+                moved |= 1 << i
+            scores.append(self.score - score)
+            self.score = score
+        self._board = board
+        return tuple(scores), moved
+
+    def successors(self):
+        """
+        Returns the packed boards after moving in every
+        direction, without adding new tiles, in the order of
+        bitboard.DIRECTIONS, along with the score each move
+        gains and a mask of the moves that change the board.
+        The board itself isn't changed.
+        """
+        if self._packed is None:
+            raise ValueError("Board can't be packed")
+        return self.engine.successors(self._packed)
 
+    def canonical(self):
+        """
+        Returns a key shared by the board and all of its
+        rotations and reflections, and the transform that
+        turns the board into the key. A direction chosen for
+        the key is mapped back to this board with
+        bitboard.RESTORE_DIRECTIONS[transform].
+        """
+        if self._packed is None:
+            raise ValueError("Board can't be packed")
+        return self.engine.canonical(self._packed)
 
     def has_won(self):
         """
         Checks if the player has won the game 
         by reaching 2048.
         """
+        if self._packed is not None:
+            return self.engine.max_exponent(self._packed) >= bb.WIN_EXPONENT
         return np.any(self.board >= 2048)
 
     def has_lost(self):
@@ -176,7 +524,10 @@ class Board:
         by being unable to move and having no 
         2048 space present.
         """
-        
+        if self._packed is not None:
+            # Only an empty board has no legal moves without being full
+            return self._legal == 0 and self._packed != 0
+
         if np.all(self.board != 0):
             # Check if there are any equal, 
             # adjacent numbers in vertical direction
@@ -199,70 +550,309 @@ class Board:
 # Board class for an easier version of 2048
 class BoardEasy(Board):
 
-    def __init__(self, size=4, difficulty="easy"):
-        super().__init__(size=size, difficulty=difficulty)
+    def __init__(self, size=4, difficulty="easy", history_size=HISTORY_SIZE, seed=None):
+        super().__init__(size=size, difficulty=difficulty, history_size=history_size, seed=seed)
 
     def clear_board(self):
+        """
+        Clears the board, keeping the highest value and,
+        if it is above 4, the two values below it.
+        """
         max_value = np.max(self.board)
-        self.board = np.zeros((self.size, self.size), dtype=int)
-        self.board[0, 1] = max_value
+        board = np.zeros((self.size, self.size), dtype=int)
+        values = [max_value]
         if max_value > 4:
-            self.board[0, 2] = max_value / 2
-            self.board[0, 3] = max_value / 4
+            values += [max_value // 2, max_value // 4]
+        # Values go in the top row from the second column,
+        # as far as they fit on smaller boards
+        for j, value in enumerate(values[:self.size - 1]):
+            board[0, j + 1] = value
+        self.record()
+        self._set_board(board)
+        if self.recorder is not None:
+            self.recorder.clear(self)
 
 # Board class for a harder version of 2048
 class BoardHard(Board):
 
-    def __init__(self, size=4, difficulty="hard"):
-        super().__init__(size=size, difficulty=difficulty)
+    def __init__(self, size=4, difficulty="hard", history_size=HISTORY_SIZE, seed=None):
+        super().__init__(size=size, difficulty=difficulty, history_size=history_size, seed=seed)
 
-    
-    def move(self, direction):
+    def add_new_tiles(self):
         """
-        Moves non-empty tiles around the board 
-        up, down, left, or right, depending on 
-        the user-input direction. An extra 2 
-        or 4 may appear after each move.
+        Adds a 2 or a 4 to a random empty space 
+        after a move. An extra copy of the same
+        number may appear as well.
         """
-        # Store state of board before move is executed
-        prev_board = np.copy(self.board)
-        for i in range(self.size):
+        new_num = 2 if self.rng.random() < 0.5 else 4
+        self.spawn(new_num)
+        # 1/26 chance of two numbers appearing 
+        # on the board instead of one
+        if self.rng.random() < HARD_EXTRA_TILE_CHANCE:
+            self.spawn(new_num)
+
+# Difficulties, easiest first. Game records store the index
+# of a difficulty in this tuple, so its order must not change.
+DIFFICULTIES = ("easy", "normal", "hard")
+# Board class of every difficulty
+BOARD_CLASSES = {
+    "easy": BoardEasy,
+    "normal": Board,
+    "hard": BoardHard,
+}
+
+# Largest board size whose rows get full precomputed tables
+# in BatchBoard. Larger rows are moved with bitboard.slide_rows.
+BATCH_TABLE_MAX_SIZE = bb.FULL_TABLE_MAX_SIZE
+
+_batch_tables = {}
+
+
+def _direction_order(size):
+    """
+    Returns the cell order that turns each direction into a
+    move to the left. Reading a flattened board in this order
+    gives rows whose first cell is the one tiles slide towards.
+    """
+    cells = np.arange(size * size).reshape(size, size)
+    return np.array([
+        cells.T.ravel(),              # up
+        cells[::-1].T.ravel(),        # down
+        cells.ravel(),                # left
+        cells[:, ::-1].ravel(),       # right
+    ])
+
+
+def _get_batch_tables(size):
+    """
+    Returns the row tables of the given size in array form,
+    with the left move split into cells, or None if the
+    size is too large for full tables.
+    """
+    if size > BATCH_TABLE_MAX_SIZE:
+        return None
+    if size not in _batch_tables:
+        tables = bb.TABLES if size == 4 else bb.load_row_tables(size)
+        shifts = np.arange(0, 4 * size, 4)
+        _batch_tables[size] = {
+            "left_cells": ((tables["left"][:, None] >> shifts) & 0xF).astype(np.uint8),
+            "score": tables["score"],
+            "left_changed": tables["left_changed"],
+            "right_changed": tables["right_changed"],
+        }
+    return _batch_tables[size]
+
+
+def _row_index(cells):
+    """
+    Packs the last axis of an array of tile
+    exponents into row table indices.
+    """
+    cells = cells.astype(np.int32)
+    index = cells[..., 0]
+    for i in range(1, cells.shape[-1]):
+        index = index | (cells[..., i] << (4 * i))
+    return index
+
+
+def _row_moves(cells):
+    """
+    Checks which rows (along the last axis) change when
+    moved to the front and when moved to the back.
+    Every pair of equal tiles merges.
+    """
+    first = cells[..., :-1]
+    second = cells[..., 1:]
+    merge = (first == second) & (first != 0)
+    to_front = np.any(merge | ((first == 0) & (second != 0)), axis=-1)
+    to_back = np.any(merge | ((first != 0) & (second == 0)), axis=-1)
+    return to_front, to_back
+
 
-            # Move left
-            if direction == 'left':
-                to_front = True
-                self.shift_zeroes(self.board[i, :], to_front)
-                self.combine(self.board[i, :], to_front)
-                self.shift_zeroes(self.board[i, :], to_front)
-            
-            # Move right
-            elif direction == 'right':
-                to_front = False
-                self.shift_zeroes(self.board[i, :], to_front)
-                self.combine(self.board[i, :], to_front)
-                self.shift_zeroes(self.board[i, :], to_front)
-                
-            # Move up
-            elif direction == 'up':
-                to_front = True
-                self.shift_zeroes(self.board[:, i], to_front)
-                self.combine(self.board[:, i], to_front)
-                self.shift_zeroes(self.board[:, i], to_front)
-                
-            # Move down
-            elif direction == 'down':
-                to_front = False
-                self.shift_zeroes(self.board[:, i], to_front)
-                self.combine(self.board[:, i], to_front)
-                self.shift_zeroes(self.board[:, i], to_front)
-        
-        # Check to see if the move modified the state of the board
-        if not np.array_equal(prev_board, self.board):
-            new_num = random.choice([2, 4])
-            self.add_val(self.board, new_num)
-            # 1/25 chance of two numbers appearing 
-            # on the board instead of one
-            if random.randint(0, 25) == 7:
-                self.add_val(self.board, new_num)
-
-        
\ No newline at end of file
+# Batch of boards moved together for simulations
+class BatchBoard:
+    """
+    Batch class to represent many boards that are
+    moved together in one vectorized step.
+    Boards are stored in an (N, size, size) array of tile
+    exponents (0 for empty, 1 for 2, 2 for 4, ...).
+    Directions are given as indices into bitboard.DIRECTIONS.
+    """
+    def __init__(self, n, difficulty="normal", seed=None, size=4):
+        if difficulty not in DIFFICULTIES:
+            raise ValueError("Difficulty must be Easy/Normal/Hard")
+        self.n = n
+        self.size = size
+        self.cells = size * size
+        self.difficulty = difficulty
+        self.rng = np.random.default_rng(seed)
+        self.order = _direction_order(size)
+        self.tables = _get_batch_tables(size)
+        self.boards = np.zeros((n, size, size), dtype=np.uint8)
+        self.scores = np.zeros(n, dtype=np.int64)
+        self.reset()
+
+    def reset(self, mask=None):
+        """
+        Resets the selected boards (all boards by default)
+        to random starting boards with two 2s.
+        """
+        mask = np.ones(self.n, dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+        self.boards[mask] = 0
+        self.scores[mask] = 0
+        self.add_val(mask, 1)
+        self.add_val(mask, 1)
+
+    def tiles(self):
+        """
+        Returns the boards as an (N, size, size) array of tile values.
+        """
+        exponents = self.boards.astype(np.int64)
+        return np.where(exponents != 0, 1 << exponents, 0)
+
+    def add_val(self, mask, exponents):
+        """
+        Adds a tile with the given exponent (one per board,
+        or one for all boards) to a random empty space of
+        each selected board. Full boards are left unchanged.
+        """
+        flat = self.boards.reshape(self.n, self.cells)
+        empty = flat == 0
+        counts = empty.sum(axis=1)
+        mask = np.asarray(mask, dtype=bool) & (counts > 0)
+        rows = np.flatnonzero(mask)
+
+        # Pick the k-th empty space of every selected board
+        picks = (self.rng.random(rows.size) * counts[rows]).astype(np.int64)
+        cells = np.argmax(np.cumsum(empty[rows], axis=1) > picks[:, None], axis=1)
+        exponents = np.broadcast_to(exponents, (self.n,))[rows]
+        flat[rows, cells] = exponents
+
+    def add_new_tiles(self, mask):
+        """
+        Adds a 2 or a 4 to a random empty space of
+        each selected board. On hard difficulty, an extra
+        copy of the same number may appear as well.
+        """
+        exponents = self.rng.integers(1, 3, size=self.n).astype(np.uint8)
+        self.add_val(mask, exponents)
+        if self.difficulty == "hard":
+            # 1/26 chance of two numbers appearing, as in BoardHard
+            extra = mask & (self.rng.integers(0, 26, size=self.n) == 7)
+            self.add_val(extra, exponents)
+
+    def move(self, directions):
+        """
+        Moves the tiles of every board in its own direction
+        without adding new tiles. Returns the score gained
+        and whether each board changed.
+        """
+        order = self.order[np.broadcast_to(directions, (self.n,))]
+        flat = self.boards.reshape(self.n, self.cells)
+        rows = np.take_along_axis(flat, order, axis=1).reshape(self.n, self.size, self.size)
+
+        if self.tables is not None:
+            large = self._large_boards(rows)
+            index = _row_index(rows if large is None else np.where(large[:, None, None], 0, rows))
+            moved = self.tables["left_cells"][index]
+            rewards = self.tables["score"][index].sum(axis=1)
+            changed = self.tables["left_changed"][index].any(axis=1)
+            if large is not None:
+                moved[large], rewards[large], changed[large] = self._slide(rows[large])
+        else:
+            moved, rewards, changed = self._slide(rows)
+        np.put_along_axis(flat, order, moved.reshape(self.n, self.cells), axis=1)
+
+        self.scores += rewards
+        return rewards, changed
+
+    @staticmethod
+    def _slide(rows):
+        # Moves boards of rows to the left with no limit on the
+        # exponents. Returns the moved rows, the score gained and
+        # whether each board changed.
+        moved, score = bb.slide_rows(rows, max_exponent=None)
+        return moved, score.sum(axis=1), np.any(moved != rows, axis=(1, 2))
+
+    def _large_boards(self, boards):
+        # The row tables only hold exponents up to bitboard.MAX_EXPONENT
+        # and never merge tiles at it, so boards with such tiles are
+        # moved without them. Returns a mask of those boards, or None.
+        large = boards.reshape(len(boards), self.cells).max(axis=1) >= bb.MAX_EXPONENT
+        return large if large.any() else None
+
+    def step(self, directions):
+        """
+        Moves every board in its own direction and adds
+        new tiles to the boards that changed.
+        Returns the score gained and which boards have lost.
+        """
+        rewards, changed = self.move(directions)
+        self.add_new_tiles(changed)
+        return rewards, self.has_lost()
+
+    def keep(self, mask):
+        """
+        Removes the boards that aren't selected,
+        keeping the others in the same order.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        self.boards = self.boards[mask]
+        self.scores = self.scores[mask]
+        self.n = len(self.boards)
+
+    def clear_board(self, mask):
+        """
+        Clears the selected boards like BoardEasy.clear_board,
+        keeping the highest tile and two descending tiles.
+        """
+        rows = np.flatnonzero(mask)
+        max_exponents = self.boards[rows].reshape(rows.size, self.cells).max(axis=1)
+        self.boards[rows] = 0
+        self.boards[rows, 0, 1] = max_exponents
+        # Values above 4 keep two descending tiles, as far as they fit
+        large = max_exponents > 2
+        for j in range(2, min(4, self.size)):
+            self.boards[rows[large], 0, j] = max_exponents[large] - (j - 1)
+
+    def has_won(self):
+        """
+        Checks which boards have reached 2048.
+        """
+        return self.boards.reshape(self.n, self.cells).max(axis=1) >= bb.WIN_EXPONENT
+
+    def legal_moves(self):
+        """
+        Returns a 4-bit mask for every board of the directions
+        that change it, where bit i stands for bitboard.DIRECTIONS[i].
+        """
+        large = None if self.tables is None else self._large_boards(self.boards)
+        if self.tables is None:
+            up, down, left, right = self._board_moves(self.boards)
+        else:
+            boards = self.boards if large is None else np.where(large[:, None, None], 0, self.boards)
+            row_index = _row_index(boards)
+            column_index = _row_index(boards.transpose(0, 2, 1))
+            up = self.tables["left_changed"][column_index].any(axis=1)
+            down = self.tables["right_changed"][column_index].any(axis=1)
+            left = self.tables["left_changed"][row_index].any(axis=1)
+            right = self.tables["right_changed"][row_index].any(axis=1)
+            if large is not None:
+                up[large], down[large], left[large], right[large] = self._board_moves(self.boards[large])
+        return (up.astype(np.uint8) | (down.astype(np.uint8) << 1)
+                | (left.astype(np.uint8) << 2) | (right.astype(np.uint8) << 3))
+
+    @staticmethod
+    def _board_moves(boards):
+        # Checks which boards change when moved up, down, left and right
+        up, down = _row_moves(boards.transpose(0, 2, 1))
+        left, right = _row_moves(boards)
+        return tuple(moves.any(axis=1) for moves in (up, down, left, right))
+
+    def has_lost(self):
+        """
+        Checks which boards are full with no
+        equal, adjacent tiles left to combine.
+        """
+        # Only an empty board has no legal moves without being full
+        return (self.legal_moves() == 0) & np.any(self.boards.reshape(self.n, self.cells) != 0, axis=1)
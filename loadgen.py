@@ -0,0 +1,183 @@
+"""
+Load generator for the game server.
+
+Opens many sessions over a number of connections, plays
+random moves in all of them at once, and reports the move
+latency percentiles and how many sessions fit in a GB of
+server memory. Starts its own server on a Unix socket
+unless the address of a running server is given.
+
+Example:
+    python loadgen.py --sessions 10000 --connections 50 --moves 20
+    python loadgen.py --port 2048 --sessions 1000
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import bitboard as bb
+import gamelogic as gl
+import server
+
+
+async def send(reader, writer, message):
+    """
+    Sends one request and waits for its response.
+    """
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+    response = json.loads(await reader.readline())
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response
+
+
+async def open_sessions(connect, sessions, difficulty, size):
+    """
+    Opens a connection and starts the given number of
+    sessions on it. Returns the connection and the sessions.
+    """
+    reader, writer = await connect()
+    ids = []
+    for _ in range(sessions):
+        response = await send(reader, writer, {"op": "new", "difficulty": difficulty, "size": size})
+        ids.append(response["session"])
+    return reader, writer, ids
+
+
+async def play_moves(reader, writer, ids, moves, rng):
+    """
+    Plays random moves in turn in every session of a
+    connection. Returns the latency of every move in seconds.
+    """
+    latencies = []
+    for _ in range(moves):
+        for session in ids:
+            direction = rng.choice(bb.DIRECTIONS)
+            start = time.perf_counter()
+            await send(reader, writer, {"op": "move", "session": session, "direction": direction})
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def run_load(connect, sessions, connections, moves, difficulty="normal", size=4, seed=0):
+    """
+    Runs the load against a server. Returns the move
+    latencies, the time spent moving, and the memory used
+    by the server before and after starting the sessions.
+    """
+    reader, writer = await connect()
+    before = (await send(reader, writer, {"op": "stats"}))["memory"]
+
+    counts = [sessions // connections + (i < sessions % connections) for i in range(connections)]
+    opened = await asyncio.gather(*(
+        open_sessions(connect, count, difficulty, size) for count in counts))
+    after = (await send(reader, writer, {"op": "stats"}))["memory"]
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        play_moves(r, w, ids, moves, random.Random(seed + i))
+        for i, (r, w, ids) in enumerate(opened)))
+    elapsed = time.perf_counter() - start
+
+    for _, w, _ in opened + [(reader, writer, None)]:
+        w.close()
+    latencies = np.array([latency for result in results for latency in result])
+    return latencies, elapsed, before, after
+
+
+def report(latencies, elapsed, sessions, before, after):
+    """
+    Formats the latency percentiles, the throughput and
+    the sessions per GB of server memory as text.
+    """
+    lines = [f"Sessions: {sessions}"]
+    if latencies.size:
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+        lines.append(f"Moves: {latencies.size} in {elapsed:.2f}s "
+                     f"({latencies.size / elapsed:,.0f}/sec)")
+        lines.append(f"Move latency: p50 {p50:.3f}ms, p90 {p90:.3f}ms, "
+                     f"p99 {p99:.3f}ms, max {latencies.max() * 1000:.3f}ms")
+    used = after - before
+    if used > 0:
+        lines.append(f"Memory: {used / 2 ** 20:.1f} MB for the sessions "
+                     f"({sessions * 2 ** 30 / used:,.0f} sessions/GB)")
+    else:
+        lines.append("Memory: too few sessions to measure")
+    return "\n".join(lines)
+
+
+async def start_server(path, timeout=10.0):
+    """
+    Starts a server process on a Unix socket and waits
+    until it accepts connections.
+    """
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, server.__file__, "--unix", path)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_unix_connection(path)
+            writer.close()
+            return process
+        except OSError:
+            if time.monotonic() > deadline or process.returncode is not None:
+                process.kill()
+                raise RuntimeError("The server didn't start")
+            await asyncio.sleep(0.05)
+
+
+async def main_async(args):
+    limit = server.LINE_LIMIT
+    with contextlib.ExitStack() as stack:
+        process = None
+        if args.unix or args.port is None:
+            path = args.unix
+            if path is None:
+                # The socket and its directory are removed with the server
+                directory = stack.enter_context(tempfile.TemporaryDirectory())
+                path = os.path.join(directory, "server.sock")
+                process = await start_server(path)
+            connect = lambda: asyncio.open_unix_connection(path, limit=limit)
+        else:
+            connect = lambda: asyncio.open_connection(args.host, args.port, limit=limit)
+
+        try:
+            latencies, elapsed, before, after = await run_load(
+                connect, args.sessions, args.connections, args.moves,
+                args.difficulty, args.size, args.seed)
+        finally:
+            if process is not None:
+                process.terminate()
+                await process.wait()
+    print(report(latencies, elapsed, args.sessions, before, after))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Put load on the 2048 game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None,
+                        help="port of a running server")
+    parser.add_argument("--unix", default=None,
+                        help="Unix socket of a running server")
+    parser.add_argument("--sessions", type=float, default=1000)
+    parser.add_argument("--connections", type=int, default=10)
+    parser.add_argument("--moves", type=int, default=10,
+                        help="moves played in every session")
+    parser.add_argument("--difficulty", choices=sorted(gl.BOARD_CLASSES), default="normal")
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    args.sessions = int(args.sessions)
+    args.connections = max(1, min(args.connections, args.sessions))
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
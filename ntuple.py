@@ -0,0 +1,296 @@
+"""
+N-tuple network evaluator and TD learning trainer.
+
+An n-tuple network values a board by looking up the tile
+exponents of a few fixed groups of cells (the tuples) in
+weight tables, for each of the 8 rotations and reflections
+of the board, and adding the weights up. The weights of all
+tuples are kept in one flat array, indexed by the packed
+exponents of the cells of a tuple.
+
+The trainer plays many games at once on a BatchBoard and
+learns the value of afterstates (the board after a move,
+before the new tile) with TD(0), as in Szubert and
+Jaskowski's 2048 players. Weights can be checkpointed to a
+.npy file that is memory-mapped, so training can continue
+from it in place and other processes can read it.
+
+Example:
+    python ntuple.py --games 100000 --checkpoint weights.npy
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import bitboard as bb
+import gamelogic as gl
+
+# Two 6-cell rectangles and two 6-cell lines with a bend,
+# the tuples of the strongest known 2048 networks
+TUPLES_6 = (
+    (0, 1, 2, 3, 4, 5),
+    (4, 5, 6, 7, 8, 9),
+    (0, 1, 2, 4, 5, 6),
+    (4, 5, 6, 8, 9, 10),
+)
+# Smaller 4-cell tuples that learn faster and use far less memory
+TUPLES_4 = (
+    (0, 1, 2, 3),
+    (4, 5, 6, 7),
+    (0, 1, 4, 5),
+    (1, 2, 5, 6),
+    (5, 6, 9, 10),
+)
+TUPLE_SETS = {4: TUPLES_4, 6: TUPLES_6}
+
+_CELL_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+
+
+def symmetric_cells(tuples):
+    """
+    Returns the cells covered by every tuple on every
+    symmetry of the board, as an (8 * tuples, length) array.
+    """
+    # A board whose cells hold their own index shows where
+    # each cell of a transformed board comes from
+    identity = sum(i << (4 * i) for i in range(16))
+    cells = []
+    for transform in bb.TRANSFORMS:
+        moved = bb.apply_transform(identity, transform)
+        source = [(moved >> (4 * i)) & 0xF for i in range(16)]
+        cells.extend([source[cell] for cell in cells_of] for cells_of in tuples)
+    return np.array(cells, dtype=np.intp)
+
+
+def exponents(packed):
+    """
+    Returns the 16 tile exponents of a packed board.
+    """
+    return ((np.uint64(packed) >> _CELL_SHIFTS) & np.uint64(0xF)).astype(np.uint8)
+
+
+class NTupleNetwork:
+    """
+    Values 4x4 boards with the given tuples of cell
+    indices (row * 4 + col), all of the same length.
+    """
+    def __init__(self, tuples=TUPLES_6, weights=None):
+        self.tuples = tuple(tuple(cells) for cells in tuples)
+        self.length = len(self.tuples[0])
+        if any(len(cells) != self.length for cells in self.tuples):
+            raise ValueError("Every tuple must have the same length")
+        self.table_size = 16 ** self.length
+        self.cells = symmetric_cells(self.tuples)
+        self.offsets = np.tile(np.arange(len(self.tuples)) * self.table_size, 8)
+        self.shifts = np.arange(0, 4 * self.length, 4)
+        if weights is None:
+            weights = np.zeros(len(self.tuples) * self.table_size, dtype=np.float32)
+        if weights.shape != (len(self.tuples) * self.table_size,):
+            raise ValueError("Weights don't match the tuples")
+        self.weights = weights
+
+    def features(self, boards):
+        """
+        Returns the weight indices of boards given as arrays
+        of 16 tile exponents, with shape (..., 8 * tuples).
+        """
+        cells = boards[..., self.cells].astype(np.intp)
+        return np.sum(cells << self.shifts, axis=-1) + self.offsets
+
+    def values(self, boards):
+        """
+        Returns the values of boards given as arrays
+        of 16 tile exponents.
+        """
+        return self.weights[self.features(boards)].sum(axis=-1)
+
+    def value(self, packed):
+        """
+        Returns the value of a packed board.
+        """
+        return float(self.values(exponents(packed)))
+
+    def evaluate(self, board):
+        """
+        Returns the score gained plus the value of the
+        afterstate of every direction that changes the given
+        Board (or packed board).
+        """
+        if not isinstance(board, int):
+            if board.size != 4:
+                raise ValueError("N-tuple networks only support 4x4 boards")
+            board = board.packed
+        boards, scores, moved = bb.successors(board)
+        legal = [i for i in range(4) if moved >> i & 1]
+        if not legal:
+            return {}
+        values = self.values(np.array([exponents(boards[i]) for i in legal]))
+        return {bb.DIRECTIONS[i]: scores[i] + float(value) for i, value in zip(legal, values)}
+
+    def best_move(self, board):
+        """
+        Returns the direction with the best afterstate,
+        or None if no move is possible.
+        """
+        values = self.evaluate(board)
+        if not values:
+            return None
+        return max(values, key=values.get)
+
+    def save(self, path):
+        """
+        Saves the weights to a .npy file that can be memory-
+        mapped, with the tuples in a .json file next to it.
+        """
+        temp_path = path + ".tmp.npy"
+        out = np.lib.format.open_memmap(
+            temp_path, mode="w+", dtype=self.weights.dtype, shape=self.weights.shape)
+        out[:] = self.weights
+        out.flush()
+        del out
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({"tuples": self.tuples}, f)
+        os.replace(temp_path, path)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    @classmethod
+    def load(cls, path, mode="r"):
+        """
+        Loads a network saved with save, memory-mapping its
+        weights. Use mode "r+" to train it in place.
+        """
+        with open(path + ".json") as f:
+            tuples = json.load(f)["tuples"]
+        return cls(tuples, np.load(path, mmap_mode=mode))
+
+    def flush(self):
+        """
+        Writes weights mapped from a file back to it.
+        """
+        if isinstance(self.weights, np.memmap):
+            self.weights.flush()
+
+
+# Trainer playing many games at once
+class TDTrainer:
+    """
+    Trains a network with TD(0) on afterstates, playing
+    n games at once and always picking the best move.
+    Every finished game starts over right away.
+    The games update the weights together after every
+    move, so too many at once (over about 100) pile up
+    updates on the same weights and stop it from learning.
+    """
+    def __init__(self, network, n=64, learning_rate=0.0025, difficulty="normal", seed=None):
+        if difficulty not in ("normal", "hard"):
+            raise ValueError("Difficulty must be Normal/Hard")
+        self.network = network
+        self.n = n
+        self.learning_rate = learning_rate
+        self.batch = gl.BatchBoard(n, difficulty, seed=seed)
+        # Every board moved in every direction at once
+        self.afterstates = gl.BatchBoard(4 * n, seed=seed)
+        self.directions = np.tile(np.arange(4), n)
+        # Features of the afterstate each game moved to last
+        self.last_features = np.zeros((n, network.cells.shape[0]), dtype=np.intp)
+        self.has_last = np.zeros(n, dtype=bool)
+        self.games = 0
+
+    def step(self):
+        """
+        Moves every game once and updates the weights.
+        Returns the scores of the games that ended.
+        """
+        n = self.n
+        network = self.network
+        self.afterstates.boards[:] = np.repeat(self.batch.boards, 4, axis=0)
+        self.afterstates.scores[:] = 0
+        rewards, changed = self.afterstates.move(self.directions)
+        rewards = rewards.reshape(n, 4)
+        legal = changed.reshape(n, 4)
+
+        features = network.features(self.afterstates.boards.reshape(4 * n, 16))
+        values = network.weights[features].sum(axis=1).reshape(n, 4)
+        moves = np.where(legal, rewards + values, -np.inf)
+        best = np.argmax(moves, axis=1)
+        alive = legal.any(axis=1)
+        games = np.arange(n)
+
+        # Move the value of the last afterstate towards the reward
+        # and value of the next one, or 0 if the game ended
+        target = np.where(alive, moves[games, best], 0.0)
+        last = np.flatnonzero(self.has_last)
+        if last.size:
+            last_features = self.last_features[last]
+            error = target[last] - network.weights[last_features].sum(axis=1)
+            np.add.at(network.weights, last_features,
+                      (self.learning_rate * error)[:, None].astype(network.weights.dtype))
+
+        playing = np.flatnonzero(alive)
+        chosen = playing * 4 + best[playing]
+        self.batch.boards[playing] = self.afterstates.boards[chosen]
+        self.batch.scores[playing] += rewards[playing, best[playing]]
+        self.last_features[playing] = features[chosen]
+        self.has_last[:] = alive
+        self.batch.add_new_tiles(alive)
+
+        ended = ~alive
+        scores = self.batch.scores[ended]
+        if scores.size:
+            self.games += scores.size
+            self.batch.reset(ended)
+        return scores
+
+    def train(self, games):
+        """
+        Plays until the given number of games have finished.
+        Returns the scores of the games finished.
+        """
+        scores = []
+        target = self.games + games
+        while self.games < target:
+            scores.append(self.step())
+        return np.concatenate(scores)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train an n-tuple network with TD learning.")
+    parser.add_argument("--games", type=float, default=10000)
+    parser.add_argument("--parallel", type=int, default=64,
+                        help="games played at once")
+    parser.add_argument("--tuples", type=int, choices=sorted(TUPLE_SETS), default=6,
+                        help="length of the tuples")
+    parser.add_argument("--learning-rate", type=float, default=0.0025)
+    parser.add_argument("--difficulty", choices=["normal", "hard"], default="normal")
+    parser.add_argument("--checkpoint", default=None,
+                        help=".npy file to train in place, created if missing")
+    parser.add_argument("--report-every", type=float, default=1000,
+                        help="games between progress reports and checkpoints")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        network = NTupleNetwork.load(args.checkpoint, mode="r+")
+    else:
+        network = NTupleNetwork(TUPLE_SETS[args.tuples])
+        if args.checkpoint:
+            network.save(args.checkpoint)
+            network = NTupleNetwork.load(args.checkpoint, mode="r+")
+
+    trainer = TDTrainer(network, args.parallel, args.learning_rate, args.difficulty, args.seed)
+    played = 0
+    start = time.perf_counter()
+    while played < int(args.games):
+        games = min(int(args.report_every), int(args.games) - played)
+        scores = trainer.train(games)
+        played += scores.size
+        network.flush()
+        elapsed = time.perf_counter() - start
+        print(f"{played} games, {played / elapsed:,.1f} games/sec, "
+              f"mean score {scores.mean():.0f}, max {scores.max()}")
+
+
+if __name__ == "__main__":
+    main()
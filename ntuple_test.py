@@ -0,0 +1,86 @@
+import bitboard as bb
+import gamelogic as gl
+import ntuple
+import os
+import tempfile
+import unittest
+import numpy as np
+
+class TestNTuple(unittest.TestCase):
+
+    def random_network(self, seed):
+        network = ntuple.NTupleNetwork(ntuple.TUPLES_4)
+        network.weights[:] = np.random.default_rng(seed).random(network.weights.size)
+        return network
+
+    def test_value(self):
+        network = self.random_network(0)
+        board = bb.pack(np.array([[2, 4, 0, 2],
+                                  [0, 0, 8, 0],
+                                  [0, 16, 0, 0],
+                                  [32, 0, 0, 64]]))
+
+        # Add up the weights of every tuple on every symmetry by hand
+        expected = 0.0
+        for symmetry in bb.symmetries(board):
+            for t, cells in enumerate(network.tuples):
+                index = sum(((symmetry >> (4 * cell)) & 0xF) << (4 * k)
+                            for k, cell in enumerate(cells))
+                expected += network.weights[t * network.table_size + index]
+        self.assertAlmostEqual(network.value(board), expected, places=3)
+
+        # Check that every symmetry has the same value
+        for symmetry in bb.symmetries(board):
+            self.assertAlmostEqual(network.value(symmetry), expected, places=3)
+
+        print("Test value passed")
+
+    def test_best_move(self):
+        network = self.random_network(1)
+        board_instance = gl.Board()
+        board_instance.board = np.array([[2, 4, 8, 16],
+                                         [0, 0, 0, 0],
+                                         [0, 0, 0, 0],
+                                         [0, 0, 0, 0]])
+        self.assertEqual(set(network.evaluate(board_instance)), {"down"})
+        self.assertEqual(network.best_move(board_instance), "down")
+
+        board_instance.board = np.array([[2, 4, 8, 16],
+                                         [16, 8, 4, 2],
+                                         [2, 4, 8, 16],
+                                         [16, 8, 4, 2]])
+        self.assertIsNone(network.best_move(board_instance))
+
+        print("Test best_move passed")
+
+    def test_train(self):
+        network = ntuple.NTupleNetwork(ntuple.TUPLES_4)
+        trainer = ntuple.TDTrainer(network, n=16, seed=2)
+        scores = trainer.train(20)
+        self.assertGreaterEqual(scores.size, 20)
+        self.assertEqual(trainer.games, scores.size)
+        self.assertTrue(np.any(network.weights != 0), "Training should change the weights")
+
+        print("Test train passed")
+
+    def test_checkpoint(self):
+        network = self.random_network(3)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "weights.npy")
+            network.save(path)
+            loaded = ntuple.NTupleNetwork.load(path, mode="r+")
+            self.assertIsInstance(loaded.weights, np.memmap)
+            self.assertEqual(loaded.tuples, network.tuples)
+            self.assertTrue(np.array_equal(loaded.weights, network.weights))
+
+            # Check that training in place writes to the file
+            loaded.weights[5] = 42
+            loaded.flush()
+            self.assertEqual(np.load(path, mmap_mode="r")[5], 42)
+            del loaded
+
+        print("Test checkpoint passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,418 @@
+"""
+Compact binary records of played games.
+
+A record file starts with the 8 bytes of RECORD_MAGIC,
+followed by one record per game: a GAME_HEADER with the
+seed of the board, the difficulty, the starting board and
+the score, then one byte per move of a 4x4 board:
+
+    bits 0-1  direction, an index into bitboard.DIRECTIONS
+    bits 2-5  cell of the new tile (row * 4 + col)
+    bit 6     value of the new tile, 0 for a 2 and 1 for a 4
+    bit 7     set if an extra byte follows
+
+The extra byte holds the cell of the second new tile that
+Hard boards sometimes add, with the same value as the first.
+A cleared Easy board is stored as the byte 0x80 followed by
+CLEAR. Extra bytes never have bit 7 set, so the bytes that
+follow a byte with bit 7 set are exactly the extra bytes.
+
+GameWriter records the games played on Boards it is attached
+to. GameReader memory-maps a record file, so games can be
+scanned or sampled without reading the whole file.
+
+Example:
+    python records.py write games.rec --games 10000 --difficulty hard
+    python records.py stats games.rec
+"""
+import argparse
+import random
+import struct
+import time
+
+import numpy as np
+import bitboard as bb
+import gamelogic as gl
+import simulate
+
+RECORD_MAGIC = b"2048REC\x01"
+
+# Header before the moves of every game
+GAME_HEADER = np.dtype([
+    ("length", "<u4"),        # bytes of move data after the header
+    ("moves", "<u4"),         # moves made, not counting clears
+    ("seed", "<u8"),
+    ("start", "<u8"),         # packed starting board
+    ("start_score", "<u4"),
+    ("score", "<u4"),
+    ("difficulty", "u1"),     # index into gamelogic.DIFFICULTIES
+    ("max_exponent", "u1"),
+])
+
+EXTRA_FLAG = 0x80
+FOUR_FLAG = 0x40
+# Extra byte of a cleared board
+CLEAR = 0x10
+
+# Decoded moves, one per move or clear
+EVENT = np.dtype([
+    ("direction", "u1"),
+    ("cell", "u1"),
+    ("value", "u1"),          # 2 or 4
+    ("second", "i1"),         # cell of a second new tile, or -1
+    ("clear", "?"),
+])
+
+
+def cleared(packed):
+    """
+    Returns a packed board cleared as
+    BoardEasy.clear_board clears it.
+    """
+    top = bb.max_exponent(packed)
+    exponents = [top]
+    if top > 2:
+        exponents += [top - 1, top - 2]
+    # Values go in the top row from the second column
+    return sum(exponent << (4 * (j + 1)) for j, exponent in enumerate(exponents))
+
+
+# Writer appending the games played on boards to a file
+class GameWriter:
+    """
+    Writes the record of every game played on the Boards
+    attached to it. A record is written once the game on a
+    board is over: when the board is reset, restored (such
+    as by an undo), attached to another writer, or when the
+    writer is closed. Only 4x4 boards can be recorded, and a
+    record ends with the last move before a board leaves the
+    packed engine (with a tile of 65536 or more).
+    """
+    def __init__(self, path, append=True):
+        self.file = open(path, "ab" if append else "wb")
+        if self.file.tell() == 0:
+            self.file.write(RECORD_MAGIC)
+        self.games = 0
+        self.board = None
+        self._moves = bytearray()
+        self._count = 0
+        self._spawns = 0
+        self._header = None
+        # Packed board and score after the last recorded move
+        self._packed = 0
+        self._score = 0
+
+    def attach(self, board):
+        """
+        Starts recording the game on a Board from its
+        current state.
+        """
+        board.recorder = self
+        self.start(board)
+
+    def start(self, board):
+        """
+        Ends the record in progress and starts a new one
+        from the current state of the given Board.
+        """
+        self.finish()
+        self.board = board
+        if board.size != 4 or board.packed is None:
+            # Wait for a board that can be recorded
+            return
+        self._header = np.zeros((), dtype=GAME_HEADER)
+        self._header["seed"] = board.seed
+        self._header["start"] = board.packed
+        self._header["start_score"] = board.score
+        self._header["difficulty"] = gl.DIFFICULTIES.index(board.difficulty)
+        self._packed = board.packed
+        self._score = board.score
+
+    def move(self, direction):
+        """
+        Records a move. The byte is completed by the new tile.
+        """
+        if self._header is None:
+            return
+        if self.board.packed is None:
+            # The move can't be replayed on packed boards,
+            # so the record ends with the move before it
+            self.finish()
+            return
+        self._moves.append(bb.DIRECTIONS.index(direction))
+        self._count += 1
+        self._spawns = 0
+        self._packed = self.board.packed
+        self._score = self.board.score
+
+    def spawn(self, cell, value):
+        """
+        Records a new tile added after the last move.
+        """
+        if self._header is None:
+            return
+        if self._spawns == 0:
+            self._moves[-1] |= (cell << 2) | (FOUR_FLAG if value == 4 else 0)
+        else:
+            self._moves[-1] |= EXTRA_FLAG
+            self._moves.append(cell)
+        self._spawns += 1
+        self._packed = self.board.packed
+
+    def clear(self, board):
+        """
+        Records that an Easy board was cleared.
+        """
+        if self._header is not None and board.packed is not None:
+            self._moves += bytes((EXTRA_FLAG, CLEAR))
+            self._packed = board.packed
+        else:
+            self.start(board)
+
+    def finish(self):
+        """
+        Writes the record in progress, if it has any moves.
+        """
+        header = self._header
+        self._header = None
+        if header is None or not self._moves:
+            self._moves.clear()
+            self._count = 0
+            return
+        header["length"] = len(self._moves)
+        header["moves"] = self._count
+        header["score"] = self._score
+        header["max_exponent"] = bb.max_exponent(self._packed)
+        self.file.write(header.tobytes())
+        self.file.write(self._moves)
+        self._moves.clear()
+        self._count = 0
+        self.games += 1
+
+    def close(self):
+        """
+        Writes the record in progress and closes the file.
+        """
+        self.finish()
+        if self.board is not None and self.board.recorder is self:
+            self.board.recorder = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def decode(moves):
+    """
+    Decodes the move bytes of a game into an array of EVENT.
+    """
+    if isinstance(moves, (bytes, bytearray)):
+        moves = np.frombuffer(moves, dtype=np.uint8)
+    moves = np.asarray(moves, dtype=np.uint8)
+    extra = np.zeros(moves.size, dtype=bool)
+    extra[1:] = moves[:-1] >= EXTRA_FLAG
+    main = moves[~extra]
+    extra_bytes = moves[extra]
+
+    events = np.zeros(main.size, dtype=EVENT)
+    events["direction"] = main & 3
+    events["cell"] = (main >> 2) & 0xF
+    events["value"] = np.where(main & FOUR_FLAG, 4, 2)
+    has_extra = np.flatnonzero(main >= EXTRA_FLAG)
+    clears = (extra_bytes & CLEAR) != 0
+    events["clear"][has_extra] = clears
+    events["second"] = -1
+    events["second"][has_extra[~clears]] = extra_bytes[~clears] & 0xF
+    return events
+
+
+def states(header, moves):
+    """
+    Replays a game, yielding the packed board and the
+    score after every move or clear.
+    """
+    packed = int(header["start"])
+    score = int(header["start_score"])
+    for event in decode(moves).tolist():
+        direction, cell, value, second, clear = event
+        if clear:
+            packed = cleared(packed)
+        else:
+            packed, gained = bb.move(packed, bb.DIRECTIONS[direction])
+            score += gained
+            exponent = 1 if value == 2 else 2
+            packed |= exponent << (4 * cell)
+            if second >= 0:
+                packed |= exponent << (4 * second)
+        yield packed, score
+
+
+def replay(header, moves):
+    """
+    Returns the packed board and score at the end of a game.
+    """
+    packed, score = int(header["start"]), int(header["start_score"])
+    for packed, score in states(header, moves):
+        pass
+    return packed, score
+
+
+# Reader of record files
+class GameReader:
+    """
+    Memory-maps a record file and indexes its games by
+    hopping from header to header, without reading the moves.
+    A record cut short at the end of the file is left out.
+    """
+    def __init__(self, path):
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if self.data[:len(RECORD_MAGIC)].tobytes() != RECORD_MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+
+        offsets = []
+        offset = len(RECORD_MAGIC)
+        end = self.data.size - GAME_HEADER.itemsize
+        while offset <= end:
+            length, = struct.unpack_from("<I", self.data, offset)
+            if offset + GAME_HEADER.itemsize + length > self.data.size:
+                break
+            offsets.append(offset)
+            offset += GAME_HEADER.itemsize + length
+        self.offsets = np.array(offsets, dtype=np.int64)
+
+        # Gather the header bytes of every game into one array
+        header_bytes = self.data[self.offsets[:, None] + np.arange(GAME_HEADER.itemsize)]
+        self.headers = header_bytes.view(GAME_HEADER).reshape(-1)
+
+    def __len__(self):
+        return self.offsets.size
+
+    def moves(self, i):
+        """
+        Returns the move bytes of game i as a view of the file.
+        """
+        start = int(self.offsets[i]) + GAME_HEADER.itemsize
+        return self.data[start:start + int(self.headers[i]["length"])]
+
+    def game(self, i):
+        """
+        Returns the header and the move bytes of game i.
+        """
+        return self.headers[i], self.moves(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.game(i)
+
+    def scan(self, chunk=65536):
+        """
+        Decodes every game, a chunk of games at a time.
+        Yields the headers of the games in a chunk, their
+        moves as an array of EVENT, and the index of the game
+        of every move. Only one chunk is read into memory.
+        """
+        size = GAME_HEADER.itemsize
+        for first in range(0, len(self), chunk):
+            offsets = self.offsets[first:first + chunk]
+            headers = self.headers[first:first + chunk]
+            lengths = headers["length"].astype(np.int64)
+            start = int(offsets[0])
+            data = self.data[start:int(offsets[-1]) + size + int(lengths[-1])]
+
+            # Drop the header bytes between the games, the moves
+            # of a game never end with a byte expecting another
+            is_move = np.ones(data.size, dtype=bool)
+            is_move[(offsets - start)[:, None] + np.arange(size)] = False
+            moves = data[is_move]
+            games = np.repeat(np.arange(first, first + offsets.size), lengths)
+            extra = np.zeros(moves.size, dtype=bool)
+            extra[1:] = moves[:-1] >= EXTRA_FLAG
+            yield headers, decode(moves), games[~extra]
+
+    def sample(self, k, rng=None):
+        """
+        Returns k games picked at random without replacement.
+        """
+        rng = np.random.default_rng() if rng is None else rng
+        picks = rng.choice(len(self), size=min(k, len(self)), replace=False)
+        return [self.game(i) for i in picks]
+
+
+def record_games(path, games, difficulty="normal", policy="random", seed=0, depth=2, clears=0):
+    """
+    Plays games with one of the simulate.py policies and
+    appends their records to a file. Game i is played on a
+    board seeded with seed + i.
+    """
+    play = simulate.make_policy(policy, depth)
+    board_class = gl.BOARD_CLASSES[difficulty]
+    with GameWriter(path) as writer:
+        for i in range(games):
+            # Seed the random policy too
+            random.seed(seed + i)
+            board = board_class(history_size=0, seed=seed + i)
+            writer.attach(board)
+            simulate.play_game(board, play, clears=clears)
+            writer.finish()
+    return writer.games
+
+
+def stats(path):
+    """
+    Formats the size of the games in a record file and how
+    fast they can be indexed and decoded as text.
+    """
+    start = time.perf_counter()
+    reader = GameReader(path)
+    indexed = time.perf_counter() - start
+    games = len(reader)
+    lines = [f"Games: {games} in {reader.data.size / 2 ** 20:.2f} MB"]
+    if games == 0:
+        return "\n".join(lines)
+
+    moves = int(reader.headers["moves"].sum())
+    lines.append(f"Storage: {reader.data.size / games:.1f} bytes/game, "
+                 f"{reader.headers['length'].sum() / moves:.3f} bytes/move")
+    lines.append(f"Score: mean {reader.headers['score'].mean():.1f}, "
+                 f"max {reader.headers['score'].max()}")
+
+    start = time.perf_counter()
+    for _ in reader.scan():
+        pass
+    elapsed = time.perf_counter() - start
+    lines.append(f"Index: {games / indexed:,.0f} games/sec")
+    lines.append(f"Scan: {games / elapsed:,.0f} games/sec, {moves / elapsed:,.0f} moves/sec, "
+                 f"{reader.data.size / 2 ** 20 / elapsed:.1f} MB/sec")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write and read binary game records.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    write = commands.add_parser("write", help="play games and record them")
+    write.add_argument("path")
+    write.add_argument("--games", type=float, default=1000)
+    write.add_argument("--difficulty", choices=gl.DIFFICULTIES, default="normal")
+    write.add_argument("--policy", choices=simulate.POLICIES, default="random")
+    write.add_argument("--depth", type=int, default=2)
+    write.add_argument("--clears", type=int, default=0,
+                       help="times an Easy board may be cleared when stuck")
+    write.add_argument("--seed", type=int, default=0)
+    read = commands.add_parser("stats", help="report the size and scan speed of a file")
+    read.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "write":
+        start = time.perf_counter()
+        games = record_games(args.path, int(args.games), args.difficulty, args.policy,
+                             args.seed, args.depth, args.clears)
+        print(f"Recorded {games} games in {time.perf_counter() - start:.2f}s")
+    else:
+        print(stats(args.path))
+
+
+if __name__ == "__main__":
+    main()
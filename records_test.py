@@ -0,0 +1,160 @@
+import bitboard as bb
+import gamelogic as gl
+import os
+import random
+import records
+import simulate
+import tempfile
+import unittest
+import numpy as np
+
+class TestRecords(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "games.rec")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def play(self, board_class, games, clears=0):
+        # Plays random games, returning their final boards and scores
+        # Boards draw their tiles from their own seeds, the random policy from random
+        random.seed(0)
+        finals = []
+        with records.GameWriter(self.path) as writer:
+            for game in range(games):
+                board = board_class(history_size=0, seed=game)
+                writer.attach(board)
+                simulate.play_game(board, simulate.random_policy, clears=clears)
+                writer.finish()
+                finals.append((board.packed, board.score))
+        return finals
+
+    def test_replay(self):
+        for board_class in (gl.Board, gl.BoardHard, gl.BoardEasy):
+            finals = self.play(board_class, 20, clears=2)
+            reader = records.GameReader(self.path)
+            self.assertEqual(len(reader), 20)
+            for (header, moves), final in zip(reader, finals):
+                self.assertEqual(records.replay(header, moves), final)
+                self.assertEqual(header["score"], final[1])
+
+            # Check that the seed gives the same game for the same moves
+            header, moves = reader.game(0)
+            board = board_class(seed=int(header["seed"]))
+            self.assertEqual(board.packed, header["start"])
+            for event in records.decode(moves):
+                if event["clear"]:
+                    board.clear_board()
+                else:
+                    board.move(bb.DIRECTIONS[event["direction"]])
+            self.assertEqual((board.packed, board.score), finals[0])
+            os.remove(self.path)
+
+        print("Test replay passed")
+
+    def test_decode(self):
+        # Left with a 4 in cell 5, then down with two 2s in cells 3 and 9,
+        # then a clear
+        moves = bytes([2 | 5 << 2 | 0x40, 0x80 | 1 | 3 << 2, 9, 0x80, records.CLEAR])
+        events = records.decode(moves)
+        self.assertEqual(events["direction"].tolist(), [2, 1, 0])
+        self.assertEqual(events["cell"][:2].tolist(), [5, 3])
+        self.assertEqual(events["value"][:2].tolist(), [4, 2])
+        self.assertEqual(events["second"].tolist(), [-1, 9, -1])
+        self.assertEqual(events["clear"].tolist(), [False, False, True])
+
+        print("Test decode passed")
+
+    def test_scan(self):
+        self.play(gl.BoardHard, 30)
+        reader = records.GameReader(self.path)
+        scanned = [(headers, events, games) for headers, events, games in reader.scan(chunk=7)]
+        self.assertEqual(sum(len(headers) for headers, _, _ in scanned), 30)
+        events = np.concatenate([events for _, events, _ in scanned])
+        games = np.concatenate([games for _, _, games in scanned])
+        for i in range(len(reader)):
+            self.assertTrue(np.array_equal(events[games == i], records.decode(reader.moves(i))))
+
+        sample = reader.sample(5, np.random.default_rng(0))
+        self.assertEqual(len(sample), 5)
+
+        print("Test scan passed")
+
+    def test_undo_and_truncation(self):
+        board = gl.Board(seed=1)
+        writer = records.GameWriter(self.path)
+        writer.attach(board)
+        for direction in ["left", "up", "right", "down"] * 5:
+            board.move(direction)
+        board.undo()
+        for direction in ["left", "up"] * 5:
+            board.move(direction)
+        writer.close()
+        self.assertIsNone(board.recorder)
+
+        # Undoing a move starts a new record from the restored board
+        reader = records.GameReader(self.path)
+        self.assertEqual(len(reader), 2)
+        self.assertEqual(records.replay(*reader.game(1)), (board.packed, board.score))
+
+        # A record cut short by a crash is left out
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        self.assertEqual(len(records.GameReader(self.path)), 1)
+
+        print("Test undo_and_truncation passed")
+
+    def test_assigned_board(self):
+        board = gl.Board(seed=3)
+        writer = records.GameWriter(self.path)
+        writer.attach(board)
+        board.move("left")
+        board.move("up")
+        board.board = np.array([[2, 2, 4, 0],
+                                [0, 8, 8, 0],
+                                [0, 0, 0, 0],
+                                [16, 0, 0, 16]])
+        board.move("left")
+        board.move("down")
+        writer.close()
+
+        # Assigning a board starts a new record from it
+        reader = records.GameReader(self.path)
+        self.assertEqual(len(reader), 2)
+        self.assertEqual(records.replay(*reader.game(1)), (board.packed, board.score))
+
+        print("Test assigned_board passed")
+
+    def test_unpacked_board(self):
+        board = gl.Board(seed=5)
+        writer = records.GameWriter(self.path)
+        writer.attach(board)
+        board.board = np.array([[32768, 16384, 16384, 0],
+                                [2, 4, 8, 16],
+                                [4, 8, 16, 32],
+                                [8, 16, 32, 64]])
+        board.move("up")
+        recorded = (board.packed, board.score)
+        # Two 32768 tiles side by side can't be moved on a packed board
+        board.move("right")
+        self.assertIsNone(board.packed)
+        board.move("left")
+        self.assertEqual(board.board[0].max(), 65536)
+        writer.close()
+
+        # The record ends with the last move before it
+        reader = records.GameReader(self.path)
+        self.assertEqual(len(reader), 1)
+        header, moves = reader.game(0)
+        self.assertEqual(header["moves"], 1)
+        self.assertEqual(records.replay(header, moves), recorded)
+        self.assertEqual(header["score"], recorded[1])
+        self.assertEqual(header["max_exponent"], 15)
+
+        print("Test unpacked_board passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Replay of recorded games with fast seeking.
+
+A Replay plays the moves of a game from records.py on a
+Board again, taking the new tiles from the record instead
+of picking them at random. The packed board and score are
+saved every `interval` moves as keyframes, so seeking to
+any move replays at most `interval` moves from the nearest
+keyframe before it.
+
+Example:
+    reader = records.GameReader("games.rec")
+    game = Replay(*reader.game(0))
+    game.seek(50000)
+    game.step_back()
+    print(game.board.board)
+"""
+import numpy as np
+import bitboard as bb
+import gamelogic as gl
+import records
+
+# Moves between keyframes
+KEYFRAME_INTERVAL = 256
+
+
+# Board taking its new tiles from a record
+class ReplayBoard(gl.BoardEasy):
+    """
+    Board whose new tiles are set before each move instead
+    of being picked at random. Clearing the board is allowed
+    for every difficulty, since it only happens in replays of
+    Easy games.
+    """
+    def __init__(self, difficulty="normal"):
+        super().__init__(difficulty=difficulty, history_size=0)
+        self.tiles = ()
+
+    def add_new_tiles(self):
+        """
+        Adds the tiles given for the last move.
+        """
+        for cell, value in self.tiles:
+            self.place(cell, value)
+
+
+# Replay of one recorded game
+class Replay:
+    """
+    Replays the game with the given header and move bytes,
+    as returned by records.GameReader.game. The board shows
+    the game after `position` moves (clears count as moves).
+    """
+    def __init__(self, header, moves, interval=KEYFRAME_INTERVAL):
+        self.interval = interval
+        self.events = records.decode(moves).tolist()
+        self.board = ReplayBoard(gl.DIFFICULTIES[header["difficulty"]])
+        self.board.restore(int(header["start"]), int(header["start_score"]))
+        self.position = 0
+
+        # Play the whole game once to save the keyframes
+        count = len(self.events) // interval + 1
+        self.keyframes = np.zeros(count, dtype=np.uint64)
+        self.scores = np.zeros(count, dtype=np.int64)
+        for i, event in enumerate(self.events):
+            if i % interval == 0:
+                self.keyframes[i // interval] = self.board.packed
+                self.scores[i // interval] = self.board.score
+            self._apply(event)
+        if len(self.events) % interval == 0:
+            self.keyframes[-1] = self.board.packed
+            self.scores[-1] = self.board.score
+        self.position = len(self.events)
+        self.seek(0)
+
+    def __len__(self):
+        return len(self.events)
+
+    def _apply(self, event):
+        # Plays one decoded move or clear on the board
+        direction, cell, value, second, clear = event
+        if clear:
+            self.board.clear_board()
+        else:
+            self.board.tiles = ((cell, value),) if second < 0 else ((cell, value), (second, value))
+            self.board.move(bb.DIRECTIONS[direction])
+        self.position += 1
+
+    def seek(self, position):
+        """
+        Shows the game after the given number of moves,
+        clamped to the length of the game.
+        """
+        position = min(max(position, 0), len(self.events))
+        keyframe = position // self.interval
+        # Keep playing from the current position if it is closer
+        if not keyframe * self.interval <= self.position <= position:
+            self.board.restore(int(self.keyframes[keyframe]), int(self.scores[keyframe]))
+            self.position = keyframe * self.interval
+        while self.position < position:
+            self._apply(self.events[self.position])
+
+    def step_forward(self):
+        """
+        Plays the next move. Returns whether there was one.
+        """
+        if self.position == len(self.events):
+            return False
+        self.seek(self.position + 1)
+        return True
+
+    def step_back(self):
+        """
+        Goes back one move. Returns whether there was one.
+        """
+        if self.position == 0:
+            return False
+        self.seek(self.position - 1)
+        return True
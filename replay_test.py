@@ -0,0 +1,61 @@
+import gamelogic as gl
+import os
+import random
+import records
+import replay
+import simulate
+import tempfile
+import unittest
+import numpy as np
+
+class TestReplay(unittest.TestCase):
+
+    def record(self, board_class, clears=0):
+        # Records one random game and returns its header and moves
+        # Boards draw their tiles from their own seeds, the random policy from random
+        random.seed(0)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "games.rec")
+            with records.GameWriter(path) as writer:
+                board = board_class(history_size=0, seed=0)
+                writer.attach(board)
+                simulate.play_game(board, simulate.random_policy, clears=clears)
+            header, moves = records.GameReader(path).game(0)
+            return np.copy(header), bytes(moves)
+
+    def test_seek(self):
+        for board_class in (gl.BoardEasy, gl.BoardHard):
+            header, moves = self.record(board_class, clears=20)
+            expected = [(int(header["start"]), int(header["start_score"]))]
+            expected += list(records.states(header, moves))
+            game = replay.Replay(header, moves, interval=16)
+            self.assertEqual(len(game), len(expected) - 1)
+            self.assertEqual((game.position, game.board.packed), (0, expected[0][0]))
+
+            # Check seeking forward and backward across keyframes
+            positions = list(np.random.default_rng(0).integers(0, len(game) + 1, 100))
+            for position in positions + [len(game) + 5, -5]:
+                game.seek(position)
+                position = min(max(position, 0), len(game))
+                self.assertEqual(game.position, position)
+                self.assertEqual((game.board.packed, game.board.score), expected[position])
+
+        print("Test seek passed")
+
+    def test_steps(self):
+        header, moves = self.record(gl.Board)
+        game = replay.Replay(header, moves, interval=8)
+        self.assertFalse(game.step_back())
+        while game.step_forward():
+            pass
+        self.assertEqual(game.position, len(game))
+        self.assertTrue(game.board.has_lost())
+        self.assertEqual(game.board.score, header["score"])
+        self.assertTrue(game.step_back())
+        self.assertFalse(game.board.has_lost())
+
+        print("Test steps passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,289 @@
+"""
+Game server hosting many games from one process.
+
+Clients connect over TCP or a Unix socket and send one
+JSON object per line, and get one JSON object back per
+line. Every request has an "op" and may have an "id",
+which is sent back with the response:
+
+    {"op": "new", "difficulty": "hard", "size": 4}
+    {"op": "move", "session": 1, "direction": "left"}
+    {"op": "clear", "session": 1}      (Easy games only)
+    {"op": "state", "session": 1}
+    {"op": "close", "session": 1}
+    {"op": "stats"}
+
+Game responses hold the session, board, score and whether
+the game is won or lost. Errors come back as
+{"ok": false, "error": "..."}.
+
+Sessions are kept as a packed board and a score, and are
+loaded into one shared Board per difficulty and size to
+handle a request. Sessions that go unused for longer than
+the idle timeout are evicted.
+
+Example:
+    python server.py --port 2048
+    python server.py --unix /tmp/2048.sock --idle-timeout 600
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict
+
+import bitboard as bb
+import gamelogic as gl
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+# Longest request line accepted, in bytes
+LINE_LIMIT = 1 << 16
+
+
+def memory_usage():
+    """
+    Returns the resident memory of the process in bytes.
+    Falls back to the peak usage where /proc isn't available,
+    and returns 0 if neither is.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        if resource is None:
+            return 0
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RequestError(Exception):
+    """
+    Raised for requests that can't be handled. The message
+    is sent back to the client.
+    """
+
+
+# Compact state of one game
+class Session:
+    """
+    A game between requests: the packed board, the score,
+    the rules it is played by and when it was last used.
+    """
+    __slots__ = ("packed", "score", "difficulty", "size", "last_used")
+
+    def __init__(self, packed, score, difficulty, size, last_used):
+        self.packed = packed
+        self.score = score
+        self.difficulty = difficulty
+        self.size = size
+        self.last_used = last_used
+
+
+class GameServer:
+    """
+    Keeps the sessions and answers requests. Sessions are
+    kept in least recently used order, so idle ones are
+    found at the front.
+    """
+    def __init__(self, idle_timeout=300.0, max_sessions=None, max_size=8):
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_size = max_size
+        self.sessions = OrderedDict()
+        self.next_session = 1
+        self.boards = {}
+        self.evicted = 0
+
+    def get_board(self, difficulty, size):
+        """
+        Returns the shared Board for a difficulty and size.
+        """
+        key = (difficulty, size)
+        board = self.boards.get(key)
+        if board is None:
+            # Sessions keep no history, so none is recorded
+            board = gl.BOARD_CLASSES[difficulty](size=size, history_size=0)
+            self.boards[key] = board
+        return board
+
+    def get_session(self, request):
+        """
+        Returns the session a request is for and marks it as used.
+        """
+        session_id = request.get("session")
+        # JSON true and false are ints in Python, but never session ids
+        valid = isinstance(session_id, int) and not isinstance(session_id, bool)
+        session = self.sessions.get(session_id) if valid else None
+        if session is None:
+            raise RequestError(f"Unknown session: {session_id}")
+        session.last_used = time.monotonic()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def respond(self, session_id, board, **fields):
+        """
+        Builds the response describing the state of a game.
+        """
+        return dict(ok=True, session=session_id, board=board.board.tolist(),
+                    score=board.score, won=bool(board.has_won()),
+                    lost=bool(board.has_lost()), **fields)
+
+    def handle_request(self, request):
+        """
+        Handles one decoded request and returns the response.
+        """
+        op = request.get("op")
+        if op == "new":
+            difficulty = str(request.get("difficulty", "normal")).lower()
+            size = request.get("size", 4)
+            if difficulty not in gl.BOARD_CLASSES:
+                raise RequestError("Difficulty must be Easy/Normal/Hard")
+            if not isinstance(size, int) or not 2 <= size <= self.max_size:
+                raise RequestError(f"Size must be between 2 and {self.max_size}")
+            board = self.get_board(difficulty, size)
+            board.reset_board()
+            session_id = self.next_session
+            self.next_session += 1
+            self.sessions[session_id] = Session(
+                board.packed, 0, difficulty, size, time.monotonic())
+            if self.max_sessions is not None and len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.evicted += 1
+            return self.respond(session_id, board)
+
+        if op == "stats":
+            return {"ok": True, "sessions": len(self.sessions),
+                    "evicted": self.evicted, "memory": memory_usage()}
+
+        session = self.get_session(request)
+        session_id = request["session"]
+        if op == "close":
+            del self.sessions[session_id]
+            return {"ok": True, "session": session_id}
+
+        board = self.get_board(session.difficulty, session.size)
+        board.restore(session.packed, session.score)
+        if op == "state":
+            return self.respond(session_id, board)
+        if op == "move":
+            direction = request.get("direction")
+            if not isinstance(direction, str) or direction not in bb.DIRECTION_BITS:
+                raise RequestError(f"Unknown direction: {direction}")
+            moved = bool(board.legal_moves() & bb.DIRECTION_BITS[direction])
+            board.move(direction)
+        elif op == "clear":
+            if session.difficulty != "easy":
+                raise RequestError("Only Easy games can be cleared")
+            board.clear_board()
+            moved = True
+        else:
+            raise RequestError(f"Unknown op: {op}")
+        session.packed = board.packed
+        session.score = board.score
+        return self.respond(session_id, board, moved=moved)
+
+    def handle_line(self, line):
+        """
+        Decodes a request line and encodes its response.
+        """
+        request = {}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise RequestError("Requests must be JSON objects")
+            response = self.handle_request(request)
+        except (ValueError, RequestError) as error:
+            response = {"ok": False, "error": str(error)}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        return json.dumps(response, separators=(",", ":")).encode() + b"\n"
+
+    def evict_idle(self, now=None):
+        """
+        Removes sessions unused for longer than the idle
+        timeout. Returns the number of sessions removed.
+        """
+        if now is None:
+            now = time.monotonic()
+        evicted = 0
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if now - session.last_used <= self.idle_timeout:
+                break
+            self.sessions.popitem(last=False)
+            evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    async def evict_loop(self):
+        while True:
+            await asyncio.sleep(max(self.idle_timeout / 4, 0.1))
+            self.evict_idle()
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers the requests of one client until it disconnects.
+        """
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # The line was longer than the limit
+                    writer.write(b'{"ok":false,"error":"Request too long"}\n')
+                    break
+                if not line:
+                    break
+                if line.strip():
+                    writer.write(self.handle_line(line))
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=None, port=2048, path=None):
+        """
+        Serves clients on a Unix socket if a path is given,
+        and on a TCP port otherwise, until cancelled.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, path, limit=LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(
+                self.handle_connection, host, port, limit=LINE_LIMIT)
+        evictor = asyncio.ensure_future(self.evict_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host 2048 games over a socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2048)
+    parser.add_argument("--unix", default=None,
+                        help="serve on this Unix socket instead of TCP")
+    parser.add_argument("--idle-timeout", type=float, default=300.0,
+                        help="seconds before an unused session is removed")
+    parser.add_argument("--max-sessions", type=int, default=None,
+                        help="remove the least recently used sessions beyond this")
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.idle_timeout, args.max_sessions)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
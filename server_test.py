@@ -0,0 +1,96 @@
+import asyncio
+import json
+import server
+import unittest
+import numpy as np
+
+class TestServer(unittest.TestCase):
+
+    def request(self, game_server, **message):
+        return json.loads(game_server.handle_line(json.dumps(message).encode()))
+
+    def test_sessions(self):
+        game_server = server.GameServer()
+        first = self.request(game_server, op="new", difficulty="easy", id=7)
+        second = self.request(game_server, op="new", difficulty="hard", size=5)
+        self.assertTrue(first["ok"])
+        self.assertEqual(first["id"], 7, "The request id should be sent back")
+        self.assertEqual(np.count_nonzero(first["board"]), 2)
+        self.assertEqual(np.shape(second["board"]), (5, 5))
+
+        # Check that every session keeps its own board
+        state = self.request(game_server, op="state", session=first["session"])
+        self.assertEqual(state["board"], first["board"])
+        moved = self.request(game_server, op="move", session=second["session"], direction="up")
+        self.assertEqual(
+            moved["moved"],
+            moved["board"] != second["board"],
+            "The board only changes if the move is possible")
+        self.assertEqual(
+            self.request(game_server, op="state", session=second["session"])["board"],
+            moved["board"])
+
+        # Only Easy games can be cleared
+        self.assertTrue(self.request(game_server, op="clear", session=first["session"])["ok"])
+        self.assertFalse(self.request(game_server, op="clear", session=second["session"])["ok"])
+
+        self.assertTrue(self.request(game_server, op="close", session=first["session"])["ok"])
+        self.assertFalse(self.request(game_server, op="state", session=first["session"])["ok"])
+        self.assertEqual(self.request(game_server, op="stats")["sessions"], 1)
+
+        print("Test sessions passed")
+
+    def test_bad_requests(self):
+        game_server = server.GameServer()
+        session = self.request(game_server, op="new")["session"]
+        for line in [b"not json", b"[1, 2]", b'{"op": "fly"}',
+                     b'{"op": "new", "difficulty": "extreme"}',
+                     b'{"op": "new", "size": 100}',
+                     b'{"op": "move", "session": [1]}',
+                     b'{"op": "state", "session": true}',
+                     json.dumps({"op": "move", "session": session, "direction": ["x"]}).encode(),
+                     json.dumps({"op": "move", "session": session, "direction": {}}).encode(),
+                     json.dumps({"op": "move", "session": session, "direction": "in"}).encode()]:
+            response = json.loads(game_server.handle_line(line))
+            self.assertFalse(response["ok"])
+            self.assertIn("error", response)
+
+        print("Test bad_requests passed")
+
+    def test_idle_eviction(self):
+        game_server = server.GameServer(idle_timeout=10, max_sessions=3)
+        sessions = [self.request(game_server, op="new")["session"] for _ in range(4)]
+        self.assertEqual(list(game_server.sessions), sessions[1:],
+                         "The least recently used session should be removed")
+
+        # Sessions used recently are kept
+        used = game_server.sessions[sessions[2]].last_used
+        game_server.sessions[sessions[1]].last_used = used - 20
+        self.assertEqual(game_server.evict_idle(used + 5), 1)
+        self.assertEqual(list(game_server.sessions), sessions[2:])
+        self.assertEqual(game_server.evict_idle(used + 20), 2)
+
+        print("Test idle_eviction passed")
+
+    def test_connection(self):
+        async def run():
+            game_server = server.GameServer()
+            tcp_server = await asyncio.start_server(game_server.handle_connection, "127.0.0.1", 0)
+            port = tcp_server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b'{"op": "new"}\n\n{"op": "stats"}\n')
+            responses = [json.loads(await reader.readline()) for _ in range(2)]
+            writer.close()
+            tcp_server.close()
+            await tcp_server.wait_closed()
+            return responses
+
+        new, stats = asyncio.run(run())
+        self.assertTrue(new["ok"])
+        self.assertEqual(stats["sessions"], 1)
+
+        print("Test connection passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
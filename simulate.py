@@ -0,0 +1,296 @@
+"""
+Headless simulation of 2048 games.
+
+Plays games with one of the built-in move policies
+without opening a window, and reports the throughput
+and the distribution of scores and largest tiles.
+
+Example:
+    python simulate.py --games 1e6 --difficulty hard --policy random --workers 8
+"""
+import argparse
+import multiprocessing
+import random
+import time
+
+import numpy as np
+import bitboard as bb
+import cache
+import gamelogic as gl
+import solver
+
+# Number of games handed to a worker at a time
+CHUNK_SIZE = 1000
+# Policies played on a BatchBoard for boards too large for full
+# row tables, where moving one Board at a time is much slower
+BATCH_POLICIES = ("random", "greedy")
+
+# Position of the k-th legal direction in every 4-bit legal moves mask
+_LEGAL_COUNTS = np.array([bin(mask).count("1") for mask in range(16)])
+_LEGAL_SELECT = np.array([[i for i in range(4) if mask >> i & 1] + [0] * (4 - _LEGAL_COUNTS[mask])
+                          for mask in range(16)])
+
+
+def legal_directions(board):
+    """
+    Returns the directions that change the given Board.
+    """
+    return bb.mask_directions(board.legal_moves())
+
+
+def random_policy(board):
+    """
+    Picks a random direction that changes the board.
+    """
+    directions = legal_directions(board)
+    return random.choice(directions) if directions else None
+
+
+def greedy_policy(board):
+    """
+    Picks the direction that gains the most score right away.
+    """
+    best = None
+    best_score = -1
+    scores, moved = board.move_scores()
+    for i, direction in enumerate(bb.DIRECTIONS):
+        if moved >> i & 1 and scores[i] > best_score:
+            best = direction
+            best_score = scores[i]
+    return best
+
+
+def make_policy(name, depth=2, cache_path=None):
+    """
+    Creates the move policy with the given name. A policy
+    takes a Board and returns a direction, or None to stop.
+    The expectimax policy shares the position cache in the
+    file at cache_path, if given. Its moves then depend on
+    what other searches already stored in the cache.
+    """
+    if name == "random":
+        return random_policy
+    if name == "greedy":
+        return greedy_policy
+    if name == "expectimax":
+        position_cache = None if cache_path is None else cache.PositionCache(
+            cache_path, settings=solver.cache_settings())
+        return solver.Expectimax(depth=depth, cache=position_cache).best_move
+    raise ValueError(f"Unknown policy: {name}")
+
+
+POLICIES = ("random", "greedy", "expectimax")
+
+
+def play_game(board, policy, max_moves=None, clears=0):
+    """
+    Plays the given Board until it is lost, the policy
+    gives up or max_moves is reached. Easy boards are
+    cleared up to `clears` times when they get stuck.
+    Returns the number of moves made.
+    """
+    moves = 0
+    while max_moves is None or moves < max_moves:
+        direction = policy(board) if not board.has_lost() else None
+        if direction is None:
+            if clears > 0 and isinstance(board, gl.BoardEasy):
+                board.clear_board()
+                clears -= 1
+                continue
+            break
+        board.move(direction)
+        moves += 1
+    return moves
+
+
+def run_games(games, difficulty, policy_name, depth=2, max_moves=None, clears=0, seed=None,
+              size=4, cache_path=None):
+    """
+    Plays a number of games on boards of the given size and
+    returns their scores, largest tiles and move counts as arrays.
+    Boards larger than bitboard.FULL_TABLE_MAX_SIZE are played
+    with run_batch_games when the policy allows it.
+    """
+    if policy_name in BATCH_POLICIES and size > bb.FULL_TABLE_MAX_SIZE:
+        return run_batch_games(games, difficulty, policy_name, max_moves, clears, seed, size)
+    if seed is not None:
+        # The boards have their own random streams,
+        # the random module is only used by the random policy
+        random.seed(seed)
+    policy = make_policy(policy_name, depth, cache_path)
+    # Simulated games are never undone
+    board = gl.BOARD_CLASSES[difficulty](size=size, history_size=0, seed=seed)
+    scores = np.zeros(games, dtype=np.int64)
+    max_tiles = np.zeros(games, dtype=np.int64)
+    moves = np.zeros(games, dtype=np.int64)
+    for i in range(games):
+        if i > 0:
+            board.reset_board()
+        moves[i] = play_game(board, policy, max_moves, clears)
+        scores[i] = board.score
+        max_tiles[i] = np.max(board.board)
+    return scores, max_tiles, moves
+
+
+def run_batch_games(games, difficulty, policy_name, max_moves=None, clears=0, seed=None, size=4):
+    """
+    Plays a number of games at once on a BatchBoard with the
+    random or greedy policy, following the rules of play_game.
+    Returns the same arrays as run_games.
+    """
+    if policy_name not in BATCH_POLICIES:
+        raise ValueError(f"Unknown batch policy: {policy_name}")
+    batch = gl.BatchBoard(games, difficulty, seed=seed, size=size)
+    scores = np.zeros(games, dtype=np.int64)
+    max_tiles = np.zeros(games, dtype=np.int64)
+    moves = np.zeros(games, dtype=np.int64)
+    clears_left = np.full(games, clears if difficulty == "easy" else 0)
+    # Game played on every board of the batch
+    playing = np.arange(games)
+    while playing.size:
+        legal = batch.legal_moves()
+        if max_moves is not None:
+            limited = moves[playing] >= max_moves
+        else:
+            limited = np.zeros(playing.size, dtype=bool)
+        clear = ~limited & (legal == 0) & (clears_left[playing] > 0)
+        if np.any(clear):
+            batch.clear_board(clear)
+            clears_left[playing[clear]] -= 1
+            legal = batch.legal_moves()
+
+        done = limited | (legal == 0)
+        if np.any(done):
+            # Finished games leave the batch
+            finished = playing[done]
+            scores[finished] = batch.scores[done]
+            exponents = batch.boards[done].reshape(finished.size, -1).max(axis=1).astype(np.int64)
+            max_tiles[finished] = np.where(exponents != 0, 1 << exponents, 0)
+            batch.keep(~done)
+            legal = legal[~done]
+            playing = playing[~done]
+            if not playing.size:
+                break
+
+        if policy_name == "random":
+            picks = (batch.rng.random(playing.size) * _LEGAL_COUNTS[legal]).astype(np.int64)
+            directions = _LEGAL_SELECT[legal, picks]
+        else:
+            # Moving a row either way gains the same score. Tiles
+            # merge without limit, as in BatchBoard.move
+            _, row_scores = bb.slide_rows(batch.boards, max_exponent=None)
+            _, column_scores = bb.slide_rows(batch.boards.transpose(0, 2, 1), max_exponent=None)
+            row_scores = row_scores.sum(axis=1)
+            column_scores = column_scores.sum(axis=1)
+            gains = np.stack([column_scores, column_scores, row_scores, row_scores])
+            gains[(legal >> np.arange(4)[:, None]) & 1 == 0] = -1
+            # The first direction with the highest gain, as in greedy_policy
+            directions = np.argmax(gains, axis=0)
+        _, changed = batch.move(directions)
+        batch.add_new_tiles(changed)
+        moves[playing] += 1
+    return scores, max_tiles, moves
+
+
+def _run_chunk(args):
+    """
+    Worker entry point for one chunk of games.
+    """
+    return run_games(*args)
+
+
+def chunk_seed(seed, chunk):
+    """
+    Derives the seed of a chunk of games from the seed
+    of the run and the position of the chunk in the run.
+    """
+    sequence = np.random.SeedSequence([seed, chunk])
+    return int(sequence.generate_state(1)[0])
+
+
+def simulate(games, difficulty="normal", policy="random", workers=1, depth=2,
+             max_moves=None, clears=0, seed=None, size=4, cache_path=None):
+    """
+    Plays games across a pool of worker processes.
+    Returns the combined scores, largest tiles and move counts.
+    """
+    if cache_path is not None:
+        # Create the cache once, before the workers map it
+        cache.PositionCache(cache_path, settings=solver.cache_settings())
+    chunks = []
+    for start in range(0, games, CHUNK_SIZE):
+        seed_of_chunk = None if seed is None else chunk_seed(seed, start // CHUNK_SIZE)
+        chunks.append((min(CHUNK_SIZE, games - start), difficulty, policy,
+                       depth, max_moves, clears, seed_of_chunk, size, cache_path))
+
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(_run_chunk, chunks)
+    else:
+        results = [_run_chunk(chunk) for chunk in chunks]
+
+    if not results:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    scores, max_tiles, moves = zip(*results)
+    return np.concatenate(scores), np.concatenate(max_tiles), np.concatenate(moves)
+
+
+def report(scores, max_tiles, moves, elapsed):
+    """
+    Formats the throughput and the distribution
+    of scores and largest tiles as text.
+    """
+    games = len(scores)
+    lines = [
+        f"Games: {games} in {elapsed:.2f}s",
+        f"Games/sec: {games / elapsed:,.1f}",
+        f"Moves/sec: {moves.sum() / elapsed:,.1f}",
+    ]
+    if games == 0:
+        return "\n".join(lines)
+
+    percentiles = np.percentile(scores, [10, 50, 90])
+    lines.append(
+        f"Score: mean {scores.mean():.1f}, min {scores.min()}, "
+        f"p10 {percentiles[0]:.0f}, p50 {percentiles[1]:.0f}, "
+        f"p90 {percentiles[2]:.0f}, max {scores.max()}")
+    lines.append("Largest tile:")
+    tiles, counts = np.unique(max_tiles, return_counts=True)
+    for tile, count in zip(tiles, counts):
+        reached = np.sum(max_tiles >= tile) / games
+        lines.append(f"  {tile:>6}: {count:>9} ({count / games:7.2%}, reached by {reached:7.2%})")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate 2048 games without a window.")
+    parser.add_argument("--games", type=float, default=1000,
+                        help="number of games to play (e.g. 1e6)")
+    parser.add_argument("--difficulty", choices=sorted(gl.BOARD_CLASSES), default="normal")
+    parser.add_argument("--size", type=int, default=4,
+                        help="number of rows and columns of the board")
+    parser.add_argument("--policy", choices=POLICIES, default="random")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of worker processes")
+    parser.add_argument("--depth", type=int, default=2,
+                        help="search depth of the expectimax policy")
+    parser.add_argument("--max-moves", type=int, default=None,
+                        help="stop each game after this many moves")
+    parser.add_argument("--clears", type=int, default=0,
+                        help="times an Easy board may be cleared when stuck")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cache", default=None,
+                        help="position cache file shared by the expectimax workers, "
+                             "created if missing (results then depend on its contents)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    scores, max_tiles, moves = simulate(
+        int(args.games), args.difficulty, args.policy, args.workers,
+        args.depth, args.max_moves, args.clears, args.seed, args.size, args.cache)
+    print(report(scores, max_tiles, moves, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import gamelogic as gl
+import simulate
+import unittest
+import numpy as np
+
+class TestSimulate(unittest.TestCase):
+
+    def test_play_game(self):
+        # Play a full game with random moves
+        board_instance = gl.Board()
+        moves = simulate.play_game(board_instance, simulate.random_policy)
+        self.assertGreater(moves, 0, "At least one move should be made")
+        self.assertTrue(board_instance.has_lost(), "The game should end lost")
+
+        # Check that games stop at the move limit
+        board_instance = gl.BoardHard()
+        moves = simulate.play_game(board_instance, simulate.greedy_policy, max_moves=5)
+        self.assertEqual(moves, 5, "The game should stop after 5 moves")
+
+        print("Test play_game passed")
+
+    def test_easy_clears(self):
+        # Check that a stuck easy board is cleared and played on
+        board_instance = gl.BoardEasy()
+        board_instance.board = np.array([[2, 4, 8, 16],
+                                         [16, 8, 4, 2],
+                                         [2, 4, 8, 16],
+                                         [16, 8, 4, 2]])
+        moves = simulate.play_game(board_instance, simulate.random_policy, clears=1)
+        self.assertGreater(moves, 0, "The cleared board should be played on")
+
+        print("Test easy_clears passed")
+
+    def test_simulate_seeded(self):
+        # Check that seeded runs give identical results
+        first = simulate.simulate(20, "hard", "random", seed=7)
+        second = simulate.simulate(20, "hard", "random", seed=7)
+        for a, b in zip(first, second):
+            self.assertTrue(np.array_equal(a, b), "Seeded runs should be identical")
+        self.assertEqual(len(first[0]), 20, "Every game should be reported")
+
+        # Runs with consecutive seeds play different games
+        self.assertNotEqual(simulate.chunk_seed(7, 1), simulate.chunk_seed(8, 0))
+        seeds = {simulate.chunk_seed(seed, chunk) for seed in range(10) for chunk in range(10)}
+        self.assertEqual(len(seeds), 100)
+
+        print("Test simulate_seeded passed")
+
+    def test_batch_games(self):
+        # Boards too large for full row tables are played in batches
+        first = simulate.run_games(20, "normal", "greedy", max_moves=500, seed=3, size=6)
+        second = simulate.run_games(20, "normal", "greedy", max_moves=500, seed=3, size=6)
+        for a, b in zip(first, second):
+            self.assertTrue(np.array_equal(a, b), "Seeded runs should be identical")
+        self.assertTrue(np.all(first[2] > 0), "Every game should be played")
+
+        scores, max_tiles, moves = simulate.run_games(10, "hard", "random", max_moves=50,
+                                                      seed=1, size=8)
+        self.assertTrue(np.all(moves == 50), "Games should stop after 50 moves")
+        self.assertTrue(np.all(max_tiles >= 4))
+
+        # Check that stuck easy boards are cleared and played on
+        _, _, moves = simulate.run_batch_games(10, "easy", "random", max_moves=2000,
+                                               clears=1, seed=2, size=6)
+        _, _, unclear = simulate.run_batch_games(10, "easy", "random", max_moves=2000,
+                                                 seed=2, size=6)
+        self.assertGreater(moves.sum(), unclear.sum())
+
+        print("Test batch_games passed")
+
+    def test_report(self):
+        scores = np.array([100, 200, 300])
+        max_tiles = np.array([16, 32, 32])
+        moves = np.array([10, 20, 30])
+        text = simulate.report(scores, max_tiles, moves, 2.0)
+        self.assertIn("Games/sec: 1.5", text)
+        self.assertIn("Moves/sec: 30.0", text)
+        self.assertIn("32:         2", text)
+
+        print("Test report passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,314 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import bitboard as bb
+
+# Weights of the row heuristic, following the usual
+# expectimax 2048 players: reward empty spaces, possible
+# merges and rows that are monotonic towards one side
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+# Version of the heuristic, stored with persistent caches
+# so that values of another heuristic are never reused.
+# Increase it whenever the heuristic changes.
+HEURISTIC_VERSION = 1
+
+# Chance nodes searched between checks of the time limit
+TIME_CHECK_INTERVAL = 16
+# Shallowest chance nodes kept in a persistent cache,
+# shallower ones are cheaper to search again than to store
+CACHE_MIN_DEPTH = 2
+
+# Search depth and time budget of background searches,
+# short enough for hints to show up within 100 ms
+HINT_DEPTH = 4
+HINT_TIME_LIMIT = 0.08
+
+
+def build_heuristic_table():
+    """
+    Scores every possible row of four tile exponents.
+    The score of a board is the sum of the scores
+    of its rows and its columns.
+    """
+    rows = np.arange(bb.ROW_MASK + 1, dtype=np.int64)
+    cells = ((rows[:, None] >> np.arange(0, 16, 4)) & 0xF).astype(np.float64)
+
+    total = np.sum(cells ** SUM_POWER, axis=1)
+    empty = np.sum(cells == 0, axis=1)
+
+    # Count tiles that would merge with their neighbour, ignoring
+    # empty spaces in between. Every run of two or more equal
+    # tiles counts its length.
+    order = np.argsort(cells == 0, axis=1, kind="stable")
+    tiles = np.take_along_axis(cells, order, axis=1)
+    equal = (tiles[:, :-1] == tiles[:, 1:]) & (tiles[:, :-1] != 0)
+    run_starts = equal & ~np.pad(equal[:, :-1], ((0, 0), (1, 0)))
+    merges = np.sum(equal, axis=1) + np.sum(run_starts, axis=1)
+
+    powered = cells ** MONOTONICITY_POWER
+    steps = powered[:, :-1] - powered[:, 1:]
+    monotonicity_left = np.sum(np.where(cells[:, :-1] > cells[:, 1:], steps, 0), axis=1)
+    monotonicity_right = np.sum(np.where(cells[:, :-1] < cells[:, 1:], -steps, 0), axis=1)
+
+    return (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges
+            - MONOTONICITY_WEIGHT * np.minimum(monotonicity_left, monotonicity_right)
+            - SUM_WEIGHT * total)
+
+
+HEURISTIC = build_heuristic_table().tolist()
+
+
+def heuristic(board):
+    """
+    Scores a packed board by its rows and columns.
+    """
+    columns = bb.transpose(board)
+    mask = bb.ROW_MASK
+    return (HEURISTIC[board & mask] + HEURISTIC[(board >> 16) & mask]
+            + HEURISTIC[(board >> 32) & mask] + HEURISTIC[board >> 48]
+            + HEURISTIC[columns & mask] + HEURISTIC[(columns >> 16) & mask]
+            + HEURISTIC[(columns >> 32) & mask] + HEURISTIC[columns >> 48])
+
+
+def cache_settings(min_probability=1e-4):
+    """
+    Returns the settings a cache.PositionCache must have
+    been made with to hold values of Expectimax searches
+    pruned at min_probability.
+    """
+    return {"heuristic": HEURISTIC_VERSION, "min_probability": min_probability}
+
+
+class _OutOfTime(Exception):
+    """
+    Raised to abandon a search once the time budget is used up.
+    """
+
+
+# Expectimax player to pick moves for a board
+class Expectimax:
+    """
+    Expectimax search over the moves of the player and
+    the tiles added after each move. New tiles are a 2 or
+    a 4 with equal chance on any empty space, as done by
+    Board.add_new_tiles. Results are memoized in a bounded
+    least-recently-used table keyed on the canonical packed
+    board, so that rotations and reflections of a board,
+    which have the same value, share one entry.
+    A cache.PositionCache can keep the best moves and the
+    values of deeper chance nodes across runs and processes.
+    Only results of searches exactly as deep are read from
+    it, unless reuse_deeper is set, which makes the moves
+    depend on what other searches stored in the cache.
+    The cache must have been made with the settings
+    cache_settings gives for min_probability.
+    """
+    def __init__(self, depth=3, time_limit=None, table_size=1000000, min_probability=1e-4,
+                 cache=None, reuse_deeper=False):
+        self.depth = depth
+        self.time_limit = time_limit
+        self.table_size = table_size
+        self.min_probability = min_probability
+        if cache is not None and cache.settings != cache_settings(min_probability):
+            raise ValueError(f"{cache.path} holds values of searches with the settings "
+                             f"{cache.settings}, not {cache_settings(min_probability)}")
+        self.cache = cache
+        self.reuse_deeper = reuse_deeper
+        self.table = OrderedDict()
+        self.deadline = None
+        self.cancelled = None
+        self.nodes = 0
+        self.searched_depth = 0
+
+    def best_move(self, board, cancelled=None):
+        """
+        Returns the best direction to move the given Board
+        (or packed board), or None if no move is possible.
+        See evaluate for cancelled.
+        """
+        if self.cache is None:
+            values = self.evaluate(board, cancelled)
+            if not values:
+                return None
+            return max(values, key=values.get)
+
+        if not isinstance(board, int):
+            if board.size != 4:
+                raise ValueError("Expectimax only supports 4x4 boards")
+            board = board.packed
+        # Moves are cached for the canonical board
+        key, transform = bb.canonical(board)
+        entry = self.cache.get(key)
+        if entry is not None and self._cached_depth(entry[1], self.depth):
+            return bb.RESTORE_DIRECTIONS[transform][bb.DIRECTIONS[entry[2]]]
+        values = self.evaluate(board, cancelled)
+        if not values:
+            return None
+        best = max(values, key=values.get)
+        move = bb.DIRECTIONS.index(bb.TRANSFORM_DIRECTIONS[transform][best])
+        self.cache.put(key, values[best], self.searched_depth, move)
+        return best
+
+    def _cached_depth(self, cached, depth):
+        """
+        Tells if a result of the persistent cache searched
+        `cached` moves deep can stand in for a search of depth.
+        """
+        return cached >= depth if self.reuse_deeper else cached == depth
+
+    def evaluate(self, board, cancelled=None):
+        """
+        Returns the expected value of every direction that
+        changes the board. The search deepens one move at a
+        time until the depth limit or the time limit is reached,
+        or until the threading.Event cancelled is set, which
+        another thread can do to stop the search at its next
+        time check. Every search needs its own Event.
+        """
+        if not isinstance(board, int):
+            if board.size != 4:
+                raise ValueError("Expectimax only supports 4x4 boards")
+            board = board.packed
+        if self.time_limit is not None:
+            self.deadline = time.perf_counter() + self.time_limit
+        else:
+            self.deadline = None
+
+        self.cancelled = cancelled
+
+        values = {}
+        self.searched_depth = 0
+        for depth in range(1, self.depth + 1):
+            if cancelled is not None and cancelled.is_set():
+                break
+            try:
+                values = self.search_moves(board, depth)
+            except _OutOfTime:
+                break
+            self.searched_depth = depth
+        return values
+
+    def search_moves(self, board, depth):
+        """
+        Returns the value of every direction that changes
+        the board, searching the given number of moves deep.
+        """
+        values = {}
+        boards, _, moved = bb.successors(board)
+        for i, direction in enumerate(bb.DIRECTIONS):
+            if moved >> i & 1:
+                values[direction] = self.chance_node(boards[i], depth - 1, 1.0)
+        return values
+
+    def max_node(self, board, depth, probability):
+        """
+        Returns the value of the best move from the board.
+        """
+        best = 0.0
+        boards, _, moved = bb.successors(board)
+        for i in range(4):
+            if moved >> i & 1:
+                value = self.chance_node(boards[i], depth - 1, probability)
+                if value > best:
+                    best = value
+        return best
+
+    def chance_node(self, board, depth, probability):
+        """
+        Returns the expected value of the board
+        over every tile that can be added to it.
+        """
+        if depth <= 0 or probability < self.min_probability:
+            return heuristic(board)
+
+        # Reuse results searched at least as deep
+        key = bb.canonical_key(board)
+        entry = self.table.get(key)
+        if entry is not None and entry[0] >= depth:
+            self.table.move_to_end(key)
+            return entry[1]
+        cached = self.cache is not None and depth >= CACHE_MIN_DEPTH
+        if cached:
+            entry = self.cache.get(key, chance=True)
+            if entry is not None and self._cached_depth(entry[1], depth):
+                return entry[0]
+
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            if self.cancelled is not None and self.cancelled.is_set():
+                raise _OutOfTime
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                raise _OutOfTime
+
+        empty = bb.empty_cells(board)
+        spawn_probability = probability / (2 * len(empty))
+        total = 0.0
+        for cell in empty:
+            shift = 4 * cell
+            total += self.max_node(board | (1 << shift), depth, spawn_probability)
+            total += self.max_node(board | (2 << shift), depth, spawn_probability)
+        value = total / (2 * len(empty))
+        if cached:
+            self.cache.put(key, value, depth)
+
+        self.table[key] = (depth, value)
+        self.table.move_to_end(key)
+        if len(self.table) > self.table_size:
+            self.table.popitem(last=False)
+        return value
+
+
+# Expectimax searches run away from the calling thread
+class BackgroundSearch:
+    """
+    Runs Expectimax searches for the best move one at a
+    time in a worker thread, so that a user interface stays
+    responsive. Starting a search cancels the one before it.
+    The solver and its table are only used by the worker,
+    and are kept between searches. Every search gets its
+    own cancel Event, so cancelling one that the worker has
+    not reached yet can't be lost.
+    """
+    def __init__(self, depth=HINT_DEPTH, time_limit=HINT_TIME_LIMIT):
+        self.solver = Expectimax(depth=depth, time_limit=time_limit)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.cancelled = None
+
+    def start(self, board):
+        """
+        Starts searching the best move of a packed 4x4 board.
+        Returns a Future of the direction, or of None if no
+        move is possible.
+        """
+        self.cancel()
+        self.cancelled = threading.Event()
+        self.future = self.executor.submit(self.solver.best_move, board, self.cancelled)
+        return self.future
+
+    def cancel(self):
+        """
+        Cancels the search in progress, if any.
+        """
+        if self.future is not None:
+            # A search that already started is stopped at its next time check
+            self.future.cancel()
+            self.cancelled.set()
+            self.future = None
+            self.cancelled = None
+
+    def close(self):
+        """
+        Cancels the search in progress and stops the worker.
+        """
+        self.cancel()
+        self.executor.shutdown(wait=False)
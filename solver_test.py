@@ -0,0 +1,120 @@
+import threading
+import time
+import bitboard as bb
+import gamelogic as gl
+import solver
+import unittest
+import numpy as np
+
+class TestExpectimax(unittest.TestCase):
+
+    def test_best_move_single_option(self):
+        # Only moving up or down changes this board
+        board = bb.pack(np.array([[2, 4, 8, 16],
+                                  [0, 0, 0, 0],
+                                  [0, 0, 0, 0],
+                                  [0, 0, 0, 0]]))
+        values = solver.Expectimax(depth=2).evaluate(board)
+        self.assertEqual(set(values), {"down"}, "Only moving down changes the board")
+
+        print("Test best_move_single_option passed")
+
+    def test_best_move_lost_board(self):
+        board_instance = gl.Board()
+        board_instance.board = np.array([[2, 4, 8, 16],
+                                         [16, 8, 4, 2],
+                                         [2, 4, 8, 16],
+                                         [16, 8, 4, 2]])
+        self.assertIsNone(
+            solver.Expectimax().best_move(board_instance),
+            "There is no move to pick on a lost board")
+
+        print("Test best_move_lost_board passed")
+
+    def test_transposition_table_bounded(self):
+        board_instance = gl.Board()
+        player = solver.Expectimax(depth=3, table_size=50)
+        for _ in range(20):
+            board_instance.move(player.best_move(board_instance))
+            self.assertLessEqual(len(player.table), 50, "Table should stay within its size")
+
+        print("Test transposition_table_bounded passed")
+
+    def test_time_limit(self):
+        board_instance = gl.Board()
+        player = solver.Expectimax(depth=10, time_limit=0.05, min_probability=0)
+
+        # Check that a move is still returned from the completed depths
+        self.assertIn(player.best_move(board_instance), bb.DIRECTIONS)
+
+        print("Test time_limit passed")
+
+    def test_symmetric_boards_share_entries(self):
+        board = bb.pack(np.array([[2, 4, 0, 0],
+                                  [0, 8, 0, 0],
+                                  [0, 0, 2, 0],
+                                  [0, 0, 0, 0]]))
+        player = solver.Expectimax(depth=2)
+        values = player.evaluate(board)
+        entries = len(player.table)
+
+        # Check that every symmetry finds the same values with no new entries
+        for transform, symmetry in enumerate(bb.symmetries(board)):
+            symmetry_values = player.evaluate(symmetry)
+            self.assertEqual(len(player.table), entries)
+            for direction, value in values.items():
+                self.assertAlmostEqual(
+                    symmetry_values[bb.TRANSFORM_DIRECTIONS[transform][direction]], value)
+
+        print("Test symmetric_boards_share_entries passed")
+
+    def test_background_search(self):
+        board_instance = gl.Board(seed=0)
+        for direction in ["up", "left", "down", "right"] * 10:
+            board_instance.move(direction)
+        search = solver.BackgroundSearch(depth=2, time_limit=None)
+        try:
+            future = search.start(board_instance.packed)
+            self.assertEqual(future.result(timeout=10),
+                             solver.Expectimax(depth=2).best_move(board_instance))
+
+            # Check that a new search cancels the one before it, and that
+            # a cancelled search stops at its next time check
+            search.solver.depth = 20
+            search.solver.min_probability = 0
+            stale = search.start(board_instance.packed)
+            future = search.start(bb.pack(np.array([[2, 4, 8, 16],
+                                                    [16, 8, 4, 2],
+                                                    [2, 4, 8, 16],
+                                                    [16, 8, 4, 2]])))
+            self.assertIsNone(future.result(timeout=10))
+            self.assertTrue(stale.done())
+        finally:
+            search.close()
+
+        # A search cancelled before it starts returns right away
+        cancelled = threading.Event()
+        cancelled.set()
+        player = solver.Expectimax(depth=20, min_probability=0)
+        start = time.perf_counter()
+        self.assertIsNone(player.best_move(board_instance, cancelled))
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+        # and one cancelled while it runs stops at its next time check
+        cancelled = threading.Event()
+        search = solver.BackgroundSearch(depth=20, time_limit=None)
+        search.solver.min_probability = 0
+        try:
+            future = search.executor.submit(
+                search.solver.best_move, board_instance.packed, cancelled)
+            time.sleep(0.05)
+            cancelled.set()
+            self.assertIn(future.result(timeout=10), bb.DIRECTIONS)
+        finally:
+            search.close()
+
+        print("Test background_search passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,265 @@
+"""
+Terminal version of the game, drawn with curses.
+
+Runs anywhere a terminal does, including over SSH, and
+starts without loading Tk. Only the cells that changed
+and the score line are redrawn after each key press, and
+keys that arrive while drawing are handled together before
+the next draw, so held-down arrow keys don't build up lag.
+
+Example:
+    python terminal.py --difficulty hard --size 5
+"""
+import argparse
+import curses
+
+import numpy as np
+import gamelogic as gl
+
+DIRECTION_KEYS = {
+    curses.KEY_UP: "up",
+    curses.KEY_DOWN: "down",
+    curses.KEY_LEFT: "left",
+    curses.KEY_RIGHT: "right",
+}
+
+# Characters across and lines down of one cell, cells of
+# boards holding larger tiles are made wider
+CELL_WIDTH = 7
+CELL_HEIGHT = 3
+
+# 256-color terminal colors of the tiles, by exponent,
+# close to the colors of the window version
+TILE_COLORS_256 = [248, 255, 223, 215, 209, 203, 160, 148, 77, 41, 43, 57]
+# Colors used by terminals with only the basic 8 colors
+TILE_COLORS_8 = [curses.COLOR_WHITE, curses.COLOR_YELLOW, curses.COLOR_RED,
+                 curses.COLOR_MAGENTA, curses.COLOR_GREEN, curses.COLOR_CYAN,
+                 curses.COLOR_BLUE]
+
+
+def exponent(value):
+    """
+    Returns the exponent of a tile value, 0 for an empty cell.
+    """
+    return int(value).bit_length() - 1 if value else 0
+
+
+def tile_text(value, width):
+    """
+    Returns the text of a tile, as a power of two
+    if its value doesn't fit in the given width.
+    """
+    text = str(value) if value else ""
+    if len(text) > width:
+        text = f"2^{exponent(value)}"
+    return text
+
+
+def tile_attributes(colors):
+    """
+    Returns the curses attributes of the tiles, by exponent.
+    Larger tiles use the last one. Without colors, tiles
+    are told apart by reverse video.
+    """
+    if not colors or not curses.has_colors():
+        return [curses.A_NORMAL] + [curses.A_REVERSE | curses.A_BOLD] * 15
+
+    curses.start_color()
+    attributes = []
+    for i in range(16):
+        if curses.COLORS >= 256:
+            background = TILE_COLORS_256[min(i, len(TILE_COLORS_256) - 1)]
+            foreground = curses.COLOR_BLACK if i <= 2 or i == 11 else 15
+        else:
+            background = TILE_COLORS_8[i % len(TILE_COLORS_8)] if i else curses.COLOR_BLACK
+            foreground = curses.COLOR_BLACK if i else curses.COLOR_WHITE
+        curses.init_pair(i + 1, foreground, background)
+        attributes.append(curses.color_pair(i + 1) | curses.A_BOLD)
+    return attributes
+
+
+# Class to represent the game in a terminal
+class TerminalBoard:
+    """
+    Draws a Board on a curses screen and handles the
+    same keys as the window version of the game.
+    """
+    def __init__(self, screen, difficulty="normal", size=4, colors=True):
+        self.screen = screen
+        self.difficulty = difficulty.lower()
+        if self.difficulty not in gl.BOARD_CLASSES:
+            raise ValueError("Difficulty must be Easy/Normal/Hard")
+        self.board = gl.BOARD_CLASSES[self.difficulty](size=size)
+        self.rules = ["Arrows: move", "R: reset", "U: undo", "Y: redo", "O: quit"]
+        if self.difficulty == "easy":
+            self.rules.append("C: clear the board")
+        self.attributes = tile_attributes(colors)
+        # Wide enough for one merge past the largest packed tile,
+        # which the board can still make on its array path
+        largest = 2 << self.board.engine.max_exponent_limit
+        self.cell_width = max(CELL_WIDTH, len(str(largest)) + 2)
+        self.width = self.board.size * self.cell_width
+        self.height = self.board.size * CELL_HEIGHT
+        self.win_displayed = False
+        self.loss_displayed = False
+
+    def draw_cell(self, i, j, value):
+        """
+        Draws one cell with its value in the middle.
+        """
+        attribute = self.attributes[min(exponent(value), len(self.attributes) - 1)]
+        text = tile_text(value, self.cell_width - 1)
+        y = i * CELL_HEIGHT
+        x = j * self.cell_width
+        blank = " " * (self.cell_width - 1)
+        for line in range(CELL_HEIGHT):
+            if line == CELL_HEIGHT // 2:
+                self.screen.addstr(y + line, x, text.center(self.cell_width - 1), attribute)
+            else:
+                self.screen.addstr(y + line, x, blank, attribute)
+
+    def draw_grid(self):
+        """
+        Draws the whole board, the score line and the rules.
+        """
+        self.screen.erase()
+        self.rendered = np.copy(self.board.board)
+        for i in range(self.board.size):
+            for j in range(self.board.size):
+                self.draw_cell(i, j, self.rendered[i, j])
+        self.draw_score()
+        for line, rule in enumerate(self.rules):
+            self.screen.addstr(line, self.width + 2, rule)
+        self.screen.addstr(
+            len(self.rules) + 1, self.width + 2,
+            "Difficulty: " + self.difficulty.capitalize())
+        self.status = ""
+        self.rendered_status = None
+        self.draw_status()
+        self.screen.refresh()
+
+    def draw_score(self):
+        """
+        Draws the score line under the board.
+        """
+        self.rendered_score = self.board.score
+        self.screen.addstr(self.height, 0, f"Score: {self.board.score}".ljust(self.width))
+
+    def draw_status(self):
+        """
+        Draws the win or loss message if it changed.
+        """
+        if self.status != self.rendered_status:
+            self.rendered_status = self.status
+            self.screen.move(self.height + 1, 0)
+            self.screen.clrtoeol()
+            self.screen.addstr(self.height + 1, 0, self.status)
+
+    def update_grid(self):
+        """
+        Redraws the cells that changed since the last
+        update and the score line if the score changed.
+        Shows a message once the game is won or lost.
+        """
+        board = self.board.board
+        for i, j in zip(*np.nonzero(board != self.rendered)):
+            self.draw_cell(i, j, board[i, j])
+        self.rendered[:] = board
+        if self.board.score != self.rendered_score:
+            self.draw_score()
+
+        lost = self.board.has_lost() and self.difficulty != "easy"
+        if lost and not self.loss_displayed:
+            self.loss_displayed = True
+            self.status = "Game Over! Press R to restart or O to quit"
+        elif not lost and self.loss_displayed:
+            # The loss was undone
+            self.loss_displayed = False
+            self.status = ""
+        if not lost and self.board.has_won() and not self.win_displayed:
+            self.win_displayed = True
+            self.status = "You Win! Keep going, or press R to restart"
+        self.draw_status()
+        self.screen.refresh()
+
+    def key_event(self, key):
+        """
+        Handles one key press. Returns False when
+        the player quits.
+        """
+        if key in DIRECTION_KEYS:
+            self.board.move(DIRECTION_KEYS[key])
+            # The win message stays up until the next move
+            if not self.loss_displayed:
+                self.status = ""
+        elif key == ord("w"):
+            self.board.insta_win()
+        elif key == ord("l"):
+            self.board.insta_lose()
+        elif key == ord("r"):
+            self.board.reset_board()
+            self.win_displayed = False
+            self.loss_displayed = False
+            self.status = ""
+        elif key == ord("u"):
+            self.board.undo()
+        elif key == ord("y"):
+            self.board.redo()
+        elif key == ord("c") and self.difficulty == "easy":
+            self.board.clear_board()
+        elif key in (ord("o"), ord("q")):
+            return False
+        return True
+
+    def run(self):
+        """
+        Plays the game until the player quits.
+        """
+        self.draw_grid()
+        while True:
+            keys = [self.screen.getch()]
+            # Take every key that arrived in the meantime, so that
+            # held-down keys are drawn once per batch instead of
+            # once per key
+            self.screen.nodelay(True)
+            key = self.screen.getch()
+            while key != -1:
+                keys.append(key)
+                key = self.screen.getch()
+            self.screen.nodelay(False)
+
+            for key in keys:
+                if key == curses.KEY_RESIZE:
+                    self.draw_grid()
+                elif not self.key_event(key):
+                    return
+            self.update_grid()
+
+
+def play(screen, difficulty, size, colors):
+    curses.curs_set(0)
+    screen.keypad(True)
+    rows, columns = screen.getmaxyx()
+    game = TerminalBoard(screen, difficulty, size, colors)
+    if rows < game.height + 2 or columns < game.width + 22:
+        return f"The terminal must be at least {game.width + 22}x{game.height + 2}"
+    game.run()
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play 2048 in the terminal.")
+    parser.add_argument("--difficulty", choices=sorted(gl.BOARD_CLASSES), default="normal")
+    parser.add_argument("--size", type=int, default=4,
+                        help="number of rows and columns of the board")
+    parser.add_argument("--no-color", action="store_true",
+                        help="draw tiles in reverse video instead of colors")
+    args = parser.parse_args(argv)
+
+    error = curses.wrapper(play, args.difficulty, args.size, not args.no_color)
+    if error:
+        parser.exit(1, error + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import curses
+import terminal
+import unittest
+import numpy as np
+
+# Stands in for a curses window, keeping the text drawn on it
+class FakeScreen:
+
+    def __init__(self):
+        self.drawn = []
+
+    def addstr(self, y, x, text, attribute=0):
+        self.drawn.append((y, x, text))
+
+    def erase(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def move(self, y, x):
+        pass
+
+    def clrtoeol(self):
+        pass
+
+
+class TestTerminal(unittest.TestCase):
+
+    def test_update_only_changed_cells(self):
+        screen = FakeScreen()
+        game = terminal.TerminalBoard(screen, "normal", colors=False)
+        start = np.array([[2, 2, 0, 0],
+                          [0, 0, 0, 0],
+                          [0, 0, 4, 0],
+                          [0, 0, 0, 0]])
+        game.board.board = start
+        game.draw_grid()
+        screen.drawn = []
+
+        game.key_event(curses.KEY_LEFT)
+        game.update_grid()
+
+        # The two merged cells, the new tile and the score are redrawn
+        cells = {(y // terminal.CELL_HEIGHT, x // game.cell_width)
+                 for y, x, _ in screen.drawn if y < game.height}
+        changed = set(zip(*np.nonzero(game.board.board != start)))
+        self.assertEqual(cells, changed)
+        self.assertIn((game.height, 0, "Score: 4".ljust(game.width)), screen.drawn)
+
+        print("Test update_only_changed_cells passed")
+
+    def test_key_event(self):
+        game = terminal.TerminalBoard(FakeScreen(), "easy", size=3, colors=False)
+        game.draw_grid()
+        self.assertTrue(game.key_event(ord("w")))
+        game.update_grid()
+        self.assertTrue(game.win_displayed)
+        self.assertIn("Win", game.status)
+
+        # Undo goes back to before the last move
+        packed = game.board.packed
+        game.key_event(curses.KEY_DOWN)
+        game.key_event(ord("u"))
+        self.assertEqual(game.board.packed, packed)
+
+        self.assertFalse(game.key_event(ord("o")), "O quits the game")
+
+        print("Test key_event passed")
+
+    def test_large_tiles(self):
+        for size, width in [(4, terminal.CELL_WIDTH), (6, 12)]:
+            screen = FakeScreen()
+            game = terminal.TerminalBoard(screen, "normal", size=size, colors=False)
+            self.assertEqual(game.cell_width, width)
+            board = np.zeros((size, size), dtype=int)
+            board[0, 0] = 2 << game.board.engine.max_exponent_limit
+            board[0, 1] = 1 << 40
+            game.board.board = board
+            game.draw_grid()
+            texts = [text.strip() for y, x, text in screen.drawn
+                     if y == terminal.CELL_HEIGHT // 2 and x < game.width]
+            self.assertEqual(texts[:2], [str(board[0, 0]), "2^40"])
+            self.assertTrue(all(len(text) < width for text in texts))
+
+        print("Test large_tiles passed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Tournament runner for comparing move policies.
+
+Plays the same number of games with every policy on every
+difficulty, spread across a pool of worker processes.
+Games are grouped into shards that each get their own seed,
+so the results don't depend on the number of workers.
+
+Example:
+    python tournament.py --policies random greedy expectimax --games 1000 --workers 8
+"""
+import argparse
+import multiprocessing
+import time
+
+import numpy as np
+import gamelogic as gl
+import simulate
+
+# Compact record sent back for every game played
+RECORD_DTYPE = np.dtype([
+    ("policy", np.uint8),
+    ("difficulty", np.uint8),
+    ("shard", np.uint32),
+    ("game", np.uint32),
+    ("score", np.uint32),
+    ("max_tile", np.uint32),
+    ("moves", np.uint32),
+])
+
+
+def shard_seed(seed, policy, difficulty, shard):
+    """
+    Derives the seed of a shard from the tournament seed
+    and the position of the shard in the tournament.
+    """
+    sequence = np.random.SeedSequence([seed, policy, difficulty, shard])
+    return int(sequence.generate_state(1)[0])
+
+
+def play_shard(task):
+    """
+    Worker entry point. Plays one shard of games and
+    returns them as an array of compact records.
+    """
+    policy, difficulty, shard, games, seed, options = task
+    scores, max_tiles, moves = simulate.run_games(
+        games, gl.DIFFICULTIES[difficulty], simulate.POLICIES[policy],
+        seed=shard_seed(seed, policy, difficulty, shard), **options)
+
+    records = np.zeros(games, dtype=RECORD_DTYPE)
+    records["policy"] = policy
+    records["difficulty"] = difficulty
+    records["shard"] = shard
+    records["game"] = np.arange(games)
+    records["score"] = scores
+    records["max_tile"] = max_tiles
+    records["moves"] = moves
+    return records
+
+
+def run_tournament(policies, difficulties, games, workers=1, shard_size=100,
+                   seed=0, **options):
+    """
+    Plays `games` games for every pair of policy and
+    difficulty. Returns the records of all games, sorted
+    so that they are identical for any number of workers.
+    Extra options are passed on to simulate.run_games.
+    """
+    tasks = []
+    for policy in policies:
+        for difficulty in difficulties:
+            for shard, start in enumerate(range(0, games, shard_size)):
+                tasks.append((
+                    simulate.POLICIES.index(policy), gl.DIFFICULTIES.index(difficulty),
+                    shard, min(shard_size, games - start), seed, options))
+
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            # Records stream back as soon as each shard finishes
+            shards = list(pool.imap_unordered(play_shard, tasks))
+    else:
+        shards = [play_shard(task) for task in tasks]
+
+    if not shards:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    records = np.concatenate(shards)
+    return np.sort(records, order=["policy", "difficulty", "shard", "game"])
+
+
+def summarize(records):
+    """
+    Formats a table comparing the results of every
+    policy on every difficulty.
+    """
+    lines = [f"{'policy':<12}{'difficulty':<12}{'games':>8}{'mean score':>12}"
+             f"{'median':>10}{'max tile':>10}{'2048 rate':>11}{'mean moves':>12}"]
+    for policy in np.unique(records["policy"]):
+        for difficulty in np.unique(records["difficulty"]):
+            group = records[(records["policy"] == policy)
+                            & (records["difficulty"] == difficulty)]
+            if group.size == 0:
+                continue
+            lines.append(
+                f"{simulate.POLICIES[policy]:<12}{gl.DIFFICULTIES[difficulty]:<12}"
+                f"{group.size:>8}{group['score'].mean():>12.1f}"
+                f"{np.median(group['score']):>10.0f}{group['max_tile'].max():>10}"
+                f"{np.mean(group['max_tile'] >= 2048):>11.2%}"
+                f"{group['moves'].mean():>12.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare 2048 move policies.")
+    parser.add_argument("--policies", nargs="+", choices=simulate.POLICIES,
+                        default=list(simulate.POLICIES))
+    parser.add_argument("--difficulties", nargs="+", choices=gl.DIFFICULTIES,
+                        default=list(gl.DIFFICULTIES))
+    parser.add_argument("--games", type=float, default=100,
+                        help="games per policy and difficulty")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--shard-size", type=int, default=100,
+                        help="games played with each shard seed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=2,
+                        help="search depth of the expectimax policy")
+    parser.add_argument("--max-moves", type=int, default=None)
+    parser.add_argument("--size", type=int, default=4,
+                        help="number of rows and columns of the board")
+    parser.add_argument("--clears", type=int, default=0,
+                        help="times an Easy board may be cleared when stuck")
+    parser.add_argument("--output", default=None,
+                        help="save the game records to this .npy file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    records = run_tournament(
+        args.policies, args.difficulties, int(args.games), args.workers,
+        args.shard_size, args.seed, depth=args.depth,
+        max_moves=args.max_moves, clears=args.clears, size=args.size)
+    elapsed = time.perf_counter() - start
+
+    print(summarize(records))
+    print(f"{records.size} games in {elapsed:.2f}s")
+    if args.output:
+        np.save(args.output, records)
+
+
+if __name__ == "__main__":
+    main()
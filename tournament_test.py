@@ -0,0 +1,34 @@
+import tournament
+import unittest
+import numpy as np
+
+class TestTournament(unittest.TestCase):
+
+    def test_records(self):
+        records = tournament.run_tournament(["random"], ["normal", "hard"], 30, shard_size=10)
+
+        # Check that every game has a record
+        self.assertEqual(records.dtype, tournament.RECORD_DTYPE)
+        self.assertEqual(records.size, 60, "Every game should have a record")
+        self.assertTrue(np.all(records["moves"] > 0), "Every game should have moves")
+        self.assertTrue(np.all(records["max_tile"] >= 4), "Tiles should combine in every game")
+
+        print("Test records passed")
+
+    def test_same_results_for_any_workers(self):
+        # Check that the number of workers doesn't change the results
+        single = tournament.run_tournament(["random", "greedy"], ["easy"], 20, workers=1, shard_size=5)
+        pooled = tournament.run_tournament(["random", "greedy"], ["easy"], 20, workers=2, shard_size=5)
+        self.assertTrue(
+            np.array_equal(single, pooled),
+            "Results should be identical for any number of workers")
+
+        # Check that a different seed gives different games
+        reseeded = tournament.run_tournament(["random", "greedy"], ["easy"], 20, seed=1, shard_size=5)
+        self.assertFalse(np.array_equal(single, reseeded))
+
+        print("Test same_results_for_any_workers passed")
+
+
+if __name__ == "__main__":
+    unittest.main()